@@ -0,0 +1,98 @@
+"""
+This module compares two versions of vaccinations.csv
+Every row is identified by its (location, date) key and hashed over the rest
+of its columns in one vectorized pass. Joining the keys of both versions then
+classifies each row as inserted, updated, or deleted, so revisions to
+historical rows are found as well as new dates.
+
+Run it with the old csv, the new csv, and optionally where to write the change set,
+which is printed when no path is given:
+    python3 dataset_diff.py old_vaccinations.csv vaccinations.csv vaccination_changes.csv
+"""
+import sys
+import numpy as np
+import pandas as pd
+KEY_COLUMNS = ["location", "date"]
+CHANGE_TYPES = ["inserted", "updated", "deleted"]
+
+def hash_rows(raw_data, columns=None):
+    """Hashes every row of a dataframe over its non key columns
+
+    Args:
+        raw_data: a dataframe with a location and date column
+        columns: the columns to hash, by default every column that is not a key
+
+    Returns:
+        A dataframe with the location, date and a uint64 row_hash column
+    """
+    if columns is None:
+        columns = [column for column in raw_data.columns if column not in KEY_COLUMNS]
+    hashed = raw_data[KEY_COLUMNS].copy()
+    # A nullable dtype keeps the hashes exact when the outer join adds missing rows
+    hashed["row_hash"] = pd.array(pd.util.hash_pandas_object(raw_data[columns], index=False),
+                                  dtype="UInt64")
+    return hashed
+
+def diff_hashes(old_hashes, new_hashes):
+    """Classifies every row of two hashed versions of the data
+
+    Args:
+        old_hashes: the dataframe made by hash_rows for the old version
+        new_hashes: the dataframe made by hash_rows for the new version
+
+    Returns:
+        A dataframe with the location, date and change of every row that
+        was inserted, updated, or deleted
+    """
+    joined = pd.merge(old_hashes, new_hashes, on=KEY_COLUMNS, how="outer",
+                      suffixes=("_old", "_new"), indicator=True)
+    updated = (joined["row_hash_old"] != joined["row_hash_new"]).fillna(False)
+    change = np.select([joined["_merge"] == "right_only",
+                        joined["_merge"] == "left_only",
+                        updated.to_numpy(dtype=bool)],
+                       ["inserted", "deleted", "updated"], "")
+    joined["change"] = change
+    return joined.loc[change != "", KEY_COLUMNS+["change"]].reset_index(drop=True)
+
+def summarize_changes(changes):
+    """Creates a compact change set with one row per changed country
+
+    Args:
+        changes: the dataframe made by diff_hashes
+
+    Returns:
+        A dataframe with a location column and the number of inserted,
+        updated, and deleted rows for every country that changed
+    """
+    summary = pd.crosstab(changes["location"], changes["change"])
+    summary = summary.reindex(columns=CHANGE_TYPES, fill_value=0)
+    summary.columns.name = None
+    return summary.reset_index()
+
+def diff_files(old_path, new_path):
+    """Compares two versions of vaccinations.csv
+
+    Args:
+        old_path: the path to the old version of the csv
+        new_path: the path to the new version of the csv
+
+    Returns:
+        The dataframe made by diff_hashes for the two files
+    """
+    old_hashes = hash_rows(pd.read_csv(old_path))
+    new_hashes = hash_rows(pd.read_csv(new_path))
+    return diff_hashes(old_hashes, new_hashes)
+
+def __main__():
+    if len(sys.argv) not in [3, 4]:
+        print("Usage: python3 dataset_diff.py old.csv new.csv [changes.csv]")
+        sys.exit(1)
+    summary = summarize_changes(diff_files(sys.argv[1], sys.argv[2]))
+    if len(sys.argv) == 4:
+        summary.to_csv(sys.argv[3], index=False)
+    elif len(summary):
+        print(summary.to_string(index=False))
+    print(str(len(summary))+" countries changed")
+
+if __name__ == "__main__":
+    __main__()
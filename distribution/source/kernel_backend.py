@@ -0,0 +1,371 @@
+"""
+This module holds the small numeric kernels the models spend their time in
+These are the logit transform of the y values, the Chebyshev and logarithmic
+features of the x values, the Gram matrix of a least squares fit, and the
+sigmoid that turns a prediction back into people_fully_vaccinated_per_hundred.
+Each kernel has a NumPy version and a loop version. When Numba is installed,
+the loop versions can be compiled and used instead, with the same results.
+They are compiled the first time they are called, and the compiled code is cached
+on disk, so later runs do not compile them again.
+
+The NumPy versions are used unless the numba backend is chosen with set_backend,
+or before starting with the VACCINATION_KERNEL_BACKEND environment variable
+set to numba. The tests check that every backend agrees with the NumPy versions.
+"""
+import os
+import numpy as np
+try:
+    import numba
+except ImportError:
+    numba = None
+BACKEND_VARIABLE = "VACCINATION_KERNEL_BACKEND"
+BACKENDS = ["numpy", "numba"]
+
+def logit_numpy(y_data, offset, limit, replacement, clip, out):
+    """Applies the logit of y+offset to every y value with NumPy ufuncs
+
+    The argument is clipped to [clip, 1-clip], so the logit is always finite
+    Every y value that is not below limit is replaced by replacement
+
+    Args:
+        y_data: a float64 array of y values
+        offset: the amount added to each y value
+        limit: the y value from which replacement is used
+        replacement: the value used for y values from limit on
+        clip: how close the logit argument may get to 0 or 1
+        out: a float64 array of the same shape to write the result to,
+             which may be y_data itself
+
+    Returns:
+        out
+    """
+    keep = y_data < limit
+    np.add(y_data, offset, out=out)
+    np.clip(out, clip, 1-clip, out=out)
+    # logit(p) = log(p) - log(1-p)
+    complement = np.log1p(-out)
+    np.log(out, out=out)
+    np.subtract(out, complement, out=out)
+    out[~keep] = replacement
+    return out
+
+def logit_loop(y_data, offset, limit, replacement, clip, out):
+    """Applies the logit of y+offset to every y value, one value at a time
+
+    Args:
+        The same as logit_numpy
+
+    Returns:
+        out
+    """
+    for i in range(y_data.shape[0]):
+        y = y_data[i]
+        if y < limit:
+            p = min(max(y+offset, clip), 1-clip)
+            out[i] = np.log(p)-np.log1p(-p)
+        else:
+            out[i] = replacement
+    return out
+
+def sigmoid_numpy(y_data, offset, limit, replacement, out):
+    """Applies the sigmoid of every y value with NumPy ufuncs, then removes offset
+
+    The sigmoid is found as exp(-logaddexp(0, -y)), which does not overflow
+    Every y value that is not above limit is replaced by replacement
+
+    Args:
+        y_data: a float64 array of y values
+        offset: the amount removed from each sigmoid
+        limit: the y value up to which replacement is used
+        replacement: the value used for y values up to limit
+        out: a float64 array of the same shape to write the result to,
+             which may be y_data itself
+
+    Returns:
+        out
+    """
+    keep = y_data > limit
+    np.negative(y_data, out=out)
+    np.logaddexp(0, out, out=out)
+    np.negative(out, out=out)
+    np.exp(out, out=out)
+    np.subtract(out, offset, out=out)
+    out[~keep] = replacement
+    return out
+
+def sigmoid_loop(y_data, offset, limit, replacement, out):
+    """Applies the sigmoid of every y value, one value at a time, then removes offset
+
+    Args:
+        The same as sigmoid_numpy
+
+    Returns:
+        out
+    """
+    for i in range(y_data.shape[0]):
+        y = y_data[i]
+        if y > limit:
+            # logaddexp(0, -y) without overflow
+            if y > 0:
+                softplus = np.log1p(np.exp(-y))
+            else:
+                softplus = -y+np.log1p(np.exp(y))
+            out[i] = np.exp(-softplus)-offset
+        else:
+            out[i] = replacement
+    return out
+
+def chebyshev_numpy(u_data, out):
+    """Fills a matrix whose columns are the Chebyshev polynomials T_1(u), ..., T_degree(u)
+
+    Each column is found from the two before it with T_k = 2u*T_(k-1) - T_(k-2),
+    where T_0 is 1. For u in [-1, 1] every column is in [-1, 1]
+
+    Args:
+        u_data: a float64 array of u values, usually the days mapped to [-1, 1]
+        out: a float64 array with a row for each u value and a column for each degree
+
+    Returns:
+        out
+    """
+    out[:, 0] = u_data
+    if out.shape[1] > 1:
+        np.multiply(u_data, u_data, out=out[:, 1])
+        np.multiply(out[:, 1], 2, out=out[:, 1])
+        np.subtract(out[:, 1], 1, out=out[:, 1])
+    for degree in range(2, out.shape[1]):
+        np.multiply(out[:, degree-1], u_data, out=out[:, degree])
+        np.multiply(out[:, degree], 2, out=out[:, degree])
+        np.subtract(out[:, degree], out[:, degree-2], out=out[:, degree])
+    return out
+
+def chebyshev_loop(u_data, out):
+    """Fills the Chebyshev polynomials one u value at a time
+
+    Args:
+        The same as chebyshev_numpy
+
+    Returns:
+        out
+    """
+    for i in range(u_data.shape[0]):
+        previous = 1.0
+        current = u_data[i]
+        out[i, 0] = current
+        for degree in range(1, out.shape[1]):
+            following = 2*u_data[i]*current-previous
+            out[i, degree] = following
+            previous = current
+            current = following
+    return out
+
+def logarithmic_numpy(x_data, out):
+    """Fills a matrix whose columns are x and log(x+2)
+
+    Args:
+        x_data: a float64 array of x values
+        out: a float64 array with a row for each x value and two columns
+
+    Returns:
+        out
+    """
+    out[:, 0] = x_data
+    np.add(x_data, 2, out=out[:, 1])
+    np.log(out[:, 1], out=out[:, 1])
+    return out
+
+def logarithmic_loop(x_data, out):
+    """Fills a matrix whose columns are x and log(x+2), one x value at a time
+
+    Args:
+        The same as logarithmic_numpy
+
+    Returns:
+        out
+    """
+    for i in range(x_data.shape[0]):
+        out[i, 0] = x_data[i]
+        out[i, 1] = np.log(x_data[i]+2)
+    return out
+
+def gram_numpy(features, y_data, gram, moments):
+    """Fills the normal equations of a least squares fit with an intercept
+
+    The features are given a leading column of ones for the intercept
+
+    Args:
+        features: a float64 array with a row for each value and a column for each feature
+        y_data: a float64 array of the y values
+        gram: a float64 array to write the Gram matrix to, with one more row
+              and column than features has columns
+        moments: a float64 array to write the features times y_data to,
+                 with one more value than features has columns
+
+    Returns:
+        gram and moments
+    """
+    gram[0, 0] = features.shape[0]
+    gram[0, 1:] = features.sum(axis=0)
+    gram[1:, 0] = gram[0, 1:]
+    gram[1:, 1:] = features.T @ features
+    moments[0] = y_data.sum()
+    moments[1:] = features.T @ y_data
+    return gram, moments
+
+def gram_loop(features, y_data, gram, moments):
+    """Fills the normal equations of a least squares fit with an intercept, one row at a time
+
+    Args:
+        The same as gram_numpy
+
+    Returns:
+        gram and moments
+    """
+    columns = features.shape[1]
+    gram[:, :] = 0
+    moments[:] = 0
+    for i in range(features.shape[0]):
+        y = y_data[i]
+        gram[0, 0] += 1
+        moments[0] += y
+        for a in range(columns):
+            value = features[i, a]
+            gram[0, a+1] += value
+            moments[a+1] += value*y
+            for b in range(a, columns):
+                gram[a+1, b+1] += value*features[i, b]
+    for a in range(1, columns+1):
+        for b in range(a):
+            gram[a, b] = gram[b, a]
+    return gram, moments
+
+NUMPY_KERNELS = {"logit":logit_numpy, "sigmoid":sigmoid_numpy, "chebyshev":chebyshev_numpy,
+                 "logarithmic":logarithmic_numpy, "gram":gram_numpy}
+LOOP_KERNELS = {"logit":logit_loop, "sigmoid":sigmoid_loop, "chebyshev":chebyshev_loop,
+                "logarithmic":logarithmic_loop, "gram":gram_loop}
+# Numba compiles each kernel lazily, on its first call, and caches it next to this file
+NUMBA_KERNELS = {name:numba.njit(kernel, cache=True) for name, kernel in LOOP_KERNELS.items()} \
+    if numba is not None else dict()
+KERNELS = {"numpy":NUMPY_KERNELS, "numba":NUMBA_KERNELS}
+current = {"backend":"numpy"}
+
+def available_backends():
+    """Lists the backends that can be used
+
+    Returns:
+        A list of the names of the backends whose compiler is installed
+    """
+    return [backend for backend in BACKENDS if backend == "numpy" or KERNELS[backend]]
+
+def set_backend(backend):
+    """Chooses the backend every kernel is run with
+
+    Args:
+        backend: the name of the backend, one of BACKENDS
+
+    Raises:
+        ValueError: if the backend is unknown or its compiler is not installed
+    """
+    if backend not in BACKENDS:
+        raise ValueError("Unknown kernel backend "+str(backend)+", use one of "+
+                         ", ".join(BACKENDS))
+    if backend not in available_backends():
+        raise ValueError("The "+backend+" kernel backend needs "+backend+" to be installed")
+    current["backend"] = backend
+
+def get_backend():
+    """Returns the name of the backend every kernel is run with"""
+    return current["backend"]
+
+def get_kernel(name):
+    """Returns a kernel of the current backend
+
+    Args:
+        name: the name of the kernel, a key of NUMPY_KERNELS
+
+    Returns:
+        The function that runs the kernel
+    """
+    return KERNELS[current["backend"]][name]
+
+def prepare_output(shape, out):
+    """Returns out, or a new float64 array of the shape if out is None"""
+    if out is None:
+        return np.empty(shape, dtype=np.float64)
+    return out
+
+def logit(y_data, offset, limit, replacement, clip, out=None):
+    """Runs the logit kernel of the current backend
+
+    Args:
+        The same as logit_numpy, but y_data may be any array-like and out is optional
+
+    Returns:
+        A float64 array with the transformed values
+    """
+    y_data = np.ascontiguousarray(y_data, dtype=np.float64)
+    out = prepare_output(y_data.shape, out)
+    return get_kernel("logit")(y_data.reshape(-1), offset, limit, replacement, clip,
+                               out.reshape(-1)).reshape(y_data.shape)
+
+def sigmoid(y_data, offset, limit, replacement, out=None):
+    """Runs the sigmoid kernel of the current backend
+
+    Args:
+        The same as sigmoid_numpy, but y_data may be any array-like and out is optional
+
+    Returns:
+        A float64 array with the transformed values
+    """
+    y_data = np.ascontiguousarray(y_data, dtype=np.float64)
+    out = prepare_output(y_data.shape, out)
+    return get_kernel("sigmoid")(y_data.reshape(-1), offset, limit, replacement,
+                                 out.reshape(-1)).reshape(y_data.shape)
+
+def chebyshev(u_data, degree):
+    """Runs the Chebyshev kernel of the current backend
+
+    Args:
+        u_data: the u values, with one column
+        degree: the highest degree of Chebyshev polynomial to include
+
+    Returns:
+        A float64 array, stored column by column, with a column for each
+        Chebyshev polynomial from T_1 to T_degree
+    """
+    u_data = np.ascontiguousarray(u_data, dtype=np.float64).reshape(-1)
+    out = np.empty((len(u_data), degree), order="F")
+    return get_kernel("chebyshev")(u_data, out)
+
+def logarithmic(x_data):
+    """Runs the logarithmic kernel of the current backend
+
+    Args:
+        x_data: the x values, with one column
+
+    Returns:
+        A float64 array whose columns are x and log(x+2)
+    """
+    x_data = np.ascontiguousarray(x_data, dtype=np.float64).reshape(-1)
+    out = np.empty((len(x_data), 2))
+    return get_kernel("logarithmic")(x_data, out)
+
+def gram(features, y_data):
+    """Runs the Gram kernel of the current backend
+
+    Args:
+        features: the features, with a row for each value
+        y_data: the y values
+
+    Returns:
+        The Gram matrix of the features with a leading column of ones,
+        and the features with a leading column of ones times y_data
+    """
+    features = np.asarray(features, dtype=np.float64)
+    features = features.reshape(len(features), -1)
+    y_data = np.ascontiguousarray(y_data, dtype=np.float64).reshape(-1)
+    columns = features.shape[1]+1
+    return get_kernel("gram")(features, y_data, np.empty((columns, columns)),
+                              np.empty(columns))
+
+set_backend(os.environ.get(BACKEND_VARIABLE, "numpy"))
@@ -0,0 +1,219 @@
+"""
+This module impliments a class called LazyVaccinationSeriesStore
+It builds a sidecar offset index of vaccinations.csv once, recording the byte
+ranges that hold the rows of each location, the number of rows with a
+people_fully_vaccinated_per_hundred value, and the first date in the file.
+With the offset index, only the rows of a country that is looked at are parsed,
+so startup does not depend on the size of the whole csv.
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from series_store import VaccinationSeriesStore
+from vaccination_cache import FILE_MODE
+from vaccination_cache import hash_file
+INDEX_SUFFIX = ".index.json"
+INDEX_VERSION = 1
+VALUE_COLUMN = "people_fully_vaccinated_per_hundred"
+
+def get_index_path(file_path):
+    """Returns the path of the offset index for a csv file
+
+    Args:
+        file_path: the path to the vaccinations.csv file
+
+    Returns:
+        The path the offset index is stored at, next to the csv file
+    """
+    return file_path + INDEX_SUFFIX
+
+def split_line(line):
+    """Splits a line of the csv into its fields
+
+    Uses a plain split unless the line has quoted fields
+
+    Args:
+        line: the bytes of one line of the csv, without the newline
+
+    Returns:
+        A list of strings holding the fields of the line
+    """
+    line = line.decode("utf-8")
+    if '"' in line:
+        return next(csv.reader([line]))
+    return line.split(",")
+
+def build_offset_index(file_path):
+    """Scans the csv once to record where the rows of each location are
+
+    Consecutive rows of the same location are merged into one byte range
+
+    Args:
+        file_path: the path to the vaccinations.csv file
+
+    Returns:
+        A dictionary holding the columns of the csv, the min_date, and for each
+        location its byte ranges and the number of rows with a value
+    """
+    locations = dict()
+    min_date = None
+    with open(file_path, "rb") as file:
+        header = file.readline()
+        columns = split_line(header.rstrip(b"\r\n"))
+        location_column = columns.index("location")
+        date_column = columns.index("date")
+        value_column = columns.index(VALUE_COLUMN)
+        position = len(header)
+        for line in file:
+            fields = split_line(line.rstrip(b"\r\n"))
+            start, position = position, position+len(line)
+            if len(fields) <= value_column:
+                continue
+            if min_date is None or fields[date_column] < min_date:
+                min_date = fields[date_column]
+            location = locations.setdefault(fields[location_column],
+                                            {"ranges":[], "count":0})
+            if location["ranges"] and location["ranges"][-1][1] == start:
+                location["ranges"][-1][1] = position
+            else:
+                location["ranges"].append([start, position])
+            if fields[value_column] != "":
+                location["count"] += 1
+    return {"columns":columns, "min_date":min_date, "locations":locations}
+
+def load_offset_index(file_path):
+    """Loads the offset index of a csv, building it if needed
+
+    The index is reused when the size and modification time of the csv match,
+    or when only the modification time changed but the content hash is the same
+
+    Args:
+        file_path: the path to the vaccinations.csv file
+
+    Returns:
+        The dictionary made by build_offset_index
+    """
+    stat = os.stat(file_path)
+    index_path = get_index_path(file_path)
+    try:
+        with open(index_path, "r") as file:
+            offset_index = json.load(file)
+    except (OSError, ValueError):
+        offset_index = None
+    if offset_index is not None and offset_index.get("version") == INDEX_VERSION and \
+       offset_index["size"] == stat.st_size:
+        if offset_index["mtime"] == stat.st_mtime_ns:
+            return offset_index
+        digest = hash_file(file_path)
+        if offset_index["digest"] == digest:
+            offset_index["mtime"] = stat.st_mtime_ns
+            write_offset_index(index_path, offset_index)
+            return offset_index
+    else:
+        digest = hash_file(file_path)
+    offset_index = build_offset_index(file_path)
+    offset_index.update(version=INDEX_VERSION, size=stat.st_size,
+                        mtime=stat.st_mtime_ns, digest=digest)
+    write_offset_index(index_path, offset_index)
+    return offset_index
+
+def write_offset_index(index_path, offset_index):
+    """Writes the offset index next to the csv
+
+    The index is written to a temporary file of its own first and then moved into
+    place, so processes that write the index at the same time never share one
+    If the index can not be written, for example in a read only folder, it is skipped
+
+    Args:
+        index_path: the path to write the index to
+        offset_index: the dictionary made by build_offset_index
+    """
+    tmp_path = None
+    try:
+        descriptor, tmp_path = tempfile.mkstemp(dir=os.path.dirname(index_path) or ".",
+                                                prefix=os.path.basename(index_path)+".",
+                                                suffix=".tmp")
+        os.chmod(tmp_path, FILE_MODE)
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(offset_index, file)
+        os.replace(tmp_path, index_path)
+    except OSError:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def read_country(file_path, offset_index, country):
+    """Parses only the rows of one country from the csv
+
+    Args:
+        file_path: the path to the vaccinations.csv file
+        offset_index: the dictionary made by build_offset_index
+        country: the name of the country to parse
+
+    Returns:
+        The days since the min_date and the people_fully_vaccinated_per_hundred
+        fractions of the rows of the country that have a value
+    """
+    chunks = []
+    with open(file_path, "rb") as file:
+        for start, end in offset_index["locations"][country]["ranges"]:
+            file.seek(start)
+            chunk = file.read(end-start)
+            chunks.append(chunk if chunk.endswith(b"\n") else chunk+b"\n")
+    raw_data = pd.read_csv(io.BytesIO(b"".join(chunks)), header=None,
+                           names=offset_index["columns"], usecols=["date", VALUE_COLUMN])
+    raw_data = raw_data.loc[raw_data[VALUE_COLUMN].notnull()]
+    dates = pd.to_datetime(raw_data["date"], format="%Y-%m-%d")
+    days = (dates-pd.Timestamp(offset_index["min_date"])).dt.days.to_numpy()
+    return days, raw_data[VALUE_COLUMN].to_numpy(dtype=np.float64)/100
+
+class LazyVaccinationSeriesStore:
+    """This Class loads the series of each country only when it is asked for
+
+    It has the same interface as VaccinationSeriesStore, so the GUI can use either
+    Each country is parsed from its byte ranges the first time it is looked at,
+    then the VaccinationSeries is kept for later
+
+    Attributes:
+        file_path: holds the path to the vaccinations.csv file
+        offset_index: holds the dictionary made by build_offset_index
+        locations: holds the name of each country with enough rows
+        positions: holds a dictionary from country name to its position in locations
+        min_date: holds the first date in the csv
+        loaded: holds the VaccinationSeries of every country parsed so far
+    """
+
+    def __init__(self, file_path, min_rows=0):
+        """Initialize the store from the offset index of the csv
+
+        Args:
+            file_path: the path to the vaccinations.csv file
+            min_rows: the minimum number of rows a country needs to be kept
+        """
+        self.file_path = file_path
+        self.offset_index = load_offset_index(file_path)
+        self.locations = [country for country, location in
+                          self.offset_index["locations"].items()
+                          if location["count"] >= min_rows and location["count"] > 0]
+        self.positions = {country:i for i, country in enumerate(self.locations)}
+        self.min_date = pd.Timestamp(self.offset_index["min_date"])
+        self.loaded = dict()
+
+    def __len__(self):
+        return len(self.locations)
+
+    def __iter__(self):
+        return iter(self.locations)
+
+    def __contains__(self, country):
+        return country in self.positions
+
+    def __getitem__(self, country):
+        if country not in self.loaded:
+            days, values = read_country(self.file_path, self.offset_index, country)
+            store = VaccinationSeriesStore([country], [0, len(days)], days, values)
+            self.loaded[country] = store[country]
+        return self.loaded[country]
@@ -2,20 +2,26 @@
 This module impliments a class called LogisticLogarithmicRegressionModel
 It transforms the y values in order to fit to a logistic curve
 It searches for whether a straight line, or a logistic curve will fit better.
-The module uses sklearn's LinearRegression
-in order to fit to a line.
+The module uses the LeastSquaresRegression
+of regression_backend in order to fit to a line.
 """
-import math
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from logistic_regression import transform_y_fit
+from kernel_backend import logarithmic
+from least_squares import get_normal_equations
+from least_squares import leading_block
+from least_squares import score_fit
+from least_squares import solve_fit
+from regression_backend import make_fit_regression
+from regression_backend import make_regression
+from logistic_regression import get_logit_target
 from logistic_regression import transform_y_predict
+from series_store import exact_values
 
 def transform_x(x_data, log_bool):
     """Transforms x values based on the bool passed in
 
     Either leaves the X value the same for a Linear Model
-    Or adds a new row that has logarithmic values
+    Or adds a new column that has logarithmic values, with the logarithmic kernel
 
     Args:
         x_data: the x values to be transformed
@@ -26,15 +32,7 @@ def transform_x(x_data, log_bool):
     """
     if not log_bool:
         return x_data
-    new_x = []
-    # Loop through each row in the list
-    for row in x_data:
-        new_values = []
-        # Loop through each possible transformation
-        for val in row:
-            new_values.append(math.log(val+2))
-        new_x.append(np.append(row, new_values))
-    return new_x
+    return logarithmic(x_data)
 
 class LogisticLogarithmicRegressionModel:
     """This Class is a wrapper in order to fit and predict a model
@@ -45,63 +43,104 @@ class LogisticLogarithmicRegressionModel:
     Then, this class can make predictions based on x values
 
     Attributes:
-        x_data: holds the x component of the data
-        y_data: holds the y component of the data
+        x_data: holds the x component of the data, or None for a model made from statistics
+        y_data: holds the y component of the data, or None for a model made from statistics
+        logit_y: holds the transformed y values, shared with other models of the series
         model: holds the trained model
         score: holds the r-squared value from the model
+        statistics: holds the FitStatistics of the model, with its residual sum of squares
+                    and adjusted r-squared value
         bool: holds a bool for whether or not to use a logarithmic transformation
     """
 
-    def __init__(self, dataframe):
+    def __init__(self, series):
         """Initialize data with X and y portions and call find_regress
 
-        Extracts the x and y values from an inputed dataframe
+        Extracts the x and y values from a VaccinationSeries
         This function sets the x_data and y_data attributes
 
         Args:
-            dataframe: a dataframe with a date and people_fully_vaccinated_per_hundred column
+            series: a VaccinationSeries with the days and
+                    people_fully_vaccinated_per_hundred values of a country
         """
-        self.x_data = dataframe["date"].to_numpy().reshape(-1, 1)
-        self.y_data = dataframe["people_fully_vaccinated_per_hundred"]
+        self.x_data = series.days.astype(np.float64).reshape(-1, 1)
+        self.y_data = exact_values(series.values)
+        self.logit_y = get_logit_target(series)
         self.find_regress()
 
+    @classmethod
+    def from_statistics(cls, statistics):
+        """Creates a model from the sufficient statistics of a series, without its rows
+
+        Solves the logarithmic curve and the line from the linear statistics,
+        which are found on the mapped days, and like find_regress only uses the
+        line if its score is better. The curve is then moved back to the days
+
+        Args:
+            statistics: the CountryStatistics of the series
+
+        Returns:
+            A LogisticLogarithmicRegressionModel that uses the better curve
+        """
+        equations = statistics.get_linear_equations()
+        model = cls.__new__(cls)
+        model.x_data = model.y_data = model.logit_y = None
+        solution, model.statistics = solve_fit(equations)
+        model.bool = True
+        tmp_solution, tmp_statistics = solve_fit(leading_block(equations, 2))
+        if tmp_statistics.r_squared > model.statistics.r_squared:
+            solution, model.statistics = tmp_solution, tmp_statistics
+            model.bool = False
+        model.score = model.statistics.r_squared
+        coefficients = solution[1:].copy()
+        coefficients[0] /= statistics.width
+        model.model = make_fit_regression(solution[0]-coefficients[0]*statistics.center,
+                                          coefficients)
+        return model
 
     def find_regress(self):
         """Checks whether a logarithmic curve or linear curve is better
 
         Creates a model for a linear and logarithmic curve and compares
         the r-squared values to decide which model to use
-        This function sets the model, score, and bool attributes
+        Both are scored from the normal equations of the logarithmic features on the
+        data, whose leading block holds those of the line
+        This function sets the model, statistics, score, and bool attributes
         """
+        equations = get_normal_equations(transform_x(self.x_data, True), self.logit_y)
         # Set an initial model and score from fitting our model
-        self.model, self.score = self.fit(True)
+        self.model, self.statistics = self.fit(True, equations)
         self.bool = True
-        tmp_model, tmp_score = self.fit(False)
+        tmp_model, tmp_statistics = self.fit(False, equations)
         # Check if this new model has a better score
-        if tmp_score > self.score:
+        if tmp_statistics.r_squared > self.statistics.r_squared:
             # If the new model has a better score, update the model, score, and regress_bool
             self.model = tmp_model
-            self.score = tmp_score
+            self.statistics = tmp_statistics
             self.bool = False
+        self.score = self.statistics.r_squared
 
-    def fit(self, log_bool):
+    def fit(self, log_bool, equations):
         """Transforms the x and y values, then fits the model, returning the model and score
 
         Calls transform_x and transform_y_fit in order to transform x and y values
-        The function then fits a model using the sklearn LinearRegression
+        The function then fits a model with make_regression, by default
+        a LeastSquaresRegression
 
         Args:
             bool: a boolean value that says whether to use a
                   logarithmic curve, is passed to transform_x
+            equations: the normal equations of the logarithmic features on the data,
+                       made by get_normal_equations, to score the model with
 
         Returns:
-            A fit model and the r-squared value from the curve
+            A fit model and the FitStatistics of the curve
         """
         x_data = transform_x(self.x_data, log_bool)
-        y_data = transform_y_fit(self.y_data.copy())
-        model = LinearRegression().fit(x_data, y_data)
-        score = model.score(x_data, y_data)
-        return model, score
+        y_data = self.logit_y
+        model = make_regression().fit(x_data, y_data)
+        statistics = score_fit(equations, np.append(model.intercept_, model.coef_))
+        return model, statistics
 
     def predict(self, x_data):
         """Creates a prediction based on x values
@@ -116,4 +155,5 @@ class LogisticLogarithmicRegressionModel:
             A list of people_fully_vaccinated_per_hundred values that the model predicts
         """
         x_data = transform_x(x_data.copy(), self.bool)
-        return transform_y_predict(self.model.predict(x_data))
+        prediction = self.model.predict(x_data)
+        return transform_y_predict(prediction, out=prediction)
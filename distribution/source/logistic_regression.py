@@ -1,48 +1,83 @@
 """
 This module impliments a class called LogisticRegressionModel
 It creates transformations on the y values in order to
-fit the data to a logistic curve. The module uses sklearn's LinearRegression
-in order to fit to a line.
+fit the data to a logistic curve. The module uses the LeastSquaresRegression
+of regression_backend in order to fit to a line.
 """
-import math
-from sklearn.linear_model import LinearRegression
+import weakref
+import numpy as np
+from kernel_backend import logit
+from kernel_backend import sigmoid
+from least_squares import leading_block
+from least_squares import solve_fit
+from regression_backend import make_fit_regression
+from regression_backend import make_regression
+from series_store import exact_values
 Y_OFFSET = .01
 Y_FIT_LIMIT = .99
 Y_FIT_REPLACEMENT = 10
 Y_TRANSFORM_LIMIT = -70
 Y_TRANSFORM_REPLACEMENT = 0
+# How close the logit argument may get to 0 or 1
+LOGIT_CLIP = 1e-12
+# The transformed values of each VaccinationSeries, dropped along with the series
+TARGET_CACHE = weakref.WeakKeyDictionary()
 
-def transform_y_fit(y_data):
+def transform_y_fit(y_data, out=None):
     """Transforms the Y values into a logistic form
 
-    Creates a lambda in order to transform all of the y values
-    Uses a list comprehension to loop through all the y values and transform them
+    Applies the logit of y+Y_OFFSET to every y value with the logit kernel
+    The argument is clipped away from 0 and 1, so the logit is always finite
+    Every y value that is not below Y_FIT_LIMIT is replaced by Y_FIT_REPLACEMENT
 
     Args:
         y_data: the people_fully_vaccinated_per_hundred column for the country
+        out: an optional float64 array of the same shape to write the result to,
+             which may be y_data itself
 
     Returns:
-        A list that holds the transformed y values
+        An array that holds the transformed y values
     """
-    # Create a lambda with formula to transform values.
-    y_limit = .01
-    transformation = lambda y: -1*math.log((1/(y+Y_OFFSET))-1)
-    return [transformation(y) if y < Y_FIT_LIMIT else Y_FIT_REPLACEMENT for y in y_data]
+    return logit(y_data, Y_OFFSET, Y_FIT_LIMIT, Y_FIT_REPLACEMENT, LOGIT_CLIP, out)
 
-def transform_y_predict(y_data):
+def transform_y_predict(y_data, out=None):
     """Transforms the Y values into the non-logistic form
 
-    Creates a lambda in order to transform all of the y values
-    Uses a list comprehension to loop through all the y values and transform them
+    Applies the sigmoid of every y value with the sigmoid kernel, then removes Y_OFFSET
+    The sigmoid is found without overflow for any y value
+    Every y value that is not above Y_TRANSFORM_LIMIT is replaced by Y_TRANSFORM_REPLACEMENT
 
     Args:
         y_data: the people_fully_vaccinated_per_hundred column for the country
+        out: an optional float64 array of the same shape to write the result to,
+             which may be y_data itself
 
     Returns:
-        A list that holds the transformed y values
+        An array that holds the transformed y values
     """
-    transformation = lambda y: (1/(1+math.exp(-1*y)))-Y_OFFSET
-    return [transformation(y) if y > Y_TRANSFORM_LIMIT else Y_TRANSFORM_REPLACEMENT for y in y_data]
+    return sigmoid(y_data, Y_OFFSET, Y_TRANSFORM_LIMIT, Y_TRANSFORM_REPLACEMENT, out)
+
+def get_logit_target(series):
+    """Returns transform_y_fit of the values of a VaccinationSeries
+
+    The result is kept in TARGET_CACHE for as long as the series exists,
+    along with the values array it was made from, so each series is
+    transformed once no matter how many models fit it
+    If the values of the series are replaced, the target is made again
+
+    Args:
+        series: a VaccinationSeries
+
+    Returns:
+        A read-only float64 array with the transformed values
+    """
+    cached = TARGET_CACHE.get(series)
+    if cached is None or cached[0] is not series.values:
+        target = transform_y_fit(exact_values(series.values))
+        target.flags.writeable = False
+        cached = (series.values, target)
+        TARGET_CACHE[series] = cached
+    return cached[1]
 
 class LogisticRegressionModel:
     """This Class is a wrapper in order to fit and predict a model
@@ -53,33 +88,57 @@ class LogisticRegressionModel:
     Then, this class can make predictions based on x values
 
     Attributes:
-        x_data: holds the x component of the data
-        y_data: holds the y component of the data
+        x_data: holds the x component of the data, or None for a model made from statistics
+        y_data: holds the y component of the data, or None for a model made from statistics
+        logit_y: holds the transformed y values, shared with other models of the series
         model: holds the trained model
         bool: holds a bool for whether or not to use a logarithmic transformation
     """
 
-    def __init__(self, dataframe):
+    def __init__(self, series):
         """Initialize data with X and y portions and call find_regress
 
-        Extracts the x and y values from an inputed dataframe
+        Extracts the x and y values from a VaccinationSeries
         This function sets the x_data and y_data attributes
 
         Args:
-            dataframe: a dataframe with a date and people_fully_vaccinated_per_hundred column
+            series: a VaccinationSeries with the days and
+                    people_fully_vaccinated_per_hundred values of a country
         """
-        self.x_data = dataframe["date"].to_numpy().reshape(-1, 1)
-        self.y_data = dataframe["people_fully_vaccinated_per_hundred"]
+        self.x_data = series.days.astype(np.float64).reshape(-1, 1)
+        self.y_data = exact_values(series.values)
+        self.logit_y = get_logit_target(series)
         self.fit()
 
+    @classmethod
+    def from_statistics(cls, statistics):
+        """Creates a model from the sufficient statistics of a series, without its rows
+
+        Solves the line from the leading block of the linear statistics, which
+        are found on the mapped days, and moves it back to the days
+
+        Args:
+            statistics: the CountryStatistics of the series
+
+        Returns:
+            A LogisticRegressionModel
+        """
+        solution, _ = solve_fit(leading_block(statistics.get_linear_equations(), 2))
+        model = cls.__new__(cls)
+        model.x_data = model.y_data = model.logit_y = None
+        slope = solution[1]/statistics.width
+        model.model = make_fit_regression(solution[0]-slope*statistics.center, [slope])
+        return model
+
     def fit(self):
         """Transforms the x and y values, then fits the model, returning the model and score
 
         Calls transform_x and transform_y_fit in order to transform x and y values
-        The function then fits a model using the sklearn LinearRegression
+        The function then fits a model with make_regression, by default
+        a LeastSquaresRegression
         """
-        y_data = transform_y_fit(self.y_data.copy())
-        self.model = LinearRegression().fit(self.x_data, y_data)
+        y_data = self.logit_y
+        self.model = make_regression().fit(self.x_data, y_data)
 
     def predict(self, x_data):
         """Creates a prediction based on x values
@@ -93,4 +152,5 @@ class LogisticRegressionModel:
         Returns:
             A list of people_fully_vaccinated_per_hundred values that the model predicts
         """
-        return transform_y_predict(self.model.predict(x_data))
+        prediction = self.model.predict(x_data)
+        return transform_y_predict(prediction, out=prediction)
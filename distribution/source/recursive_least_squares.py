@@ -0,0 +1,150 @@
+"""
+This module impliments a class called RecursiveLeastSquaresModel
+It fits the same logistic curve as LogisticRegressionModel, a line through the
+transformed y values, but consumes the observations as they arrive, one at a
+time or in micro-batches, with recursive least squares. Only the coefficients
+and their 2 by 2 covariance are kept, so the state of a country stays the same
+size no matter how many days have been consumed. An optional forgetting factor
+weighs older observations down, so the fit follows recent days more closely.
+"""
+import numpy as np
+from logistic_regression import transform_y_fit
+from logistic_regression import transform_y_predict
+from series_store import exact_values
+# The intercept and the slope of the days, also the number of observations
+# needed before the line can be solved
+PARAMETERS = 2
+
+def get_features(days):
+    """Builds the features of the days, a column of ones and the days
+
+    Args:
+        days: the days, either as a list of rows with one value or a flat list
+
+    Returns:
+        A float64 array with a row for each day
+    """
+    days = np.asarray(days, dtype=np.float64).reshape(-1)
+    return np.column_stack([np.ones(len(days)), days])
+
+class RecursiveLeastSquaresModel:
+    """This Class is a streaming version of LogisticRegressionModel
+
+    The Class accepts a series when initialized and consumes its observations
+    Then, update or catch_up consume new observations as they arrive
+    The model overall, fits to a logistic curve by transforming the y values
+    Then, this class can make predictions based on x values
+
+    Attributes:
+        forgetting: holds the forgetting factor, 1 to weigh every observation the same
+        coefficients: holds the intercept and slope of the line
+        covariance: holds the inverse of the weighted Gram matrix of the features
+        count: holds the number of observations consumed
+        last_day: holds the last day consumed, or None before any observation
+        pending: holds the days and transformed y values consumed before
+                 there were enough of them to solve the line
+    """
+
+    def __init__(self, series=None, forgetting=1.0):
+        """Initialize an empty model and consume the observations of a series
+
+        Args:
+            series: an optional VaccinationSeries with the days and
+                    people_fully_vaccinated_per_hundred values of a country
+            forgetting: the factor each older observation is weighed down by,
+                        between 0 and 1
+
+        Raises:
+            ValueError: if forgetting is not between 0 and 1
+        """
+        if not 0 < forgetting <= 1:
+            raise ValueError("The forgetting factor must be above 0 and at most 1")
+        self.forgetting = float(forgetting)
+        self.coefficients = np.zeros(PARAMETERS)
+        self.covariance = None
+        self.count = 0
+        self.last_day = None
+        self.pending = (np.zeros(0), np.zeros(0))
+        if series is not None:
+            self.update(series.days, series.values)
+
+    def update(self, days, values):
+        """Consumes a micro-batch of observations
+
+        The observations are held until there are enough of them to solve the line,
+        which is then solved exactly with least squares. Every later micro-batch
+        updates the coefficients and covariance with recursive least squares, where
+        the k observations of a micro-batch are weighed as if they had been
+        consumed one at a time
+
+        Args:
+            days: the days of the observations, in increasing order
+            values: the people_fully_vaccinated_per_hundred values of the observations
+
+        Raises:
+            ValueError: if the days are not increasing, or not after the last day consumed
+        """
+        features = get_features(days)
+        if len(features) == 0:
+            return
+        days = features[:, 1]
+        if np.any(np.diff(days) <= 0) or (self.last_day is not None and days[0] <= self.last_day):
+            raise ValueError("The observations must be in order and after the last day consumed")
+        y_data = transform_y_fit(exact_values(values).reshape(-1))
+        self.count += len(days)
+        self.last_day = float(days[-1])
+        if self.covariance is None:
+            days = np.concatenate([self.pending[0], days])
+            y_data = np.concatenate([self.pending[1], y_data])
+            self.pending = (days, y_data)
+            if len(days) < PARAMETERS:
+                return
+            features = get_features(days)
+            self.pending = (np.zeros(0), np.zeros(0))
+        # weights[i] is forgetting^(k-1-i), the weight of observation i at the end of the batch
+        weights = self.forgetting**np.arange(len(days)-1, -1, -1, dtype=np.float64)
+        if self.covariance is None:
+            gram = features.T @ (features*weights[:, None])
+            self.covariance = np.linalg.inv(gram)
+            self.coefficients = self.covariance @ (features.T @ (y_data*weights))
+        else:
+            covariance = self.covariance/self.forgetting**len(days)
+            shared = features @ covariance
+            gain = np.linalg.solve(np.diag(1/weights)+shared @ features.T, shared).T
+            self.coefficients = self.coefficients+gain @ (y_data-features @ self.coefficients)
+            self.covariance = covariance-gain @ shared
+            # Keep the covariance symmetric against rounding
+            self.covariance = (self.covariance+self.covariance.T)/2
+
+    def catch_up(self, series):
+        """Consumes the observations of a series that are after the last day consumed
+
+        Used by the streaming ingest path, where new days are appended to the
+        series of a country, so only the new days are read
+
+        Args:
+            series: the VaccinationSeries of the country, with its new days
+
+        Returns:
+            The number of observations consumed
+        """
+        start = 0
+        if self.last_day is not None:
+            start = int(np.searchsorted(series.days, self.last_day, side="right"))
+        self.update(series.days[start:], series.values[start:])
+        return len(series.days)-start
+
+    def predict(self, x_data):
+        """Creates a prediction based on x values
+
+        Makes a prediction on the line, then transforms the y value
+        into the non-logistic version, like LogisticRegressionModel
+
+        Args:
+            x_data: A list of the dates to make a prediction on
+
+        Returns:
+            A list of people_fully_vaccinated_per_hundred values that the model predicts
+        """
+        prediction = get_features(x_data) @ self.coefficients
+        return transform_y_predict(prediction, out=prediction)
@@ -0,0 +1,230 @@
+"""
+This module writes a VaccinationSeriesStore to a memory-mapped file
+The file holds a fixed header, the offsets of each country, the int16 days,
+the float32 values, and the table of locations, each at a fixed position.
+Any process can open the file read-only and use the arrays without copying them,
+so several processes on one host share the data through the page cache
+and start without parsing anything.
+"""
+import os
+import struct
+import tempfile
+import numpy as np
+import pandas as pd
+from incremental_ingest import ingest_vaccinations
+from series_store import DAY_DTYPE
+from series_store import VALUE_DTYPE
+from series_store import VaccinationSeriesStore
+SHARED_SUFFIX = ".series"
+# The permissions of a written file, which mkstemp would otherwise make private
+FILE_MODE = 0o644
+MAGIC = b"VXSERIES"
+SHARED_VERSION = 1
+# magic, version, min_rows, locations, rows, names size, min_date, csv size, csv mtime
+HEADER = struct.Struct("<8sIIQQQqqq")
+ALIGNMENT = 64
+
+def get_shared_path(file_path, min_rows):
+    """Returns the path of the shared series file for a csv file
+
+    Each min_rows has its own file, so processes that keep different countries
+    do not overwrite each other's file
+
+    Args:
+        file_path: the path to the vaccinations.csv file
+        min_rows: the minimum number of rows the countries are kept with
+
+    Returns:
+        The path the shared series file is stored at, next to the csv file
+    """
+    return file_path+"."+str(min_rows)+SHARED_SUFFIX
+
+def align(position):
+    """Rounds a position in the file up to the next section boundary
+
+    Args:
+        position: a byte position in the file
+
+    Returns:
+        The first position at or after position that is a multiple of ALIGNMENT
+    """
+    return -(-position//ALIGNMENT)*ALIGNMENT
+
+def get_layout(locations, rows, names_size):
+    """Finds where each section of the file starts
+
+    Args:
+        locations: the number of countries in the file
+        rows: the number of rows in the file
+        names_size: the number of bytes in the table of location names
+
+    Returns:
+        A dictionary from each section name to its start position,
+        and the total size of the file
+    """
+    layout = dict()
+    position = HEADER.size
+    sections = [("offsets", (locations+1)*8), ("days", rows*np.dtype(DAY_DTYPE).itemsize),
+                ("values", rows*np.dtype(VALUE_DTYPE).itemsize),
+                ("name_offsets", (locations+1)*8), ("names", names_size)]
+    for name, size in sections:
+        position = align(position)
+        layout[name] = position
+        position += size
+    return layout, position
+
+def write_shared_series(shared_path, store, min_date, min_rows, signature):
+    """Writes a store to a shared series file
+
+    The file is written to a temporary file of its own first and then moved into
+    place, so processes that already mapped the old file keep a consistent view,
+    and processes that write the file at the same time never share a temporary file
+
+    Args:
+        shared_path: the path to write the file to
+        store: the VaccinationSeriesStore to write
+        min_date: the first date in the csv
+        min_rows: the minimum number of rows the countries were kept with
+        signature: a tuple holding the size and modification time of the csv
+    """
+    encoded = [country.encode("utf-8") for country in store.locations]
+    name_offsets = np.concatenate(([0], np.cumsum([len(name) for name in encoded])))
+    names = b"".join(encoded)
+    layout, size = get_layout(len(store), len(store.days), len(names))
+    min_day = int(np.datetime64(pd.Timestamp(min_date), "D").astype(np.int64))
+    tmp_path = None
+    try:
+        descriptor, tmp_path = tempfile.mkstemp(dir=os.path.dirname(shared_path) or ".",
+                                                prefix=os.path.basename(shared_path)+".",
+                                                suffix=".tmp")
+        os.chmod(tmp_path, FILE_MODE)
+        with os.fdopen(descriptor, "wb") as file:
+            file.truncate(size)
+            file.write(HEADER.pack(MAGIC, SHARED_VERSION, min_rows, len(store),
+                                   len(store.days), len(names), min_day, *signature))
+            for name, data in [("offsets", store.offsets.astype("<i8").tobytes()),
+                               ("days", store.days.astype("<i2").tobytes()),
+                               ("values", store.values.astype("<f4").tobytes()),
+                               ("name_offsets", name_offsets.astype("<i8").tobytes()),
+                               ("names", names)]:
+                file.seek(layout[name])
+                file.write(data)
+        os.replace(tmp_path, shared_path)
+    except OSError:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def read_header(shared_path):
+    """Reads the header of a shared series file
+
+    Args:
+        shared_path: the path to the shared series file
+
+    Returns:
+        A tuple with the fields of the header, or None if the file is
+        missing or is not a shared series file of this version
+    """
+    try:
+        with open(shared_path, "rb") as file:
+            header = file.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) != HEADER.size:
+        return None
+    header = HEADER.unpack(header)
+    if header[0] != MAGIC or header[1] != SHARED_VERSION:
+        return None
+    return header
+
+def open_shared_series(shared_path):
+    """Opens a shared series file read-only without copying its arrays
+
+    Args:
+        shared_path: the path to the shared series file
+
+    Returns:
+        A VaccinationSeriesStore whose arrays are views of the mapped file,
+        and the min_date
+    """
+    _, _, _, locations, rows, names_size, min_day, _, _ = read_header(shared_path)
+    layout, _ = get_layout(locations, rows, names_size)
+    mapped = np.memmap(shared_path, dtype=np.uint8, mode="r")
+    offsets = np.frombuffer(mapped, dtype="<i8", count=locations+1, offset=layout["offsets"])
+    days = np.frombuffer(mapped, dtype="<i2", count=rows, offset=layout["days"])
+    values = np.frombuffer(mapped, dtype="<f4", count=rows, offset=layout["values"])
+    name_offsets = np.frombuffer(mapped, dtype="<i8", count=locations+1,
+                                 offset=layout["name_offsets"])
+    names = mapped[layout["names"]:layout["names"]+names_size].tobytes()
+    countries = [names[name_offsets[i]:name_offsets[i+1]].decode("utf-8")
+                 for i in range(locations)]
+    min_date = pd.Timestamp(np.datetime64(min_day, "D"))
+    return VaccinationSeriesStore(countries, offsets, days, values), min_date
+
+def is_fresh(header, min_rows, stat):
+    """Checks whether a shared series file was made from the csv as it is now
+
+    Args:
+        header: the tuple read by read_header, or None
+        min_rows: the minimum number of rows a country needs to be kept
+        stat: the os.stat result of the csv
+
+    Returns:
+        True if the shared file can be mapped instead of ingesting the csv
+    """
+    return header is not None and header[2] == min_rows and \
+           header[7:] == (stat.st_size, stat.st_mtime_ns)
+
+def iter_shared_store(file_path, min_rows):
+    """Loads the store of a csv like load_shared_store, one country at a time
+
+    If the shared file is fresh, it is mapped and every country is ready at once
+    Otherwise the csv is ingested, each country is yielded as soon as its
+    partition is copied into the store, and the shared file is written after the last
+
+    Args:
+        file_path: the path to the vaccinations.csv file
+        min_rows: the minimum number of rows a country needs to be kept
+
+    Yields:
+        The VaccinationSeriesStore, the min_date, and the name of a country
+        whose series can now be used, for each kept country in alphabetical order
+    """
+    stat = os.stat(file_path)
+    shared_path = get_shared_path(file_path, min_rows)
+    if is_fresh(read_header(shared_path), min_rows, stat):
+        store, min_date = open_shared_series(shared_path)
+        for country in sorted(store):
+            yield store, min_date, country
+        return
+    index, min_date, _ = ingest_vaccinations(file_path)
+    store, index = VaccinationSeriesStore.allocate(index, min_rows)
+    for country in sorted(store):
+        store.fill(index, country)
+        yield store, pd.Timestamp(min_date), country
+    write_shared_series(shared_path, store, min_date, min_rows,
+                        (stat.st_size, stat.st_mtime_ns))
+
+def load_shared_store(file_path, min_rows):
+    """Loads the store of a csv from its shared series file
+
+    If the shared file was made from the csv as it is now, it is mapped directly
+    Otherwise the csv is ingested, and the shared file is written again
+
+    Args:
+        file_path: the path to the vaccinations.csv file
+        min_rows: the minimum number of rows a country needs to be kept
+
+    Returns:
+        A VaccinationSeriesStore holding the kept countries, and the min_date
+    """
+    stat = os.stat(file_path)
+    shared_path = get_shared_path(file_path, min_rows)
+    if is_fresh(read_header(shared_path), min_rows, stat):
+        return open_shared_series(shared_path)
+    index, min_date, _ = ingest_vaccinations(file_path)
+    store = VaccinationSeriesStore.from_index(index, min_rows)
+    write_shared_series(shared_path, store, min_date, min_rows,
+                        (stat.st_size, stat.st_mtime_ns))
+    if read_header(shared_path) is None:
+        return store, pd.Timestamp(min_date)
+    return open_shared_series(shared_path)
@@ -0,0 +1,311 @@
+"""
+This module keeps the sufficient statistics of the models of every country
+For a least squares fit these are X^T X, X^T y, y^T y and n, found on the
+transformed features and y values. A fit and its r-squared value only need them,
+so when new days are added to a series the statistics are updated with the new
+rows alone, without reading the old rows. Every model class can be made from
+the statistics of a country with its from_statistics.
+
+The logistic and logistic logarithmic models share the features 1, u, log(x+2)
+fit to the transformed y values, where u is the days mapped to [-1, 1] with the
+center and half width of the series. The polynomial models share the Chebyshev
+polynomials T_0(u), ..., T_MAX_DEGREE(u), fit to the y values and the transformed
+y values. Every model solves a leading block of these. When new days fall outside
+the days the mapping was made for, the statistics are moved to the mapping of the
+wider range with a change of basis, so u stays in [-1, 1] and the Chebyshev
+Gram matrix stays well conditioned.
+
+The statistics of every country can be kept in a file. If the rows a country's
+statistics were made from are revised, they are made again.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+from logistic_regression import transform_y_fit
+from polynomial_regression import MAX_DEGREE
+from polynomial_regression import get_mapping
+from polynomial_regression import transform_x
+from series_store import exact_values
+STATISTICS_SUFFIX = ".stats.npz"
+# Version 2 keeps the polynomial statistics in the Chebyshev basis
+STATISTICS_VERSION = 2
+# The columns 1, u, log(x+2)
+LINEAR_COLUMNS = 3
+# The y values and the transformed y values
+TARGETS = 2
+# The permissions of a written file, which mkstemp would otherwise make private
+FILE_MODE = 0o644
+
+def get_statistics_path(artifact_path):
+    """Returns the path of the statistics kept for a file the creators write
+
+    Args:
+        artifact_path: the path to the file
+
+    Returns:
+        The path the statistics are stored at, next to the file
+    """
+    return artifact_path+STATISTICS_SUFFIX
+
+def hash_rows(series, count):
+    """Hashes the first rows of a VaccinationSeries
+
+    Args:
+        series: a VaccinationSeries
+        count: the number of rows to hash
+
+    Returns:
+        The sha256 hex digest of the days and values of the rows
+    """
+    digest = hashlib.sha256()
+    digest.update(series.days[:count].tobytes())
+    digest.update(series.values[:count].tobytes())
+    return digest.hexdigest()
+
+class CountryStatistics:
+    """This Class holds the sufficient statistics of the models of one country
+
+    Attributes:
+        center: holds the center the days are mapped with
+        width: holds the half width the days are mapped with
+        count: holds the number of rows added
+        digest: holds the hash of the rows added, made by hash_rows
+        linear_gram: holds X^T X of the features 1, u, log(x+2)
+        linear_moments: holds X^T y of them with the transformed y values
+        linear_squares: holds y^T y of the transformed y values
+        polynomial_gram: holds X^T X of the features T_0(u), ..., T_MAX_DEGREE(u)
+        polynomial_moments: holds a column of X^T y of them for each of TARGETS
+        polynomial_squares: holds y^T y for each of TARGETS
+    """
+
+    def __init__(self, center, width):
+        """Initialize empty statistics with the mapping of the days
+
+        Args:
+            center: the center the days are mapped with
+            width: the half width the days are mapped with
+        """
+        self.center = float(center)
+        self.width = float(width)
+        self.count = 0
+        self.digest = ""
+        self.linear_gram = np.zeros((LINEAR_COLUMNS, LINEAR_COLUMNS))
+        self.linear_moments = np.zeros(LINEAR_COLUMNS)
+        self.linear_squares = 0.0
+        self.polynomial_gram = np.zeros((MAX_DEGREE+1, MAX_DEGREE+1))
+        self.polynomial_moments = np.zeros((MAX_DEGREE+1, TARGETS))
+        self.polynomial_squares = np.zeros(TARGETS)
+
+    @classmethod
+    def from_series(cls, series):
+        """Makes the statistics of a series from all of its rows
+
+        Args:
+            series: a VaccinationSeries
+
+        Returns:
+            A CountryStatistics mapped with the first and last day of the series
+        """
+        statistics = cls(*get_mapping(series.days.astype(np.float64)))
+        statistics.digest = hash_rows(series, 0)
+        statistics.catch_up(series)
+        return statistics
+
+    def remap(self, lowest, highest):
+        """Moves the statistics to the mapping of other days, without the rows
+
+        Each Chebyshev polynomial of the old mapped days is a polynomial of the
+        same degree of the new mapped days, so the basis of any row is its old basis
+        times a change of basis matrix. The matrix is found from both bases at
+        MAX_DEGREE+1 Chebyshev nodes, where the new basis is well conditioned
+
+        Args:
+            lowest: the first day the new mapping sends to -1
+            highest: the last day the new mapping sends to 1
+        """
+        center, width = (highest+lowest)/2, (highest-lowest)/2 or 1
+        # The old mapped days are scale*u+shift of the new mapped days u
+        scale = width/self.width
+        shift = (center-self.center)/self.width
+        nodes = np.cos(np.pi*(np.arange(MAX_DEGREE+1)+.5)/(MAX_DEGREE+1))
+        new_basis = np.column_stack([np.ones(len(nodes)), transform_x(nodes, MAX_DEGREE)])
+        old_basis = np.column_stack([np.ones(len(nodes)),
+                                     transform_x(scale*nodes+shift, MAX_DEGREE)])
+        change = np.linalg.solve(old_basis, new_basis)
+        self.polynomial_gram = change.T @ self.polynomial_gram @ change
+        self.polynomial_moments = change.T @ self.polynomial_moments
+        # The new features 1, u, log(x+2) from the old ones, one column each
+        change = np.array([[1, -shift/scale, 0], [0, 1/scale, 0], [0, 0, 1]])
+        self.linear_gram = change.T @ self.linear_gram @ change
+        self.linear_moments = change.T @ self.linear_moments
+        self.center = float(center)
+        self.width = float(width)
+
+    def add(self, days, values, logit_y):
+        """Adds rows to the statistics with a rank-k update
+
+        If a day of the rows is outside the days the mapping was made for,
+        the statistics are first remapped to cover it
+
+        Args:
+            days: the days of the rows
+            values: the people_fully_vaccinated_per_hundred values of the rows
+            logit_y: the transformed values of the rows
+        """
+        days = np.asarray(days, dtype=np.float64)
+        logit_y = np.asarray(logit_y, dtype=np.float64)
+        lowest, highest = self.center-self.width, self.center+self.width
+        if len(days) and (days.min() < lowest or days.max() > highest):
+            self.remap(min(lowest, days.min()), max(highest, days.max()))
+        u_data = (days-self.center)/self.width
+        linear = np.column_stack([np.ones(len(days)), u_data, np.log(days+2)])
+        self.linear_gram += linear.T @ linear
+        self.linear_moments += linear.T @ logit_y
+        self.linear_squares += logit_y @ logit_y
+        basis = np.column_stack([np.ones(len(days)), transform_x(u_data, MAX_DEGREE)])
+        targets = np.column_stack([np.asarray(values, dtype=np.float64), logit_y])
+        self.polynomial_gram += basis.T @ basis
+        self.polynomial_moments += basis.T @ targets
+        self.polynomial_squares += np.sum(targets**2, axis=0)
+        self.count += len(days)
+
+    def catch_up(self, series):
+        """Adds the rows of a series that are after the rows already added
+
+        Args:
+            series: the VaccinationSeries the statistics were made from, with its new rows
+
+        Returns:
+            The number of rows added
+
+        Raises:
+            ValueError: if the rows already added were revised in the series,
+                        so the statistics have to be made again
+        """
+        length = len(series.days)
+        if length < self.count or hash_rows(series, self.count) != self.digest:
+            raise ValueError("The rows of "+str(series.country)+" were revised")
+        start = self.count
+        values = exact_values(series.values[start:])
+        self.add(series.days[start:], values, transform_y_fit(values))
+        self.digest = hash_rows(series, length)
+        return length-start
+
+    def get_linear_equations(self):
+        """Returns the normal equations of the features 1, u, log(x+2)
+
+        Returns:
+            A tuple of X^T X, X^T y, y^T y and n like the one made by
+            least_squares.get_normal_equations, with the transformed y values
+        """
+        return self.linear_gram, self.linear_moments, self.linear_squares, self.count
+
+    def get_polynomial_equations(self, target):
+        """Returns the normal equations of the features T_0(u), ..., T_MAX_DEGREE(u)
+
+        Args:
+            target: 0 for the y values, 1 for the transformed y values
+
+        Returns:
+            A tuple of X^T X, X^T y, y^T y and n like the one made by
+            least_squares.get_normal_equations
+        """
+        return (self.polynomial_gram, self.polynomial_moments[:, target],
+                float(self.polynomial_squares[target]), self.count)
+
+def update_country(statistics, series):
+    """Brings the statistics of one series up to date
+
+    Args:
+        statistics: the CountryStatistics of the series, or None if it has none yet
+        series: a VaccinationSeries
+
+    Returns:
+        The CountryStatistics with the new rows added, or new ones made from
+        every row if there were none or the rows they were made from were revised
+    """
+    if statistics is not None:
+        try:
+            statistics.catch_up(series)
+            return statistics
+        except ValueError:
+            pass
+    return CountryStatistics.from_series(series)
+
+def read_statistics(statistics_path, settings):
+    """Reads the statistics of every country from a file
+
+    Args:
+        statistics_path: the path to the statistics file
+        settings: a dictionary of the settings the statistics were made with,
+                  like the one made by artifact_manifest.get_settings
+
+    Returns:
+        A dictionary from country to its CountryStatistics, or an empty dictionary
+        if the file is missing, can not be read, or was written with other settings
+    """
+    try:
+        with np.load(statistics_path, allow_pickle=False) as file:
+            data = {key:file[key] for key in file.files}
+    except (OSError, ValueError):
+        return dict()
+    if "version" not in data or int(data["version"]) != STATISTICS_VERSION or \
+       str(data["settings"]) != json.dumps(settings, sort_keys=True):
+        return dict()
+    statistics = dict()
+    for i, country in enumerate(data["locations"].tolist()):
+        current = CountryStatistics(data["centers"][i], data["widths"][i])
+        current.count = int(data["counts"][i])
+        current.digest = str(data["digests"][i])
+        current.linear_gram = data["linear_grams"][i]
+        current.linear_moments = data["linear_moments"][i]
+        current.linear_squares = float(data["linear_squares"][i])
+        current.polynomial_gram = data["polynomial_grams"][i]
+        current.polynomial_moments = data["polynomial_moments"][i]
+        current.polynomial_squares = data["polynomial_squares"][i]
+        statistics[country] = current
+    return statistics
+
+def write_statistics(statistics_path, statistics, settings):
+    """Writes the statistics of every country to a file
+
+    The file is written to a temporary file of its own first and then moved into
+    place, so processes that write the file at the same time never share a
+    temporary file
+    If the file can not be written, for example in a read only folder, it is skipped
+
+    Args:
+        statistics_path: the path to the statistics file
+        statistics: a dictionary from country to its CountryStatistics
+        settings: a dictionary of the settings the statistics were made with
+    """
+    values = list(statistics.values())
+    tmp_path = None
+    try:
+        descriptor, tmp_path = tempfile.mkstemp(dir=os.path.dirname(statistics_path) or ".",
+                                                prefix=os.path.basename(statistics_path)+".",
+                                                suffix=".tmp")
+        os.chmod(tmp_path, FILE_MODE)
+        with os.fdopen(descriptor, "wb") as file:
+            np.savez(file, version=STATISTICS_VERSION,
+                     settings=json.dumps(settings, sort_keys=True),
+                     locations=np.array(list(statistics), dtype=str),
+                     centers=np.array([current.center for current in values]),
+                     widths=np.array([current.width for current in values]),
+                     counts=np.array([current.count for current in values], dtype=np.int64),
+                     digests=np.array([current.digest for current in values], dtype=str),
+                     linear_grams=np.array([current.linear_gram for current in values]),
+                     linear_moments=np.array([current.linear_moments for current in values]),
+                     linear_squares=np.array([current.linear_squares for current in values]),
+                     polynomial_grams=np.array([current.polynomial_gram
+                                                for current in values]),
+                     polynomial_moments=np.array([current.polynomial_moments
+                                                  for current in values]),
+                     polynomial_squares=np.array([current.polynomial_squares
+                                                  for current in values]))
+        os.replace(tmp_path, statistics_path)
+    except OSError:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,166 @@
+"""
+This module keeps a compact binary cache of vaccinations.csv
+The cache is stored next to the csv file and holds the CountryIndex of the data,
+with the day offsets, people_fully_vaccinated_per_hundred values, and locations.
+The cache is keyed by the size, modification time, and content hash of the csv,
+so when the csv has not changed the csv does not need to be parsed again.
+"""
+import hashlib
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from country_index import CountryIndex
+CACHE_SUFFIX = ".cache.npz"
+CACHE_VERSION = 2
+HASH_CHUNK_SIZE = 1 << 20
+# The permissions of a written file, which mkstemp would otherwise make private
+FILE_MODE = 0o644
+
+def get_cache_path(file_path):
+    """Returns the path of the cache file for a csv file
+
+    Args:
+        file_path: the path to the vaccinations.csv file
+
+    Returns:
+        The path the cache is stored at, next to the csv file
+    """
+    return file_path + CACHE_SUFFIX
+
+def hash_file(file_path):
+    """Creates a hash of the contents of a file
+
+    Reads the file in chunks so the whole file is never held in memory
+
+    Args:
+        file_path: the path to the file to hash
+
+    Returns:
+        A string holding the sha256 hex digest of the file
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def parse_vaccinations(file_path):
+    """Parses vaccinations.csv into a CountryIndex
+
+    Reads only the location, date, and people_fully_vaccinated_per_hundred columns
+    Converts the dates into days since the first date in the file
+    Drops the rows without a people_fully_vaccinated_per_hundred value
+    Then partitions the rows by country
+
+    Args:
+        file_path: the path to the vaccinations.csv file
+
+    Returns:
+        A CountryIndex holding the data of every country and the min_date
+    """
+    raw_data = pd.read_csv(file_path, usecols=["location", "date",
+                                               "people_fully_vaccinated_per_hundred"])
+    dates = pd.to_datetime(raw_data["date"], format="%Y-%m-%d")
+    min_date = dates.min()
+    raw_data["date"] = (dates-min_date).dt.days.to_numpy(dtype=np.int32)
+    raw_data = raw_data.loc[raw_data["people_fully_vaccinated_per_hundred"].notnull()]
+    raw_data = raw_data.assign(people_fully_vaccinated_per_hundred=
+                               raw_data["people_fully_vaccinated_per_hundred"]/100)
+    return CountryIndex.from_dataframe(raw_data), np.datetime64(min_date, "D")
+
+def read_cache(cache_path):
+    """Reads a cache file
+
+    Args:
+        cache_path: the path to the cache file
+
+    Returns:
+        A dictionary holding the cached arrays and the signature of the csv
+        they were made from, or None if the cache is missing or unreadable
+    """
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            data = {key:cache[key] for key in cache.files}
+    except (OSError, ValueError):
+        return None
+    if "version" not in data or int(data["version"]) != CACHE_VERSION:
+        return None
+    return data
+
+def write_cache(cache_path, index, min_date, signature):
+    """Writes the index and the signature of the csv to a cache file
+
+    The cache is written to a temporary file of its own first and then moved into
+    place, so a reader never sees a partially written cache, and processes
+    that write the cache at the same time never share a temporary file
+    If the cache can not be written, for example in a read only folder, it is skipped
+
+    Args:
+        cache_path: the path to the cache file
+        index: the CountryIndex made by parse_vaccinations
+        min_date: the first date in the csv
+        signature: a tuple holding the size, modification time and hash of the csv
+    """
+    size, mtime, digest = signature
+    tmp_path = None
+    try:
+        descriptor, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path) or ".",
+                                                prefix=os.path.basename(cache_path)+".",
+                                                suffix=".tmp")
+        os.chmod(tmp_path, FILE_MODE)
+        with os.fdopen(descriptor, "wb") as file:
+            np.savez(file, version=CACHE_VERSION, size=size, mtime=mtime, digest=digest,
+                     locations=np.array(index.locations, dtype=str), starts=index.starts,
+                     ends=index.ends, days=index.days, values=index.values,
+                     min_date=min_date)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def load_vaccinations(file_path):
+    """Loads the partitioned vaccination data, using the cache when possible
+
+    If the size and modification time of the csv match the cache, the cache is used
+    If only the modification time changed, the content hash decides whether
+    the cache is still valid
+    Otherwise the csv is parsed and the cache is rewritten
+
+    Args:
+        file_path: the path to the vaccinations.csv file
+
+    Returns:
+        A CountryIndex holding the data of every country and the min_date
+    """
+    stat = os.stat(file_path)
+    cache_path = get_cache_path(file_path)
+    cache = read_cache(cache_path)
+    digest = None
+    if cache is not None and int(cache["size"]) == stat.st_size:
+        if int(cache["mtime"]) == stat.st_mtime_ns:
+            return extract_index(cache)
+        digest = hash_file(file_path)
+        if str(cache["digest"]) == digest:
+            index, min_date = extract_index(cache)
+            write_cache(cache_path, index, min_date,
+                        (stat.st_size, stat.st_mtime_ns, digest))
+            return index, min_date
+    if digest is None:
+        digest = hash_file(file_path)
+    index, min_date = parse_vaccinations(file_path)
+    write_cache(cache_path, index, min_date, (stat.st_size, stat.st_mtime_ns, digest))
+    return index, min_date
+
+def extract_index(cache):
+    """Rebuilds the CountryIndex stored in a cache
+
+    Args:
+        cache: the dictionary read by read_cache
+
+    Returns:
+        The CountryIndex made by parse_vaccinations and the min_date
+    """
+    index = CountryIndex(cache["locations"].tolist(), cache["starts"], cache["ends"],
+                         cache["days"], cache["values"])
+    return index, cache["min_date"][()]
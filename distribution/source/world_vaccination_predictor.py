@@ -8,32 +8,43 @@ The prediction is made by transforming the y values into a Logistic curve, then
 to a Linear Regression of a straight line, or a Logarithmic Curve.
 """
 
+import os
+import sys
 import tkinter as tk_gui_library
 from tkinter import ttk as ttk_gui_library
 import warnings
 import datetime
+import threading
+import queue
 from tkcalendar import Calendar
-import pandas as pd
+import numpy as np
 from polynomial_regression import PolynomialRegressionModel
 from logistic_regression import LogisticRegressionModel
 from logistic_logarithmic_regression import LogisticLogarithmicRegressionModel
 from logistic_polynomial_regression import LogisticPolynomialRegressionModel
+from recursive_least_squares import RecursiveLeastSquaresModel
+from sufficient_statistics import update_country
+from shared_series import iter_shared_store
+from lazy_series_store import LazyVaccinationSeriesStore
+from series_store import exact_values
+from data_fetcher import DEFAULT_URL
+from data_fetcher import URL_VARIABLE
+from data_fetcher import fetch_file
 # Imports needed for PyInstaller
-import sklearn.utils._weight_vector
 import babel.numbers
 warnings.filterwarnings("ignore")
+# Milliseconds between checks for countries loaded by the worker thread
+POLL_INTERVAL = 50
+# Downloads vaccinations.csv before starting, if it changed
+FETCH_OPTION = "--fetch"
+# The models predict solves from the sufficient statistics of a country
+STATISTICS_MODELS = ["Polynomial", "Logistic", "Logistic Logarithmic", "Logistic Polynomial"]
 
-def extract_data():
-    """Extract data from vaccinations.csv
-
-    Creates a data frame from vaccinations.csv
-    Transforms the data into data that is useable by models
-    Then extracts data from each country
+def read_config():
+    """Reads config.txt
 
     Returns:
-        A dictionary where the key is the country and
-        the value holds information for later, for now just the data
-        and the min_date which is just the minimum of the date column
+        The path to vaccinations.csv, and whether Lazy Load is True
     """
     try:
         file = open("config.txt", "r")
@@ -42,24 +53,100 @@ def extract_data():
         exit()
     config_commands = file.read().split("\n")
     file_path = config_commands[0].split(":")[1]
-    raw_data = pd.read_csv(file_path)
+    lazy_load = len(config_commands) > 1 and config_commands[1].split(":")[-1].strip() == "True"
     file.close()
-    raw_data = raw_data[["location", "date", "people_fully_vaccinated_per_hundred"]]
-    raw_data.date = pd.to_datetime(raw_data.date, format="%Y-%m-%d")
-    min_date = raw_data.date.min()
-    raw_data.date = raw_data.date-min_date
-    raw_data.date = pd.Series([x.days for x in raw_data.date])
-    raw_data.drop(raw_data.loc[raw_data.people_fully_vaccinated_per_hundred.isnull()].index,
-                  axis=0, inplace=True)
-    raw_data["people_fully_vaccinated_per_hundred"] /= 100
-
-    data_dict = dict()
-    for country in raw_data.location.unique():
-        if len(raw_data.loc[raw_data.location == country]) >= 100:
-            tmp_data = raw_data.loc[raw_data.location == country]
-            tmp_data.drop("location", axis=1, inplace=True)
-            data_dict[country] = {"data":tmp_data}
-    return data_dict, min_date
+    return file_path, lazy_load
+
+def fetch_data(file_path):
+    """Downloads vaccinations.csv if it changed since the last download
+
+    If the download fails, the vaccinations.csv that is already there is used
+
+    Args:
+        file_path: the path to the vaccinations.csv file
+    """
+    try:
+        fetch_file(os.environ.get(URL_VARIABLE, DEFAULT_URL), file_path)
+    except (OSError, ValueError) as error:
+        print("Could not update "+file_path+": "+str(error))
+
+def extract_data(file_path, lazy_load):
+    """Extract data from vaccinations.csv, one country at a time
+
+    Maps the VaccinationSeriesStore of the countries with at least 100 entries
+    from the shared series file next to vaccinations.csv
+    If the csv changed, only what changed is ingested, each country is ready
+    as soon as its partition is built, and the shared file is rewritten
+    If lazy_load is True, only the offset index of the csv is loaded, every
+    country is ready once it is scanned, and each country is parsed the first
+    time it is used
+
+    Args:
+        file_path: the path to the vaccinations.csv file
+        lazy_load: whether to load each country the first time it is used
+
+    Yields:
+        The store holding the data of each country, the min_date which is just
+        the minimum of the date column, and the name of a country that is ready
+    """
+    if lazy_load:
+        store = LazyVaccinationSeriesStore(file_path, 100)
+        for country in sorted(store):
+            yield store, store.min_date, country
+    else:
+        yield from iter_shared_store(file_path, 100)
+
+def load_data(file_path, lazy_load, results, requests):
+    """Loads the data on a worker thread
+
+    Puts the store and min_date on the results queue before the first country,
+    then the name of each country as soon as it is ready
+    If lazy_load is True, the worker then parses the rows of each country put on
+    the requests queue, and puts its series on the results queue, so no rows are
+    parsed on the Tk thread
+    The worker never touches the widgets, the Tk thread reads the queue
+
+    Args:
+        file_path: the path to the vaccinations.csv file
+        lazy_load: whether Lazy Load is True in config.txt
+        results: a queue the Tk thread reads the loaded data from
+        requests: a queue the Tk thread puts the countries it needs the series of on
+    """
+    try:
+        loaded = None
+        for store, min_date, country in extract_data(file_path, lazy_load):
+            if store is not loaded:
+                results.put(("store", store, min_date))
+                loaded = store
+            results.put(("country", country))
+    except Exception as error:
+        results.put(("error", str(error)))
+        return
+    results.put(("done",))
+    if lazy_load:
+        for country in iter(requests.get, None):
+            try:
+                results.put(("series", country, loaded[country]))
+            except Exception as error:
+                results.put(("error", str(error)))
+                return
+
+def start_loading(file_path, lazy_load):
+    """Starts loading the data on a worker thread
+
+    Args:
+        file_path: the path to the vaccinations.csv file
+        lazy_load: whether Lazy Load is True in config.txt
+
+    Returns:
+        The queue the worker thread puts the loaded data on, and the queue
+        it reads the countries to parse from
+    """
+    results = queue.Queue()
+    requests = queue.Queue()
+    threading.Thread(target=load_data, args=(file_path, lazy_load, results, requests),
+                     daemon=True).start()
+    return results, requests
 
 def create_frames(frames):
     """Create initial frame structure
@@ -84,13 +171,13 @@ tk
 def create_options(dependencies):
     """Create the options to be displayed in the listbox
 
-    Creates a list of countries to be displayed in the listbox
+    Creates an empty list of countries, which is filled as they are loaded
 
     Args:
         dependencies:
             A dictionary holding all the dependencies
     """
-    dependencies["options"] = sorted(dependencies["data_dict"].keys())
+    dependencies["options"] = []
 
 def create_labels(mainframe, widgets, dependencies):
     """Creates 3 labels
@@ -108,8 +195,7 @@ def create_labels(mainframe, widgets, dependencies):
             A dictionary that holds all the label widgets
     """
     labels = dict()
-    labels["country"] = ttk_gui_library.Label(mainframe, text="Selected Country: "+
-                                             dependencies["options"][0])
+    labels["country"] = ttk_gui_library.Label(mainframe, text="Loading Countries...")
     labels["country"].grid(column=3, row=0)
 
     labels["actual"] = ttk_gui_library.Label(mainframe, text="Actual")
@@ -163,13 +249,16 @@ def create_model_selector(mainframe, widgets, dependencies):
     """
     listbox = tk_gui_library.Listbox(mainframe)
     listbox.grid(row=10, column=0, rowspan=4)
-    options = ["Polynomial", "Logistic", "Logistic Logarithmic", "Logistic Polynomial"]
+    options = ["Polynomial", "Logistic", "Logistic Logarithmic", "Logistic Polynomial",
+               "Polynomial Ridge", "Logistic Polynomial Ridge", "Streaming Logistic"]
     for values in options:
         listbox.insert(tk_gui_library.END, values)
     widgets["model_selector"] = listbox
     widgets["model"] = ttk_gui_library.Label(mainframe, text="Selected Model: Logistic Logarithmic")
     widgets["model"].grid(column=3, row=2)
     dependencies["model"] = "Logistic Logarithmic"
+    dependencies["streaming"] = dict()
+    dependencies["statistics"] = dict()
 
 def create_cal(mainframe, widgets):
     """Creates a calender to pick dates
@@ -221,12 +310,37 @@ def pad_widgets(mainframe, date):
                                 tk_gui_library.W,
                                 tk_gui_library.S))
 
+def select_country(widgets, dependencies, country):
+    """Selects a country
+
+    Updates the selected_country in dependencies and the label on the screen
+    displaying the selected country
+    With a LazyVaccinationSeriesStore, the worker thread is asked for the series,
+    which parses the rows of the country the first time it is selected, and
+    receive_data sets the series once it is put on the results queue
+    Otherwise the series is set right away
+
+    Args:
+        widgets:
+            A dictionary holding all of the widgets
+        dependencies:
+            A dictionary holding all of the dependencies
+        country:
+            The name of the country to select
+    """
+    dependencies["selected_country"] = country
+    widgets["labels"]["country"].config(text="Selected Country: "+country)
+    if dependencies["lazy_load"]:
+        # Nothing is predicted for the old series while the new one is parsed
+        dependencies.pop("series", None)
+        dependencies["requests"].put(country)
+    else:
+        dependencies["series"] = dependencies["store"][country]
+
 def update_selected_country(widgets, dependencies):
     """Updates the selected country
 
-    Updates the selected_country in dependencies
-    And updates the label on the screen displaying the
-    selected country
+    Selects the country chosen in the listbox with select_country
 
     Args:
         widgets:
@@ -235,9 +349,52 @@ def update_selected_country(widgets, dependencies):
             A dictionary holding all of the dependencies
     """
     for i in widgets["listbox"].curselection():
-        dependencies["selected_country"] = widgets["listbox"].get(i)
-    widgets["labels"]["country"].config(text="Selected Country: "+
-                                        dependencies["selected_country"])
+        select_country(widgets, dependencies, widgets["listbox"].get(i))
+
+def receive_data(widgets, dependencies, results):
+    """Adds the data loaded by the worker thread
+
+    Adds each country put on the results queue to the options and the listbox
+    The first country loaded is selected by default
+    Each series parsed by the worker thread is used if its country is still selected
+
+    Args:
+        widgets:
+            A dictionary holding all of the widgets
+        dependencies:
+            A dictionary holding all of the dependencies
+        results:
+            The queue made by start_loading
+
+    Returns:
+        True once nothing more will be put on the results queue
+    """
+    while True:
+        try:
+            result = results.get_nowait()
+        except queue.Empty:
+            return False
+        if result[0] == "store":
+            dependencies["store"], dependencies["min_date"] = result[1], result[2]
+        elif result[0] == "country":
+            dependencies["options"].append(result[1])
+            widgets["listbox"].insert(tk_gui_library.END, result[1])
+            if "selected_country" not in dependencies:
+                # Set the default country to the first in options
+                select_country(widgets, dependencies, result[1])
+                if "series" in dependencies:
+                    update_actual(widgets, dependencies)
+                    predict(widgets, dependencies)
+        elif result[0] == "series":
+            if result[1] == dependencies["selected_country"]:
+                dependencies["series"] = result[2]
+                update_actual(widgets, dependencies)
+                predict(widgets, dependencies)
+        elif result[0] == "error":
+            widgets["labels"]["country"].config(text="Could Not Load Data: "+result[1])
+            return True
+        elif not dependencies["lazy_load"]:
+            return True
 
 def update_actual(widgets, dependencies):
     """A function that updates the actual data
@@ -251,24 +408,23 @@ def update_actual(widgets, dependencies):
         dependencies:
             A dictionary holding all of the dependencies
     """
-    data_dict = dependencies["data_dict"]
-    selected_country = dependencies["selected_country"]
+    series = dependencies["series"]
     min_date = dependencies["min_date"]
-    date = data_dict[selected_country]["data"]["date"].max()
+    date = series.days.max()
     date = datetime.timedelta(days=int(date)) + min_date
-    actual = data_dict[selected_country]["data"]["people_fully_vaccinated_per_hundred"].max()
+    actual = float(exact_values(series.values).max())
     widgets["labels"]["actual"].config(text="As of "+date.strftime("%m/%d/%y")+
                                        ", % Fully Vaccinated: "+str(actual*100)+"%")
 
-def find_close(data, date):
+def find_close(series, date):
     """Finds the closest datapoint to a given date
 
-    Loops through days away from the given date until eventually finding
-    a data point that is in the dataframe
+    Finds the smallest number of days away from the given date that has
+    a data point, preferring the data point after the date on a tie
 
     Args:
-        data:
-            Dataframe with the data for the certain country selected
+        series:
+            VaccinationSeries with the data for the certain country selected
         date:
             An integer corresponding to the date to look for the closest
             data point from
@@ -278,15 +434,13 @@ def find_close(data, date):
         for the datapoint closest to the given date and the date for the
         datapoint closest to the given date.
     """
-    add_days = 0
-    while True:
-        add = data.loc[data.date == date+add_days]
-        sub = data.loc[data.date == date-add_days]
-        if len(add) != 0 or len(sub) != 0:
-            if len(add) != 0:
-                return add["people_fully_vaccinated_per_hundred"].iloc[0], add["date"].iloc[0]
-            return sub["people_fully_vaccinated_per_hundred"].iloc[0], sub["date"].iloc[0]
-        add_days += 1
+    distance = series.days.astype(np.int64)-date
+    closest = np.abs(distance).min()
+    matches = np.flatnonzero(distance == closest)
+    if len(matches) == 0:
+        matches = np.flatnonzero(distance == -closest)
+    i = matches[0]
+    return float(exact_values(series.values[i])), int(series.days[i])
 
 def predict(widgets, dependencies):
     """A function that makes and displays a prediction
@@ -300,42 +454,64 @@ def predict(widgets, dependencies):
         dependencies:
             A dictionary holding all of the dependencies
     """
-    selected_country = dependencies["selected_country"]
-    data = dependencies["data_dict"][selected_country]
+    series = dependencies["series"]
     min_date = dependencies["min_date"]
     date = widgets["cal"].get_date()
     date = datetime.datetime.strptime(date, "%m/%d/%y")
     date = (date-min_date).days
-    if date <= data["data"]["date"].max():
-        closest_percentage, closest_date = find_close(data["data"], date)
+    if date <= series.days.max():
+        closest_percentage, closest_date = find_close(series, date)
         closest_date = datetime.timedelta(days=int(closest_date)) + min_date
         widgets["labels"]["predicted"].config(text="Closest % Fully Vaccinated: "
-                                              +str(closest_percentage*100)+"% on "
+                                              +str(round(closest_percentage*100, 3))+"% on "
                                               +closest_date.strftime("%m/%d/%Y"))
     else:
+        # The models without ridge are solved from the statistics of the country,
+        # which only add the days they have not seen
+        if dependencies["model"] in STATISTICS_MODELS:
+            statistics = update_country(dependencies["statistics"].get(series.country), series)
+            dependencies["statistics"][series.country] = statistics
         if dependencies["model"] == "Polynomial":
-            model = PolynomialRegressionModel(data["data"])
+            model = PolynomialRegressionModel.from_statistics(statistics)
         elif dependencies["model"] == "Logistic":
-            model = LogisticRegressionModel(data["data"])
+            model = LogisticRegressionModel.from_statistics(statistics)
         elif dependencies["model"] == "Logistic Logarithmic":
-            model = LogisticLogarithmicRegressionModel(data["data"])
+            model = LogisticLogarithmicRegressionModel.from_statistics(statistics)
         elif dependencies["model"] == "Logistic Polynomial":
-            model = LogisticPolynomialRegressionModel(data["data"])
+            model = LogisticPolynomialRegressionModel.from_statistics(statistics)
+        elif dependencies["model"] == "Polynomial Ridge":
+            model = PolynomialRegressionModel(series, ridge=True)
+        elif dependencies["model"] == "Logistic Polynomial Ridge":
+            model = LogisticPolynomialRegressionModel(series, ridge=True)
+        elif dependencies["model"] == "Streaming Logistic":
+            # Each country keeps its model, which only consumes the days it has not seen
+            model = dependencies["streaming"].setdefault(series.country,
+                                                         RecursiveLeastSquaresModel())
+            model.catch_up(series)
         else:
             print("Error")
         predicted = model.predict([[date]])[0]
-        if predicted < data["data"]["people_fully_vaccinated_per_hundred"].max():
-            predicted = data["data"]["people_fully_vaccinated_per_hundred"].max()
+        actual = float(exact_values(series.values).max())
+        if predicted < actual:
+            predicted = actual
         predicted = round(predicted*100, 3)
         widgets["labels"]["predicted"].config(text="Predicted % Fully Vaccinated: "
                                               +str(predicted)+"%")
 
 def __main__():
     def update():
+        if "series" not in dependencies:
+            return
         update_actual(widgets, dependencies)
         predict(widgets, dependencies)
 
+    def poll_loading():
+        if not receive_data(widgets, dependencies, results):
+            frames["root"].after(POLL_INTERVAL, poll_loading)
+
     def update_country(event):
+        if not widgets["listbox"].curselection():
+            return
         update_selected_country(widgets, dependencies)
         update()
 
@@ -352,7 +528,11 @@ def __main__():
         update()
 
     dependencies = dict()
-    dependencies["data_dict"], dependencies["min_date"] = extract_data()
+    file_path, lazy_load = read_config()
+    if FETCH_OPTION in sys.argv[1:]:
+        fetch_data(file_path)
+    results, dependencies["requests"] = start_loading(file_path, lazy_load)
+    dependencies["lazy_load"] = lazy_load
 
     frames = dict()
     create_frames(frames)
@@ -361,9 +541,6 @@ def __main__():
     widgets = dict()
     create_labels(frames["mainframe"], widgets, dependencies)
 
-    # Set the default country to the first in options
-    dependencies["selected_country"] = dependencies["options"][0]
-
     create_listbox(frames["mainframe"], widgets, dependencies["options"])
     create_model_selector(frames["mainframe"], widgets, dependencies)
     create_cal(frames["mainframe"], widgets)
@@ -374,6 +551,7 @@ def __main__():
     widgets["listbox"].bind("<<ListboxSelect>>", update_country)
     widgets["model_selector"].bind("<<ListboxSelect>>", update_model)
     widgets["cal"].bind("<<CalendarSelected>>", update_date)
+    poll_loading()
     frames["root"].mainloop()
 
 __main__()
@@ -0,0 +1,12 @@
+"""
+This module lets the tests import the modules of the source folder,
+which are run as scripts from that folder instead of being a package.
+The partitioned dataset of the research cleaning pipeline is tested here too.
+"""
+import os
+import sys
+TEST_PATH = os.path.dirname(os.path.abspath(__file__))
+SOURCE_PATH = os.path.join(TEST_PATH, "..", "source")
+CLEANING_PATH = os.path.join(TEST_PATH, "..", "..", "research", "source", "DataCleaning")
+sys.path.insert(0, os.path.normpath(SOURCE_PATH))
+sys.path.append(os.path.normpath(CLEANING_PATH))
@@ -0,0 +1,41 @@
+"""
+This module tests that a CountryIndex partitions the rows like a groupby
+Each country must hold its rows in their original order, the countries must
+keep the order they first appear in, and filter and to_dataframe must agree
+with doing the same on the dataframe.
+"""
+import numpy as np
+import pandas as pd
+from country_index import CountryIndex
+SIZE = 500
+
+def make_data():
+    """Returns a dataframe whose countries are interleaved and have uneven row counts"""
+    generator = np.random.default_rng(2)
+    locations = generator.choice(["Peru", "Chile", "Oman", "Malta"], SIZE, p=[.4, .3, .2, .1])
+    return pd.DataFrame({"location":locations,
+                         "date":generator.integers(0, 300, SIZE),
+                         "people_fully_vaccinated_per_hundred":generator.random(SIZE)})
+
+def test_partitions_match_groupby():
+    raw_data = make_data()
+    index = CountryIndex.from_dataframe(raw_data)
+    groups = raw_data.groupby("location", sort=False)
+    assert index.locations == list(groups.groups)
+    for country, group in groups:
+        days, values = index.view(country)
+        np.testing.assert_array_equal(days, group["date"].to_numpy())
+        np.testing.assert_array_equal(values,
+                                      group["people_fully_vaccinated_per_hundred"].to_numpy())
+        assert index.counts[index.positions[country]] == len(group)
+
+def test_filter_and_to_dataframe_match_groupby():
+    raw_data = make_data()
+    counts = raw_data["location"].value_counts()
+    min_rows = int(counts.median())
+    kept = CountryIndex.from_dataframe(raw_data).filter(min_rows)
+    assert sorted(kept) == sorted(counts.index[counts >= min_rows])
+    expected = raw_data.loc[raw_data["location"].isin(list(kept))]
+    expected = pd.concat([group for _, group in expected.groupby("location", sort=False)])
+    pd.testing.assert_frame_equal(kept.to_dataframe(), expected.reset_index(drop=True),
+                                  check_dtype=False)
@@ -0,0 +1,136 @@
+"""
+This module tests data_fetcher against a local HTTP server
+The server answers conditional and range requests like the upstream host,
+so a download, a not modified check, and a resumed download are all covered.
+"""
+import hashlib
+import http.server
+import json
+import os
+import threading
+import pytest
+from data_fetcher import METADATA_SUFFIX
+from data_fetcher import PART_SUFFIX
+from data_fetcher import fetch_file
+from data_fetcher import read_metadata
+from data_fetcher import write_metadata
+CONTENT = b"location,date,people_fully_vaccinated_per_hundred\n"+b"Chile,2021-06-01,50.0\n"*4000
+ETAG = '"vaccinations-1"'
+
+class DataHandler(http.server.BaseHTTPRequestHandler):
+    """This Class answers requests for CONTENT like a static file server
+
+    The server it belongs to holds the requests it was sent, and how many bytes
+    of the next full response to send before closing the connection
+    """
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        start = 0
+        byte_range = self.headers.get("Range")
+        if byte_range is not None and self.headers.get("If-Range") == ETAG:
+            start = int(byte_range[len("bytes="):-1])
+            if start >= len(CONTENT):
+                if self.server.remove_part is not None:
+                    os.remove(self.server.remove_part)
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */"+str(len(CONTENT)))
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes "+str(start)+"-"+str(len(CONTENT)-1)+
+                             "/"+str(len(CONTENT)))
+        else:
+            self.send_response(200)
+        body = CONTENT[start:]
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.server.cut is not None:
+            body, self.server.cut = body[:self.server.cut], None
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    data_server = http.server.HTTPServer(("127.0.0.1", 0), DataHandler)
+    data_server.requests = []
+    data_server.cut = None
+    data_server.remove_part = None
+    thread = threading.Thread(target=data_server.serve_forever, daemon=True)
+    thread.start()
+    yield data_server
+    data_server.shutdown()
+    data_server.server_close()
+
+def get_url(data_server):
+    return "http://127.0.0.1:"+str(data_server.server_address[1])+"/vaccinations.csv"
+
+def read(file_path):
+    with open(file_path, "rb") as file:
+        return file.read()
+
+def test_download_then_not_modified_then_resume(server, tmp_path):
+    url = get_url(server)
+    file_path = str(tmp_path/"vaccinations.csv")
+    checksum = hashlib.sha256(CONTENT).hexdigest()
+    assert fetch_file(url, file_path, checksum)
+    assert read(file_path) == CONTENT
+    assert not os.path.exists(file_path+PART_SUFFIX)
+
+    assert not fetch_file(url, file_path, checksum)
+    assert server.requests[-1]["If-None-Match"] == ETAG
+    assert read(file_path) == CONTENT
+
+    # Lose the file and cut the next download short, leaving a partial download
+    os.remove(file_path)
+    server.cut = 1000
+    with pytest.raises(ValueError):
+        fetch_file(url, file_path, checksum)
+    assert read(file_path+PART_SUFFIX) == CONTENT[:1000]
+    assert fetch_file(url, file_path, checksum)
+    assert server.requests[-1]["Range"] == "bytes=1000-"
+    assert server.requests[-1]["If-Range"] == ETAG
+    assert read(file_path) == CONTENT
+    assert not os.path.exists(file_path+PART_SUFFIX)
+
+def test_unsatisfiable_range_starts_over(server, tmp_path):
+    url = get_url(server)
+    file_path = str(tmp_path/"vaccinations.csv")
+    with open(file_path+METADATA_SUFFIX, "w") as file:
+        json.dump({"url":url, "partial":ETAG}, file)
+    with open(file_path+PART_SUFFIX, "wb") as file:
+        file.write(CONTENT+b"stale")
+    # The partial download is already gone when the server refuses the range
+    server.remove_part = file_path+PART_SUFFIX
+    assert fetch_file(url, file_path)
+    assert [request.get("Range") for request in server.requests] == \
+           ["bytes="+str(len(CONTENT)+5)+"-", None]
+    assert read(file_path) == CONTENT
+
+def test_overlapping_metadata_writers(tmp_path):
+    metadata_path = str(tmp_path/("vaccinations.csv"+METADATA_SUFFIX))
+    errors = []
+
+    def write(number):
+        try:
+            for _ in range(50):
+                write_metadata(metadata_path, {"url":"url", "etag":str(number)})
+        except OSError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=write, args=(number,)) for number in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert read_metadata(metadata_path, "url")["etag"] in [str(number) for number in range(8)]
+    assert os.listdir(tmp_path) == [os.path.basename(metadata_path)]
@@ -0,0 +1,51 @@
+"""
+This module tests that ingesting a refreshed csv matches parsing it again
+New dates must be appended to the rows of their country, and revised or deleted
+rows must rebuild the index, with the changed countries reported either way.
+"""
+import os
+import numpy as np
+import pytest
+from incremental_ingest import ingest_vaccinations
+from vaccination_cache import parse_vaccinations
+ROWS = ["Chile,CHL,2021-01-02,1.5", "Peru,PER,2021-01-01,0.25", "Chile,CHL,2021-01-04,2.75",
+        "Peru,PER,2021-01-03,", "Peru,PER,2021-01-04,3.5"]
+
+def write_csv(file_path, rows, mtime_ns):
+    """Writes the columns of vaccinations.csv the ingest reads, with a set modification time"""
+    with open(file_path, "w") as file:
+        file.write("location,iso_code,date,people_fully_vaccinated_per_hundred\n")
+        file.write("\n".join(rows)+"\n")
+    os.utime(file_path, ns=(mtime_ns, mtime_ns))
+
+@pytest.mark.parametrize("rows, changed", [
+    (ROWS+["Chile,CHL,2021-01-05,3.25", "Nepal,NPL,2021-01-05,0.5", "Peru,PER,2021-01-06,4"],
+     ["Chile", "Nepal", "Peru"]),
+    (ROWS[:-1]+["Peru,PER,2021-01-04,3.75", "Chile,CHL,2021-01-05,3.25"], ["Chile", "Peru"]),
+    (ROWS[1:]+["Chile,CHL,2021-01-05,3.25"], ["Chile"]),
+    (ROWS, [])])
+def test_ingest_matches_parse(tmp_path, rows, changed):
+    file_path = str(tmp_path/"vaccinations.csv")
+    write_csv(file_path, ROWS, 10**18)
+    ingest_vaccinations(file_path)
+    write_csv(file_path, rows, 2*10**18)
+    index, min_date, ingested = ingest_vaccinations(file_path)
+    assert sorted(ingested) == changed
+    expected, expected_date = parse_vaccinations(file_path)
+    assert min_date == expected_date
+    assert sorted(index) == sorted(expected)
+    for country in expected:
+        for ingested_data, parsed in zip(index.view(country), expected.view(country)):
+            np.testing.assert_array_equal(ingested_data, parsed)
+    # The cache written by the ingest is used by the next one
+    assert ingest_vaccinations(file_path)[2] == []
+
+def test_earlier_start_parses_again(tmp_path):
+    file_path = str(tmp_path/"vaccinations.csv")
+    write_csv(file_path, ROWS, 10**18)
+    ingest_vaccinations(file_path)
+    write_csv(file_path, ["Chile,CHL,2020-12-31,0.5"]+ROWS, 2*10**18)
+    index, min_date, changed = ingest_vaccinations(file_path)
+    assert sorted(changed) == ["Chile", "Peru"]
+    assert min_date == parse_vaccinations(file_path)[1]
+    np.testing.assert_array_equal(index.view("Chile")[0], [0, 2, 4])
@@ -0,0 +1,91 @@
+"""
+This module tests that every kernel backend agrees with the NumPy kernels
+The loop kernels are checked as plain Python, and again compiled when Numba
+is installed, on random data and on the values past the limits of each kernel.
+"""
+import importlib
+import numpy as np
+import pytest
+import kernel_backend
+from least_squares import get_normal_equations
+# How far apart the backends may be, relative to the size of the values
+PARITY_TOLERANCE = 1e-12
+SIZE = 1000
+
+def get_difference(first, second):
+    """Returns the largest difference of two arrays, relative to the largest value"""
+    scale = max(np.max(np.abs(first)), 1)
+    return float(np.max(np.abs(first-second))/scale)
+
+def run_kernels(kernels):
+    """Runs every kernel of a backend on the same random data
+
+    Args:
+        kernels: a dictionary from each kernel name to its function
+
+    Returns:
+        A dictionary from each kernel name to its result
+    """
+    generator = np.random.default_rng(0)
+    # Cover the values past the limits and the edges of the clip
+    y_data = np.concatenate([generator.uniform(-.1, 1.1, SIZE), [-.01, .98, .99, 1]])
+    logits = np.concatenate([generator.uniform(-80, 80, SIZE), [-70, 0, 800, -800]])
+    days = np.arange(SIZE, dtype=np.float64)
+    u_data = 2*days/SIZE-1
+    # Sums in a different order, so the Gram matrix is scaled to keep it comparable
+    features = kernel_backend.chebyshev_numpy(u_data, np.empty((SIZE, 3), order="F"))
+    return {"logit":kernels["logit"](y_data, .01, .99, 10, 1e-12, np.empty(len(y_data))),
+            "sigmoid":kernels["sigmoid"](logits, .01, -70, 0, np.empty(len(logits))),
+            "chebyshev":kernels["chebyshev"](u_data, np.empty((SIZE, 7), order="F")),
+            "logarithmic":kernels["logarithmic"](days, np.empty((SIZE, 2))),
+            "gram":np.column_stack(kernels["gram"](features, logits[:SIZE],
+                                                   np.empty((4, 4)), np.empty(4)))}
+
+def get_kernels(backend):
+    """Returns the kernels of a backend, skipping the test if it can not be used"""
+    if backend == "loop":
+        return kernel_backend.LOOP_KERNELS
+    if backend not in kernel_backend.available_backends():
+        pytest.skip("The "+backend+" kernel backend is not installed")
+    return kernel_backend.KERNELS[backend]
+
+@pytest.mark.parametrize("backend", ["loop", "numba"])
+def test_backends_agree(backend):
+    expected = run_kernels(kernel_backend.NUMPY_KERNELS)
+    results = run_kernels(get_kernels(backend))
+    assert set(results) == set(kernel_backend.NUMPY_KERNELS)
+    for name, result in results.items():
+        assert get_difference(expected[name], result) <= PARITY_TOLERANCE, name
+
+def test_numpy_is_the_default(monkeypatch):
+    monkeypatch.delenv(kernel_backend.BACKEND_VARIABLE, raising=False)
+    try:
+        assert importlib.reload(kernel_backend).get_backend() == "numpy"
+    finally:
+        importlib.reload(kernel_backend)
+
+def test_variable_chooses_the_backend(monkeypatch):
+    get_kernels("numba")
+    monkeypatch.setenv(kernel_backend.BACKEND_VARIABLE, "numba")
+    try:
+        assert importlib.reload(kernel_backend).get_backend() == "numba"
+    finally:
+        monkeypatch.delenv(kernel_backend.BACKEND_VARIABLE)
+        importlib.reload(kernel_backend)
+
+def test_unknown_backend():
+    backend = kernel_backend.get_backend()
+    with pytest.raises(ValueError):
+        kernel_backend.set_backend("fortran")
+    assert kernel_backend.get_backend() == backend
+
+def test_normal_equations():
+    generator = np.random.default_rng(1)
+    features = generator.normal(size=(50, 3))
+    y_data = generator.normal(size=50)
+    rows = np.column_stack([np.ones(50), features])
+    gram, moments, squares, count = get_normal_equations(features, y_data)
+    np.testing.assert_allclose(gram, rows.T @ rows, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(moments, rows.T @ y_data, rtol=1e-12, atol=1e-12)
+    assert squares == pytest.approx(y_data @ y_data)
+    assert count == 50
@@ -0,0 +1,65 @@
+"""
+This module tests the lazy per-country loading of vaccinations.csv
+Each country parsed from its byte ranges must match parsing the whole csv,
+and the offset index must be rebuilt when the csv changes.
+"""
+import json
+import os
+import numpy as np
+import lazy_series_store
+from lazy_series_store import LazyVaccinationSeriesStore
+from lazy_series_store import get_index_path
+from lazy_series_store import load_offset_index
+from series_store import VaccinationSeriesStore
+from vaccination_cache import parse_vaccinations
+ROWS = ['"Bonaire, Sint Eustatius",BES,2021-01-03,1.5', "Chile,CHL,2021-01-02,0.25",
+        "Chile,CHL,2021-01-03,", "Chile,CHL,2021-01-04,2.75", "Peru,PER,2021-01-05,",
+        '"Bonaire, Sint Eustatius",BES,2021-01-01,0.5', "Chile,CHL,2021-01-06,3.5",
+        "Nepal,NPL,2021-01-01,"]
+
+def write_csv(file_path, rows, mtime_ns):
+    """Writes the columns of vaccinations.csv the index reads, with a set modification time"""
+    with open(file_path, "w") as file:
+        file.write("location,iso_code,date,people_fully_vaccinated_per_hundred\n")
+        file.write("\n".join(rows)+"\n")
+    os.utime(file_path, ns=(mtime_ns, mtime_ns))
+
+def assert_matches_csv(file_path, store):
+    """Checks that every country of a lazy store matches parsing the whole csv"""
+    index, min_date = parse_vaccinations(file_path)
+    expected = VaccinationSeriesStore.from_index(index.filter(1))
+    assert sorted(store) == sorted(expected)
+    assert store.min_date == min_date
+    for country in expected:
+        np.testing.assert_array_equal(store[country].days, expected[country].days)
+        np.testing.assert_array_equal(store[country].values, expected[country].values)
+
+def forbid_scanning(file_path):
+    """Stands in for build_offset_index, so a test fails if the csv is scanned again"""
+    raise AssertionError("The csv was scanned instead of using the offset index")
+
+def test_lazy_store_matches_csv(tmp_path):
+    file_path = str(tmp_path/"vaccinations.csv")
+    write_csv(file_path, ROWS, 10**18)
+    store = LazyVaccinationSeriesStore(file_path)
+    assert_matches_csv(file_path, store)
+    # Countries without a value are left out, and min_rows counts only rows with one
+    assert "Nepal" not in store and "Peru" not in store
+    assert list(LazyVaccinationSeriesStore(file_path, min_rows=3)) == ["Chile"]
+
+def test_offset_index_follows_csv(tmp_path, monkeypatch):
+    file_path = str(tmp_path/"vaccinations.csv")
+    write_csv(file_path, ROWS, 10**18)
+    load_offset_index(file_path)
+    with open(get_index_path(file_path)) as file:
+        assert json.load(file)["mtime"] == 10**18
+    # A touched csv with the same content keeps its index
+    os.utime(file_path, ns=(2*10**18, 2*10**18))
+    with monkeypatch.context() as patch:
+        patch.setattr(lazy_series_store, "build_offset_index", forbid_scanning)
+        assert load_offset_index(file_path)["mtime"] == 2*10**18
+    # Changing a value keeps the size of the csv, and adding a row does not
+    for rows in [ROWS[:-2]+["Chile,CHL,2021-01-06,3.6"]+ROWS[-1:],
+                 ROWS+["Peru,PER,2021-01-07,4.25"]]:
+        write_csv(file_path, rows, 3*10**18)
+        assert_matches_csv(file_path, LazyVaccinationSeriesStore(file_path))
@@ -0,0 +1,68 @@
+"""
+This module tests that fits scored from their normal equations match fits on the rows
+Stacked normal equations of several countries must solve and score each country
+like lstsq on its own rows, and a fit scored on the normal equations of other
+rows must match scoring its predictions there.
+"""
+import numpy as np
+from least_squares import get_normal_equations
+from least_squares import leading_block
+from least_squares import score_fit
+from least_squares import solve_fit
+COUNTRIES = 5
+SIZE = 80
+
+def make_countries():
+    """Returns the features and y values of countries with different curves"""
+    generator = np.random.default_rng(6)
+    countries = []
+    for i in range(COUNTRIES):
+        days = np.sort(generator.choice(300, SIZE, replace=False)).astype(np.float64)
+        features = np.column_stack([days/300, np.log(days+2)])
+        y_data = -4+(i+1)*days/100+generator.normal(0, .3, SIZE)
+        countries.append((features, y_data))
+    return countries
+
+def fit_rows(features, y_data):
+    """Fits with an intercept on the rows with lstsq
+
+    Args:
+        features: the features, with a row for each value
+        y_data: the y values
+
+    Returns:
+        The intercept and coefficients, the residual sum of squares and the r-squared value
+    """
+    design = np.column_stack([np.ones(len(y_data)), features])
+    solution = np.linalg.lstsq(design, y_data, rcond=None)[0]
+    residual = np.sum((y_data-design @ solution)**2)
+    return solution, residual, 1-residual/np.sum((y_data-y_data.mean())**2)
+
+def stack(equations):
+    """Stacks the normal equations of several fits, one fit per row"""
+    return tuple(np.array([equation[i] for equation in equations]) for i in range(4))
+
+def test_stacked_fits_match_rows():
+    countries = make_countries()
+    equations = stack([get_normal_equations(features, y_data)
+                       for features, y_data in countries])
+    for columns in [2, 3]:
+        solutions, statistics = solve_fit(leading_block(equations, columns))
+        for i, (features, y_data) in enumerate(countries):
+            solution, residual, r_squared = fit_rows(features[:, :columns-1], y_data)
+            np.testing.assert_allclose(solutions[i], solution, rtol=1e-9, atol=1e-9)
+            assert abs(statistics.residual[i]-residual) <= 1e-8*residual
+            assert abs(statistics.r_squared[i]-r_squared) <= 1e-10
+            expected = 1-(1-r_squared)*(SIZE-1)/(SIZE-columns)
+            assert abs(statistics.adjusted_r_squared[i]-expected) <= 1e-10
+        assert np.all(statistics.count == SIZE)
+        assert statistics.parameters == columns-1
+
+def test_score_on_other_rows():
+    (train_x, train_y), (test_x, test_y) = make_countries()[:2]
+    solution, _, _ = fit_rows(train_x, train_y)
+    statistics = score_fit(get_normal_equations(test_x, test_y), solution)
+    predicted = solution[0]+test_x @ solution[1:]
+    residual = np.sum((test_y-predicted)**2)
+    assert abs(statistics.residual-residual) <= 1e-8*residual
+    assert abs(statistics.r_squared-(1-residual/np.sum((test_y-test_y.mean())**2))) <= 1e-10
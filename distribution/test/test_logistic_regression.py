@@ -0,0 +1,65 @@
+"""
+This module tests the vectorized logit and sigmoid transforms of logistic_regression
+Each must match the formula the models used before, one value at a time,
+including the values past their limits, and may write over its input.
+The logit target of a series must be transformed once and shared by every model.
+"""
+import gc
+import math
+import numpy as np
+from logistic_regression import Y_FIT_LIMIT
+from logistic_regression import Y_FIT_REPLACEMENT
+from logistic_regression import Y_OFFSET
+from logistic_regression import Y_TRANSFORM_LIMIT
+from logistic_regression import TARGET_CACHE
+from logistic_regression import Y_TRANSFORM_REPLACEMENT
+from logistic_regression import get_logit_target
+from logistic_regression import transform_y_fit
+from logistic_regression import transform_y_predict
+from series_store import VaccinationSeriesStore
+from series_store import exact_values
+SIZE = 1000
+
+def fit_value(y):
+    """Transforms one y value into the logistic form, the way the models did"""
+    return -1*math.log((1/(y+Y_OFFSET))-1) if y < Y_FIT_LIMIT else Y_FIT_REPLACEMENT
+
+def predict_value(y):
+    """Transforms one y value out of the logistic form, the way the models did"""
+    return (1/(1+math.exp(-1*y)))-Y_OFFSET if y > Y_TRANSFORM_LIMIT else Y_TRANSFORM_REPLACEMENT
+
+def test_transforms_match_formulas():
+    generator = np.random.default_rng(1)
+    y_data = np.concatenate([generator.uniform(0, 1, SIZE), [0, .98, Y_FIT_LIMIT, 1]])
+    expected = [fit_value(y) for y in y_data]
+    np.testing.assert_allclose(transform_y_fit(y_data), expected, rtol=1e-12, atol=1e-12)
+    logits = np.concatenate([generator.uniform(-75, 30, SIZE), [Y_TRANSFORM_LIMIT, 700]])
+    expected = [predict_value(y) for y in logits]
+    np.testing.assert_allclose(transform_y_predict(logits), expected, rtol=1e-12, atol=1e-15)
+
+def test_transforms_in_place():
+    y_data = np.linspace(0, 1, SIZE)
+    expected = transform_y_fit(y_data)
+    assert np.shares_memory(transform_y_fit(y_data, out=y_data), y_data)
+    np.testing.assert_array_equal(y_data, expected)
+    expected = transform_y_predict(y_data)
+    assert np.shares_memory(transform_y_predict(y_data, out=y_data), y_data)
+    np.testing.assert_array_equal(y_data, expected)
+
+def test_logit_target_is_cached():
+    gc.collect()
+    cached = len(TARGET_CACHE)
+    values = np.round(np.linspace(0, 1, SIZE)*10000)/10000
+    series = VaccinationSeriesStore(["Chile"], [0, SIZE], np.arange(SIZE), values)["Chile"]
+    target = get_logit_target(series)
+    np.testing.assert_array_equal(target, transform_y_fit(exact_values(series.values)))
+    assert not target.flags.writeable
+    assert get_logit_target(series) is target
+    # New values are transformed again
+    series.values = series.values[::-1].copy()
+    assert get_logit_target(series) is not target
+    np.testing.assert_array_equal(get_logit_target(series), target[::-1])
+    # The target goes away with its series
+    del series
+    gc.collect()
+    assert len(TARGET_CACHE) <= cached
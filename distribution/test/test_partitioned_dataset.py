@@ -0,0 +1,50 @@
+"""
+This module tests that a partitioned dataset gives back the data it was written from
+Every country keeps its own columns, a single country, a set of columns, and the
+columns across every country must all read back exactly.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from partitioned_dataset import list_countries
+from partitioned_dataset import load_columns
+from partitioned_dataset import load_country
+from partitioned_dataset import load_dataset
+from partitioned_dataset import write_dataset
+
+def make_datadict():
+    """Returns countries with different row counts and different feature columns"""
+    generator = np.random.default_rng(5)
+    datadict = dict()
+    for country, rows, columns in [("Chile", 30, ["total_cases", "stringency_index"]),
+                                   ("Perú", 12, ["stringency_index"]),
+                                   ("Malta", 0, ["total_cases"])]:
+        data = {"date":pd.date_range("2021-01-01", periods=rows, freq="2D")}
+        for column in columns:
+            data[column] = generator.normal(size=rows)
+        data[columns[0]][::5] = np.nan
+        datadict[country] = pd.DataFrame(data)
+    return datadict
+
+def test_dataset_round_trip(tmp_path):
+    file_path = str(tmp_path/"fullData.dataset")
+    datadict = make_datadict()
+    write_dataset(file_path, datadict)
+    assert list_countries(file_path) == list(datadict)
+    for country, data in load_dataset(file_path).items():
+        pd.testing.assert_frame_equal(data, datadict[country], check_dtype=False)
+        pd.testing.assert_frame_equal(load_country(file_path, country), data)
+    subset = load_dataset(file_path, ["stringency_index"])
+    assert list(subset["Chile"].columns) == ["stringency_index"]
+    assert list(subset["Malta"].columns) == []
+    columns = load_columns(file_path, ["date", "stringency_index"])
+    assert list(columns.columns) == ["country", "date", "stringency_index"]
+    chile = columns.loc[columns["country"] == "Chile"]
+    np.testing.assert_array_equal(chile["stringency_index"], datadict["Chile"]["stringency_index"])
+    assert columns.loc[columns["country"] == "Malta"].empty
+
+def test_other_file_is_rejected(tmp_path):
+    file_path = tmp_path/"vaccinations.csv"
+    file_path.write_bytes(b"location,date\n"*4)
+    with pytest.raises(ValueError):
+        list_countries(str(file_path))
@@ -0,0 +1,140 @@
+"""
+This module tests the polynomial fits of polynomial_regression
+The features and the fit of every degree must match NumPy's Chebyshev module,
+the scores of the one-factorization degree sweep must match scoring each degree's
+predictions, and the leave-one-out sums of squares found from the hat diagonal must match
+fitting again without each row, for every degree and every ridge strength.
+The ridge path must match solving the penalized normal equations of each strength,
+and GCV must choose no penalty for an exact curve and a penalty for noise.
+"""
+import numpy as np
+from polynomial_regression import MAX_DEGREE
+from polynomial_regression import RIDGE_ORDER
+from polynomial_regression import RIDGE_STRENGTHS
+from polynomial_regression import choose_strength
+from polynomial_regression import get_mapping
+from polynomial_regression import ridge_path
+from polynomial_regression import sweep_degrees
+from polynomial_regression import transform_x
+SIZE = 60
+
+def make_data():
+    """Returns uneven days and a noisy curve through them"""
+    generator = np.random.default_rng(4)
+    x_data = np.sort(generator.choice(200, SIZE, replace=False)).astype(np.float64)
+    y_data = 1/(1+np.exp(-(x_data-100)/30))+generator.normal(0, .02, SIZE)
+    return x_data, y_data
+
+def get_penalty(strength):
+    """Returns the ridge penalty of each column, which is 0 for the intercept
+
+    The penalty of T_k is the strength times k^RIDGE_ORDER, for the rows of the whole fit
+    """
+    return strength*SIZE*np.arange(MAX_DEGREE+1, dtype=np.float64)**RIDGE_ORDER
+
+def refit_press(design, y_data, penalty=None):
+    """Finds PRESS by solving the fit again without each row
+
+    Args:
+        design: the features with a leading column of ones
+        y_data: the y values
+        penalty: the ridge penalty of each column, which is 0 for the intercept
+
+    Returns:
+        The sum of the squared residuals of each row from the fit without it
+    """
+    if penalty is None:
+        penalty = np.zeros(design.shape[1])
+    press = 0.0
+    for i in range(len(y_data)):
+        keep = np.arange(len(y_data)) != i
+        kept = design[keep]
+        solution = np.linalg.solve(kept.T @ kept+np.diag(penalty), kept.T @ y_data[keep])
+        press += (y_data[i]-design[i] @ solution)**2
+    return press
+
+def test_features_match_chebvander():
+    x_data, _ = make_data()
+    center, width = get_mapping(x_data)
+    features = transform_x(x_data.reshape(-1, 1), MAX_DEGREE, center, width)
+    expected = np.polynomial.chebyshev.chebvander((x_data-center)/width, MAX_DEGREE)
+    np.testing.assert_allclose(features, expected[:, 1:], rtol=0, atol=1e-13)
+    # The columns of a lower degree are a slice of the same matrix
+    assert features.flags.f_contiguous
+
+def test_degree_fits_match_chebyshev_fit():
+    x_data, y_data = make_data()
+    days = np.linspace(-20, 220, 50)
+    for degree, (model, _) in enumerate(sweep_degrees(x_data, y_data), 1):
+        expected = np.polynomial.Chebyshev.fit(x_data, y_data, degree)
+        np.testing.assert_allclose(np.append(model.intercept_, model.coef_),
+                                   expected.coef, rtol=0, atol=1e-9)
+        np.testing.assert_allclose(model.predict(days), expected(days), rtol=0, atol=1e-9)
+
+def get_r_squared(y_data, predicted):
+    """Finds the r-squared value of predictions like sklearn's r2_score"""
+    return 1-np.sum((y_data-predicted)**2)/np.sum((y_data-y_data.mean())**2)
+
+def test_degree_scores_match_predictions():
+    x_data, y_data = make_data()
+    train = np.arange(SIZE) % 4 != 0
+    fits = sweep_degrees(x_data, y_data)
+    tests = sweep_degrees(x_data[train], y_data[train], x_data[~train], y_data[~train])
+    for (model, statistics), (test_model, test_statistics) in zip(fits, tests):
+        predicted = model.predict(x_data)
+        assert abs(statistics.residual-np.sum((y_data-predicted)**2)) <= 1e-10
+        assert abs(statistics.r_squared-get_r_squared(y_data, predicted)) <= 1e-10
+        predicted = test_model.predict(x_data[~train])
+        assert abs(test_statistics.r_squared-get_r_squared(y_data[~train], predicted)) <= 1e-10
+        assert test_statistics.count == np.sum(~train)
+
+def test_degree_press_matches_refits():
+    x_data, y_data = make_data()
+    center, width = get_mapping(x_data)
+    for degree, (_, statistics) in enumerate(sweep_degrees(x_data, y_data), 1):
+        design = np.column_stack([np.ones(SIZE), transform_x(x_data, degree, center, width)])
+        expected = refit_press(design, y_data)
+        assert abs(statistics.press-expected) <= 1e-10*expected
+    assert degree == MAX_DEGREE
+
+def test_ridge_press_matches_refits():
+    x_data, y_data = make_data()
+    strengths = np.array([0, 1e-6, 1e-3, 1e-1])
+    path = ridge_path(x_data, y_data, strengths=strengths)
+    center, width = get_mapping(x_data)
+    design = np.column_stack([np.ones(SIZE), transform_x(x_data, MAX_DEGREE, center, width)])
+    for strength, press in zip(strengths, path.press):
+        expected = refit_press(design, y_data, get_penalty(strength))
+        assert abs(press-expected) <= 1e-8*expected
+
+def test_ridge_path_matches_normal_equations():
+    x_data, y_data = make_data()
+    path = ridge_path(x_data, y_data)
+    center, width = get_mapping(x_data)
+    design = np.column_stack([np.ones(SIZE), transform_x(x_data, MAX_DEGREE, center, width)])
+    for i, strength in enumerate(RIDGE_STRENGTHS):
+        inverse = np.linalg.inv(design.T @ design+np.diag(get_penalty(strength)))
+        solution = inverse @ design.T @ y_data
+        np.testing.assert_allclose(path.solutions[i], solution, rtol=1e-7, atol=1e-7)
+        residual = np.sum((y_data-design @ solution)**2)
+        assert abs(path.residuals[i]-residual) <= 1e-8*residual
+        # The effective number of features is the trace of the hat matrix, less the intercept
+        parameters = np.trace(design @ inverse @ design.T)-1
+        assert abs(path.parameters[i]-parameters) <= 1e-8
+        assert abs(path.gcv[i]-SIZE*residual/(SIZE-1-parameters)**2) <= 1e-8*path.gcv[i]
+    # Without a penalty the fit is the unregularized fit of MAX_DEGREE
+    model, _ = sweep_degrees(x_data, y_data)[-1]
+    np.testing.assert_allclose(path.solutions[0], np.append(model.intercept_, model.coef_),
+                               rtol=0, atol=1e-9)
+
+def test_gcv_strength_choice():
+    x_data, _ = make_data()
+    # A curve the polynomial holds exactly is only made worse by a penalty
+    _, statistics, strength = choose_strength(ridge_path(x_data, (x_data/100-1)**2))
+    assert strength == 0 and statistics.residual <= 1e-20
+    # Noise around 0 is fit closer to 0 with a penalty than without one
+    noise = np.random.default_rng(7).normal(0, 1, SIZE)
+    path = ridge_path(x_data, noise)
+    model, statistics, strength = choose_strength(path)
+    assert strength > 0 and statistics.parameters < MAX_DEGREE
+    assert np.sum(model.predict(x_data)**2) < np.sum(path.get_model(0).predict(x_data)**2)
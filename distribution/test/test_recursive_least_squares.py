@@ -0,0 +1,73 @@
+"""
+This module tests that RecursiveLeastSquaresModel matches a batch fit
+Without a forgetting factor the line is the ordinary least squares line of the
+transformed values, with one it is the weighted least squares line, whether the
+observations arrive at once, one at a time, or in micro-batches.
+"""
+import numpy as np
+import pytest
+from logistic_regression import transform_y_fit
+from recursive_least_squares import RecursiveLeastSquaresModel
+from series_store import VaccinationSeriesStore
+from series_store import exact_values
+SIZE = 120
+
+def make_series():
+    """Returns the series of a country with a noisy logistic curve on uneven days"""
+    generator = np.random.default_rng(2)
+    days = np.cumsum(generator.integers(1, 4, SIZE))
+    curve = 1/(1+np.exp(-(days-150)/40))+generator.normal(0, .01, SIZE)
+    values = np.round(np.clip(curve, 0, .99)*10000)/10000
+    return VaccinationSeriesStore(["Chile"], [0, SIZE], days, values)["Chile"]
+
+def fit_weighted(series, weights):
+    """Solves the weighted least squares line of the transformed values"""
+    features = np.column_stack([np.ones(len(series)), series.days.astype(np.float64)])
+    y_data = transform_y_fit(exact_values(series.values))
+    root = np.sqrt(weights)
+    return np.linalg.lstsq(features*root[:, None], y_data*root, rcond=None)[0]
+
+def consume(model, series, sizes):
+    """Consumes the observations of a series in micro-batches of the given sizes"""
+    start = 0
+    for size in sizes:
+        model.update(series.days[start:start+size], series.values[start:start+size])
+        start += size
+    model.update(series.days[start:], series.values[start:])
+
+@pytest.mark.parametrize("sizes", [[], [1]*SIZE, [1, 3, 7, 20, 1, 1, 50]])
+def test_matches_ordinary_least_squares(sizes):
+    series = make_series()
+    model = RecursiveLeastSquaresModel()
+    consume(model, series, sizes)
+    expected = fit_weighted(series, np.ones(SIZE))
+    np.testing.assert_allclose(model.coefficients, expected, rtol=1e-9, atol=1e-9)
+    assert model.count == SIZE
+    np.testing.assert_allclose(model.predict([[400]]),
+                               RecursiveLeastSquaresModel(series).predict([[400]]), rtol=1e-9)
+
+@pytest.mark.parametrize("sizes", [[], [1]*SIZE, [1, 3, 7, 20, 1, 1, 50]])
+def test_matches_weighted_least_squares(sizes):
+    series = make_series()
+    model = RecursiveLeastSquaresModel(forgetting=.97)
+    consume(model, series, sizes)
+    # The newest observation has weight 1, each older one is weighed down once more
+    expected = fit_weighted(series, .97**np.arange(SIZE-1, -1, -1, dtype=np.float64))
+    np.testing.assert_allclose(model.coefficients, expected, rtol=1e-9, atol=1e-9)
+
+def test_catch_up_consumes_only_new_days():
+    series = make_series()
+    model = RecursiveLeastSquaresModel()
+    model.update(series.days[:80], series.values[:80])
+    assert model.catch_up(series) == SIZE-80
+    assert model.catch_up(series) == 0
+    np.testing.assert_allclose(model.coefficients, fit_weighted(series, np.ones(SIZE)),
+                               rtol=1e-9, atol=1e-9)
+
+def test_rejects_old_days():
+    series = make_series()
+    model = RecursiveLeastSquaresModel(series)
+    with pytest.raises(ValueError):
+        model.update(series.days[-1:], series.values[-1:])
+    with pytest.raises(ValueError):
+        RecursiveLeastSquaresModel(forgetting=0)
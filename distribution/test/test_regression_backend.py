@@ -0,0 +1,64 @@
+"""
+This module tests that the NumPy and sklearn regression backends agree
+Both fit the features the models use, the days and log(x+2) of the days, to
+y values like the transformed ones, and must give the same coefficients,
+predictions and scores. The sklearn backend is skipped when it is not installed.
+"""
+import numpy as np
+import pytest
+import regression_backend
+# How far apart the backends may be, relative to the size of the values
+PARITY_TOLERANCE = 1e-10
+SIZE = 500
+
+def get_difference(first, second):
+    """Returns the largest difference of two arrays, relative to the largest value"""
+    scale = max(np.max(np.abs(second)), 1)
+    return float(np.max(np.abs(np.asarray(first)-second))/scale)
+
+def fit_backend(backend, x_data, y_data):
+    """Fits the line and the logarithmic curve with a backend
+
+    Args:
+        backend: the name of the backend
+        x_data: the days and log(x+2) of the days
+        y_data: the y values
+
+    Returns:
+        A dictionary from each result and number of columns to its value
+    """
+    previous = regression_backend.get_backend()
+    regression_backend.set_backend(backend)
+    try:
+        results = dict()
+        for columns in range(1, 3):
+            model = regression_backend.make_regression().fit(x_data[:, :columns], y_data)
+            results["coefficients", columns] = np.append(model.intercept_, model.coef_)
+            results["predict", columns] = model.predict(x_data[:, :columns])
+            results["score", columns] = model.score(x_data[:, :columns], y_data)
+            made = regression_backend.make_fit_regression(model.intercept_, model.coef_)
+            results["made", columns] = made.predict(x_data[:, :columns])
+        return results
+    finally:
+        regression_backend.set_backend(previous)
+
+def test_backends_agree():
+    if "sklearn" not in regression_backend.available_backends():
+        pytest.skip("The sklearn regression backend is not installed")
+    generator = np.random.default_rng(0)
+    days = np.arange(SIZE, dtype=np.float64)
+    x_data = np.column_stack([days, np.log(days+2)])
+    y_data = -5+days/50+generator.normal(0, .3, SIZE)
+    expected = fit_backend("numpy", x_data, y_data)
+    results = fit_backend("sklearn", x_data, y_data)
+    for key, result in results.items():
+        assert get_difference(result, expected[key]) <= PARITY_TOLERANCE, key
+    for columns in range(1, 3):
+        assert get_difference(results["made", columns], results["predict", columns]) \
+               <= PARITY_TOLERANCE
+
+def test_unknown_backend():
+    backend = regression_backend.get_backend()
+    with pytest.raises(ValueError):
+        regression_backend.set_backend("fortran")
+    assert regression_backend.get_backend() == backend
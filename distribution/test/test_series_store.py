@@ -0,0 +1,26 @@
+"""
+This module tests that the float32 values of a VaccinationSeriesStore give back
+the float64 fractions the csv was parsed into, and that a store is only built
+from values where they can
+"""
+import numpy as np
+import pytest
+from series_store import VALUE_DTYPE
+from series_store import VaccinationSeriesStore
+from series_store import exact_values
+
+def test_every_percentage_is_restored():
+    # Every percentage the csv can give, divided the way parse_vaccinations does
+    fractions = np.arange(0, 100001)/100/100
+    assert np.array_equal(exact_values(fractions.astype(VALUE_DTYPE)), fractions)
+
+def test_store_values_are_restored():
+    fractions = np.array([50.37, 98.99, 99, .01])/100
+    store = VaccinationSeriesStore(["Chile"], [0, 4], np.arange(4), fractions)
+    values = exact_values(store["Chile"].values)
+    assert values.dtype == np.float64
+    assert np.array_equal(values, fractions)
+
+def test_values_with_more_decimals_are_rejected():
+    with pytest.raises(ValueError):
+        VaccinationSeriesStore(["Chile"], [0, 2], np.arange(2), np.array([50.375, 60])/100)
@@ -0,0 +1,73 @@
+"""
+This module tests that the shared series file gives back the store it was written from
+The mapped store must hold the same countries, days, values and min_date as
+ingesting the csv, must be mapped instead of ingested while the csv is unchanged,
+and must be written again once it changes.
+"""
+import os
+import numpy as np
+import pandas as pd
+import shared_series
+from incremental_ingest import ingest_vaccinations
+from series_store import VaccinationSeriesStore
+from shared_series import get_shared_path
+from shared_series import iter_shared_store
+from shared_series import load_shared_store
+ROWS = ["Chile,CHL,2021-01-02,1.5", "Perú,PER,2021-01-01,0.25", "Chile,CHL,2021-01-04,2.75",
+        "Nepal,NPL,2021-01-03,0.01", "Perú,PER,2021-01-04,3.5", "Chile,CHL,2021-01-05,99.99"]
+
+def write_csv(file_path, rows, mtime_ns):
+    """Writes the columns of vaccinations.csv the ingest reads, with a set modification time"""
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write("location,iso_code,date,people_fully_vaccinated_per_hundred\n")
+        file.write("\n".join(rows)+"\n")
+    os.utime(file_path, ns=(mtime_ns, mtime_ns))
+
+def assert_same_store(store, expected):
+    """Checks that two stores hold the same countries in the same order and the same rows"""
+    assert store.locations == expected.locations
+    np.testing.assert_array_equal(store.offsets, expected.offsets)
+    for name in ["days", "values"]:
+        assert getattr(store, name).dtype == getattr(expected, name).dtype
+        np.testing.assert_array_equal(getattr(store, name), getattr(expected, name))
+
+def forbid_ingesting(file_path):
+    """Stands in for ingest_vaccinations, so a test fails if the csv is ingested"""
+    raise AssertionError("The csv was ingested instead of mapping the shared file")
+
+def test_shared_store_round_trip(tmp_path, monkeypatch):
+    file_path = str(tmp_path/"vaccinations.csv")
+    write_csv(file_path, ROWS, 10**18)
+    store, min_date = load_shared_store(file_path, 2)
+    index, expected_date = ingest_vaccinations(file_path)[:2]
+    expected = VaccinationSeriesStore.from_index(index, 2)
+    assert_same_store(store, expected)
+    assert min_date == pd.Timestamp(expected_date)
+    # The arrays are read-only views of the mapped file, not copies
+    assert not store.days.flags.writeable and not store.values.flags.writeable
+    with monkeypatch.context() as patch:
+        patch.setattr(shared_series, "ingest_vaccinations", forbid_ingesting)
+        mapped, mapped_date = load_shared_store(file_path, 2)
+        assert_same_store(mapped, expected)
+        assert mapped_date == min_date
+        assert [country for _, _, country in iter_shared_store(file_path, 2)] == \
+               sorted(expected)
+    # Each min_rows keeps its own file
+    assert_same_store(load_shared_store(file_path, 1)[0],
+                      VaccinationSeriesStore.from_index(index, 1))
+    assert os.path.exists(get_shared_path(file_path, 2))
+    assert os.path.exists(get_shared_path(file_path, 1))
+
+def test_changed_csv_is_written_again(tmp_path):
+    file_path = str(tmp_path/"vaccinations.csv")
+    write_csv(file_path, ROWS, 10**18)
+    load_shared_store(file_path, 1)
+    write_csv(file_path, ROWS+["Nepal,NPL,2021-01-06,0.5"], 2*10**18)
+    loaded = None
+    for store, _, country in iter_shared_store(file_path, 1):
+        assert country in store
+        loaded = store
+    index = ingest_vaccinations(file_path)[0]
+    expected = VaccinationSeriesStore.from_index(index, 1)
+    assert_same_store(loaded, expected)
+    assert_same_store(load_shared_store(file_path, 1)[0], expected)
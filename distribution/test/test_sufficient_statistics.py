@@ -0,0 +1,78 @@
+"""
+This module tests that sufficient statistics updated with new days match a rebuild
+The statistics made from part of a series and then caught up must be the
+statistics made from the whole series, and every model made from them must
+predict like the model fit on the rows.
+"""
+import os
+import numpy as np
+import pytest
+from logistic_logarithmic_regression import LogisticLogarithmicRegressionModel
+from logistic_polynomial_regression import LogisticPolynomialRegressionModel
+from logistic_regression import LogisticRegressionModel
+from polynomial_regression import PolynomialRegressionModel
+from series_store import VaccinationSeriesStore
+from sufficient_statistics import CountryStatistics
+from sufficient_statistics import read_statistics
+from sufficient_statistics import update_country
+from sufficient_statistics import write_statistics
+MODELS = [LogisticRegressionModel, LogisticLogarithmicRegressionModel,
+          PolynomialRegressionModel, LogisticPolynomialRegressionModel]
+SETTINGS = {"min_rows":100}
+
+def make_series(size, revise=False):
+    """Returns the first days of a noisy logistic curve, optionally with its first value revised"""
+    generator = np.random.default_rng(3)
+    days = np.cumsum(generator.integers(1, 4, 300))[:size]
+    curve = 1/(1+np.exp(-(days-200)/50))+generator.normal(0, .005, len(days))
+    values = np.round(np.clip(curve, 0, .99)*10000)/10000
+    if revise:
+        values[0] += .0001
+    return VaccinationSeriesStore(["Chile"], [0, len(days)], days, values)["Chile"]
+
+def get_arrays(statistics):
+    """Returns every array of the statistics, in the order they are compared"""
+    return [statistics.linear_gram, statistics.linear_moments, statistics.linear_squares,
+            statistics.polynomial_gram, statistics.polynomial_moments,
+            statistics.polynomial_squares]
+
+def test_incremental_update_matches_rebuild():
+    series = make_series(300)
+    statistics = CountryStatistics.from_series(make_series(120))
+    # New days arrive in a few batches, each past the days the statistics were mapped for
+    for size in [121, 200, 260, 300]:
+        statistics = update_country(statistics, make_series(size))
+    rebuilt = CountryStatistics.from_series(series)
+    assert (statistics.center, statistics.width) == (rebuilt.center, rebuilt.width)
+    assert (statistics.count, statistics.digest) == (rebuilt.count, rebuilt.digest)
+    for updated, expected in zip(get_arrays(statistics), get_arrays(rebuilt)):
+        np.testing.assert_allclose(updated, expected, rtol=1e-9, atol=1e-9)
+    days = np.arange(0, 900, 7, dtype=np.float64).reshape(-1, 1)
+    for model in MODELS:
+        fit = model(series)
+        from_statistics = model.from_statistics(statistics)
+        assert getattr(from_statistics, "degree", None) == getattr(fit, "degree", None)
+        assert getattr(from_statistics, "bool", None) == getattr(fit, "bool", None)
+        np.testing.assert_allclose(from_statistics.predict(days.copy()), fit.predict(days.copy()),
+                                   rtol=1e-8, atol=1e-8)
+
+def test_revised_rows_are_rebuilt():
+    statistics = CountryStatistics.from_series(make_series(200))
+    revised = make_series(250, revise=True)
+    with pytest.raises(ValueError):
+        statistics.catch_up(revised)
+    rebuilt = update_country(statistics, revised)
+    assert rebuilt is not statistics
+    assert rebuilt.digest == CountryStatistics.from_series(revised).digest
+
+def test_statistics_round_trip(tmp_path):
+    statistics_path = str(tmp_path/"prediction_data.csv.stats.npz")
+    statistics = {"Chile":CountryStatistics.from_series(make_series(300))}
+    write_statistics(statistics_path, statistics, SETTINGS)
+    assert os.listdir(tmp_path) == [os.path.basename(statistics_path)]
+    read = read_statistics(statistics_path, SETTINGS)
+    assert list(read) == ["Chile"]
+    assert read["Chile"].digest == statistics["Chile"].digest
+    for loaded, expected in zip(get_arrays(read["Chile"]), get_arrays(statistics["Chile"])):
+        np.testing.assert_array_equal(loaded, expected)
+    assert read_statistics(statistics_path, {"min_rows":50}) == dict()
@@ -0,0 +1,66 @@
+"""
+This module tests when the binary cache of vaccinations.csv is used
+The cache must be used while the size and modification time of the csv match,
+and while only the modification time changed but the content hash did not.
+Any other change to the csv must parse it again.
+"""
+import os
+import numpy as np
+import pytest
+import vaccination_cache
+from vaccination_cache import get_cache_path
+from vaccination_cache import hash_file
+from vaccination_cache import load_vaccinations
+from vaccination_cache import parse_vaccinations
+from vaccination_cache import read_cache
+ROWS = ["Chile,CHL,2021-01-02,1.5", "Chile,CHL,2021-01-03,", "Peru,PER,2021-01-01,0.25",
+        "Chile,CHL,2021-01-05,2.75", "Peru,PER,2021-01-04,3.5"]
+
+def write_csv(file_path, rows, mtime_ns):
+    """Writes the columns of vaccinations.csv the cache reads, with a set modification time"""
+    with open(file_path, "w") as file:
+        file.write("location,iso_code,date,people_fully_vaccinated_per_hundred\n")
+        file.write("\n".join(rows)+"\n")
+    os.utime(file_path, ns=(mtime_ns, mtime_ns))
+
+def assert_same_index(loaded, parsed):
+    """Checks that two loads of the csv give the same countries, rows and min_date"""
+    (index, min_date), (expected, expected_date) = loaded, parsed
+    assert index.locations == expected.locations
+    for name in ["starts", "ends", "days", "values"]:
+        np.testing.assert_array_equal(getattr(index, name), getattr(expected, name))
+    assert min_date == expected_date
+
+@pytest.fixture
+def csv_path(tmp_path):
+    file_path = str(tmp_path/"vaccinations.csv")
+    write_csv(file_path, ROWS, 10**18)
+    load_vaccinations(file_path)
+    return file_path
+
+def forbid_parsing(monkeypatch):
+    """Makes parsing the csv fail, so a test fails if the cache is not used"""
+    def parse(file_path):
+        raise AssertionError("The csv was parsed instead of using the cache")
+    monkeypatch.setattr(vaccination_cache, "parse_vaccinations", parse)
+
+def test_unchanged_csv_uses_cache(csv_path, monkeypatch):
+    parsed = parse_vaccinations(csv_path)
+    forbid_parsing(monkeypatch)
+    assert_same_index(load_vaccinations(csv_path), parsed)
+
+def test_touched_csv_checks_hash(csv_path, monkeypatch):
+    parsed = parse_vaccinations(csv_path)
+    os.utime(csv_path, ns=(2*10**18, 2*10**18))
+    forbid_parsing(monkeypatch)
+    assert_same_index(load_vaccinations(csv_path), parsed)
+    # The new modification time is kept, so the next load does not hash the csv
+    assert int(read_cache(get_cache_path(csv_path))["mtime"]) == 2*10**18
+
+@pytest.mark.parametrize("rows", [ROWS[:-1]+["Peru,PER,2021-01-04,3.6"],
+                                  ROWS+["Peru,PER,2021-01-06,4.5"]])
+def test_changed_csv_is_parsed(csv_path, rows):
+    # The first rows keep the size of the csv, so only the hash finds the change
+    write_csv(csv_path, rows, 2*10**18)
+    assert_same_index(load_vaccinations(csv_path), parse_vaccinations(csv_path))
+    assert str(read_cache(get_cache_path(csv_path))["digest"]) == hash_file(csv_path)
@@ -0,0 +1,105 @@
+"""
+This module streams owid-covid-data.csv in bounded-size chunks
+Only the columns the cleaning notebook keeps are read, with explicit dtypes,
+so the dropped columns are never loaded. While streaming, rows without a
+people_fully_vaccinated_per_hundred value are dropped, and so is every country
+with less than 100 remaining rows, as soon as all of its rows have been read.
+Peak memory then scales with the kept columns and rows rather than the raw file.
+"""
+import numpy as np
+import pandas as pd
+CHUNK_SIZE = 50000
+MIN_ROWS = 100
+TARGET_COLUMN = "people_fully_vaccinated_per_hundred"
+# There is a scaled version of these columns
+UNSCALED_COLUMNS = ["total_cases", "new_cases", "new_cases_smoothed", "total_deaths",
+                    "new_deaths", "new_deaths_smoothed", "icu_patients", "hosp_patients",
+                    "weekly_icu_admissions", "weekly_hosp_admissions", "new_tests",
+                    "total_tests", "new_tests_smoothed", "total_vaccinations",
+                    "people_vaccinated", "people_fully_vaccinated",
+                    "new_vaccinations_smoothed", "new_vaccinations"]
+# There is a smoothed version of these columns
+UNSMOOTHED_COLUMNS = ["new_cases_per_million", "new_deaths_per_million",
+                      "new_tests_per_thousand"]
+# The location already identifies the country and continent
+IDENTIFIER_COLUMNS = ["iso_code", "continent"]
+# These columns have one value for each country
+CONSTANT_COLUMNS = ["human_development_index", "life_expectancy",
+                    "hospital_beds_per_thousand", "handwashing_facilities", "male_smokers",
+                    "female_smokers", "diabetes_prevalence", "cardiovasc_death_rate",
+                    "extreme_poverty", "gdp_per_capita", "aged_70_older", "aged_65_older",
+                    "median_age", "population_density", "population", "tests_units"]
+FEATURE_COLUMNS = ["total_cases_per_million", "new_cases_smoothed_per_million",
+                   "total_deaths_per_million", "new_deaths_smoothed_per_million",
+                   "reproduction_rate", "icu_patients_per_million",
+                   "hosp_patients_per_million", "weekly_icu_admissions_per_million",
+                   "weekly_hosp_admissions_per_million", "total_tests_per_thousand",
+                   "new_tests_smoothed_per_thousand", "positive_rate", "tests_per_case",
+                   "total_vaccinations_per_hundred", "people_vaccinated_per_hundred",
+                   TARGET_COLUMN, "new_vaccinations_smoothed_per_million",
+                   "stringency_index", "excess_mortality"]
+DTYPES = dict({"location":str, "date":str}, **{column:np.float64 for column in FEATURE_COLUMNS})
+
+def keep_countries(data, min_rows, finished):
+    """Keeps the countries of a block of rows that have enough rows
+
+    Every country in the block must have all of its rows in the block
+
+    Args:
+        data: a dataframe holding every row of the countries in it
+        min_rows: the minimum number of rows a country needs to be kept
+        finished: a set of the countries that were already finished,
+                  the countries in data are added to it
+
+    Returns:
+        A dataframe holding the rows of the countries with at least min_rows rows
+
+    Raises:
+        ValueError: if a country in data was already finished, which means
+                    the csv is not grouped by location
+    """
+    counts = data["location"].value_counts()
+    if finished.intersection(counts.index):
+        raise ValueError("The csv must have the rows of each location next to each other")
+    finished.update(counts.index)
+    return data.loc[data["location"].isin(counts.index[counts >= min_rows])]
+
+def load_owid_data(file_path, min_rows=MIN_ROWS, drop_missing=True, chunk_size=CHUNK_SIZE):
+    """Streams owid-covid-data.csv, keeping only the data the notebook uses
+
+    Reads the location, date, and FEATURE_COLUMNS in chunks of chunk_size rows
+    The rows of the last location of a chunk are held back until the next chunk,
+    since that location may continue there. Every other location is finished,
+    so it is dropped right away if it has less than min_rows rows
+
+    Args:
+        file_path: the path to the owid-covid-data.csv file
+        min_rows: the minimum number of rows a country needs to be kept
+        drop_missing: whether to drop rows without a people_fully_vaccinated_per_hundred value
+        chunk_size: the number of rows to read at a time
+
+    Returns:
+        A dataframe with a country column, a datetime date column,
+        and the FEATURE_COLUMNS in the file
+    """
+    kept = []
+    finished = set()
+    pending = None
+    reader = pd.read_csv(file_path, usecols=lambda column: column in DTYPES,
+                         dtype=DTYPES, chunksize=chunk_size)
+    for chunk in reader:
+        if drop_missing:
+            chunk = chunk.loc[chunk[TARGET_COLUMN].notnull()]
+        if pending is not None:
+            chunk = pd.concat([pending, chunk])
+        if len(chunk) == 0:
+            continue
+        is_last = (chunk["location"] == chunk["location"].iloc[-1]).to_numpy()
+        pending = chunk.loc[is_last]
+        kept.append(keep_countries(chunk.loc[~is_last], min_rows, finished))
+    if pending is not None:
+        kept.append(keep_countries(pending, min_rows, finished))
+    data = pd.concat(kept, ignore_index=True) if kept else \
+        pd.DataFrame({column:pd.Series(dtype=dtype) for column, dtype in DTYPES.items()})
+    data["date"] = pd.to_datetime(data["date"], format="%Y-%m-%d")
+    return data.rename(columns={"location":"country"})
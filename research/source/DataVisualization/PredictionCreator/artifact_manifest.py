@@ -0,0 +1,188 @@
+"""
+This module keeps a manifest next to each file the creators write
+The manifest records a content hash of the series of every country the file was
+made from, along with the model version and the constants the models use.
+When the creators run again, a country whose series hashes the same as in the
+manifest, under the same settings, already has up to date rows in the file,
+so its models do not need to be fit again.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import pandas as pd
+from logistic_regression import Y_OFFSET
+from logistic_regression import Y_FIT_LIMIT
+from logistic_regression import Y_FIT_REPLACEMENT
+from logistic_regression import Y_TRANSFORM_LIMIT
+from logistic_regression import Y_TRANSFORM_REPLACEMENT
+MANIFEST_SUFFIX = ".manifest.json"
+MANIFEST_VERSION = 1
+# Bump this whenever a model changes how it fits, scores or predicts
+MODEL_VERSION = 4
+# The permissions of a written file, which mkstemp would otherwise make private
+FILE_MODE = 0o644
+
+def get_manifest_path(artifact_path):
+    """Returns the path of the manifest for a file the creators write
+
+    Args:
+        artifact_path: the path to the file
+
+    Returns:
+        The path the manifest is stored at, next to the file
+    """
+    return artifact_path + MANIFEST_SUFFIX
+
+def get_settings(**extra):
+    """Returns everything besides the data that the rows of a country depend on
+
+    Args:
+        extra: settings of the creator itself, like the number of rows kept
+
+    Returns:
+        A dictionary with the model version, the model constants, and extra
+    """
+    settings = {"model_version":MODEL_VERSION, "Y_OFFSET":Y_OFFSET,
+                "Y_FIT_LIMIT":Y_FIT_LIMIT, "Y_FIT_REPLACEMENT":Y_FIT_REPLACEMENT,
+                "Y_TRANSFORM_LIMIT":Y_TRANSFORM_LIMIT,
+                "Y_TRANSFORM_REPLACEMENT":Y_TRANSFORM_REPLACEMENT}
+    settings.update(extra)
+    return settings
+
+def hash_series(series):
+    """Hashes the days and values of a VaccinationSeries
+
+    Args:
+        series: a VaccinationSeries
+
+    Returns:
+        The sha256 hex digest of the series
+    """
+    digest = hashlib.sha256()
+    digest.update(series.days.tobytes())
+    digest.update(series.values.tobytes())
+    return digest.hexdigest()
+
+def hash_store(store):
+    """Hashes the series of every country in a VaccinationSeriesStore
+
+    Args:
+        store: a VaccinationSeriesStore
+
+    Returns:
+        A dictionary from each country to the hash of its series
+    """
+    return {country:hash_series(store[country]) for country in store}
+
+def read_manifest(artifact_path, settings):
+    """Reads the hashes of the countries a file was made from
+
+    Args:
+        artifact_path: the path to the file the creator writes
+        settings: the dictionary made by get_settings for this run
+
+    Returns:
+        A dictionary from each country to the hash of its series, or an empty
+        dictionary if the file or its manifest is missing, can not be read,
+        or was written with other settings, since then every country is stale
+    """
+    if not os.path.exists(artifact_path):
+        return dict()
+    try:
+        with open(get_manifest_path(artifact_path), "r") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return dict()
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION or \
+       manifest.get("settings") != json.loads(json.dumps(settings)):
+        return dict()
+    return manifest.get("countries", dict())
+
+def is_stale(manifest, country, digest):
+    """Checks whether the rows of a country need to be made again
+
+    Args:
+        manifest: the dictionary made by read_manifest
+        country: the name of the country
+        digest: the hash of the country's series now
+
+    Returns:
+        True if the file has no rows for the country made from this series
+    """
+    return manifest.get(country) != digest
+
+def find_stale(manifest, hashes):
+    """Finds every country whose rows need to be made again
+
+    Args:
+        manifest: the dictionary made by read_manifest
+        hashes: the dictionary made by hash_store for the data now
+
+    Returns:
+        A set of the stale countries
+    """
+    return {country for country, digest in hashes.items()
+            if is_stale(manifest, country, digest)}
+
+def read_fresh_rows(artifact_path, hashes, stale, **kwargs):
+    """Reads the rows of the countries that are not stale from the last file
+
+    Args:
+        artifact_path: the path to the file the creator writes
+        hashes: the dictionary made by hash_store for the data now
+        stale: the set made by find_stale
+        kwargs: passed on to pandas read_csv
+
+    Returns:
+        A dataframe with the rows of every country in hashes that is not stale
+    """
+    fresh = set(hashes)-stale
+    if not fresh:
+        return pd.DataFrame()
+    # Parse the floats exactly, so rewriting the rows does not change them
+    data = pd.read_csv(artifact_path, float_precision="round_trip", **kwargs)
+    return data.loc[data["location"].isin(fresh)]
+
+def replace_file(file_path, write):
+    """Writes a file through a temporary file of its own, then moves it into place
+
+    Runs that write the same file at the same time never share a temporary file,
+    and a failed write removes its temporary file and leaves the old file as it was
+
+    Args:
+        file_path: the path to write the file to
+        write: a function that writes the contents to an open text file
+
+    Raises:
+        OSError: if the file can not be written
+    """
+    tmp_path = None
+    try:
+        descriptor, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or ".",
+                                                prefix=os.path.basename(file_path)+".",
+                                                suffix=".tmp")
+        os.chmod(tmp_path, FILE_MODE)
+        with os.fdopen(descriptor, "w", encoding="utf-8", newline="") as file:
+            write(file)
+        os.replace(tmp_path, file_path)
+    except Exception:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_artifact(artifact_path, data, hashes, settings):
+    """Writes a file and then its manifest, each atomically with replace_file
+
+    The file is written first, so a manifest never describes rows
+    that are not in the file
+
+    Args:
+        artifact_path: the path to write the file to
+        data: a dataframe with the rows of every country
+        hashes: the dictionary made by hash_store for the data the rows were made from
+        settings: the dictionary made by get_settings for this run
+    """
+    replace_file(artifact_path, lambda file: data.to_csv(file, index=False))
+    manifest = {"version":MANIFEST_VERSION, "settings":settings, "countries":hashes}
+    replace_file(get_manifest_path(artifact_path), lambda file: json.dump(manifest, file))
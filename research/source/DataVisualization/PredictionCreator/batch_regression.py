@@ -0,0 +1,511 @@
+"""
+This module fits the models of every country at once
+The series of the countries are concatenated, and where each country starts
+is kept as an array of offsets. The Gram matrix and moments of every country
+are found from its rows with the gram kernel, then the small systems of
+every country are solved in one stacked call. Every fit is scored
+from the normal equations of the rows it is scored on, so choosing a degree,
+or between the line and the logarithmic curve, never predicts the rows.
+With leave_one_out, each fit is also scored by its leave-one-out residuals,
+found from the hat diagonal of the fit itself, and the choices are made by them.
+
+The days of each country are mapped to [-1, 1] before the features are made.
+The polynomials are fit in the Chebyshev basis of the mapped days, like the
+polynomial models, whose Gram matrix stays well conditioned at any degree,
+where the powers of the days themselves reach 1e19 by degree 7. The lines are
+fit on the mapped days, and their coefficients are turned back into
+coefficients of the days.
+"""
+import numpy as np
+from kernel_backend import gram
+from least_squares import FitStatistics
+from least_squares import get_loo_residuals
+from least_squares import leading_block
+from least_squares import score_fit
+from polynomial_regression import MAX_DEGREE
+from polynomial_regression import transform_x
+
+class BatchFit:
+    """This Class holds the fits of one model for every country of a batch
+
+    Attributes:
+        intercepts: holds the intercept of each country
+        coefficients: holds a row with the coefficients of each country,
+                      padded with zeros past the features the country uses
+        statistics: holds a FitStatistics with arrays of the sums of squares
+                    and r-squared values of every country
+        scores: holds the r-squared value of each country
+        choices: holds the bool or degree each country uses
+        domains: holds the centers and half widths of the mapped days of every country
+                 for fits in the Chebyshev basis, or None for fits of the days
+    """
+
+    def __init__(self, intercepts, coefficients, statistics, choices, domains=None):
+        """Initialize the fits of every country
+
+        Args:
+            intercepts: an array with the intercept of each country
+            coefficients: an array with a row of coefficients for each country
+            statistics: a FitStatistics with an array for each attribute
+            choices: an array with the bool or degree of each country
+            domains: an array with the center of each country and an array with
+                     its half width, if the fits are in the Chebyshev basis
+        """
+        self.intercepts = intercepts
+        self.coefficients = coefficients
+        self.statistics = statistics
+        self.scores = statistics.r_squared
+        self.choices = choices
+        self.domains = domains
+
+    def predict(self, x_data):
+        """Predicts the y values of the same days for every country at once
+
+        Fits in the Chebyshev basis map the days with the domain of each country,
+        and the other fits use the days, and log(x+2) if they have a second coefficient
+
+        Args:
+            x_data: the days, with one column
+
+        Returns:
+            An array with a row of the predicted y values of each country
+        """
+        x_data = np.asarray(x_data, dtype=np.float64).reshape(-1)
+        count, features = self.coefficients.shape
+        if self.domains is not None:
+            centers, widths = self.domains
+            u_data = (x_data[None, :]-centers[:, None])/widths[:, None]
+            basis = transform_x(u_data.reshape(-1), features).reshape(count, len(x_data), features)
+            return np.einsum("ijk,ik->ij", basis, self.coefficients)+self.intercepts[:, None]
+        basis = get_linear_features(x_data, x_data)[:, :features]
+        return self.coefficients @ basis.T+self.intercepts[:, None]
+
+def stack_segments(arrays):
+    """Concatenates the arrays of every country
+
+    Args:
+        arrays: a list with an array for each country
+
+    Returns:
+        The concatenated float64 array, and an array with where each country
+        starts, followed by the total length
+
+    Raises:
+        ValueError: if a country has no values, since it can not be fit
+    """
+    lengths = np.array([len(array) for array in arrays], dtype=np.int64)
+    if len(lengths) == 0 or lengths.min() == 0:
+        raise ValueError("Every country of a batch needs at least one value")
+    offsets = np.zeros(len(arrays)+1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return np.concatenate(arrays).astype(np.float64), offsets
+
+def get_domain(x_data, offsets):
+    """Finds the center and half width of the days of every country
+
+    Args:
+        x_data: the concatenated days
+        offsets: where each country starts, followed by the total length
+
+    Returns:
+        An array with the center of each country and an array with its half width
+    """
+    lowest = np.minimum.reduceat(x_data, offsets[:-1])
+    highest = np.maximum.reduceat(x_data, offsets[:-1])
+    widths = (highest-lowest)/2
+    # A country with one day maps every day by its distance from it
+    widths[widths == 0] = 1
+    return (highest+lowest)/2, widths
+
+def normalize(x_data, offsets, centers, widths):
+    """Maps the days of every country with its center and half width
+
+    Args:
+        x_data: the concatenated days
+        offsets: where each country starts, followed by the total length
+        centers: the center of each country
+        widths: the half width of each country
+
+    Returns:
+        The concatenated mapped days
+    """
+    lengths = np.diff(offsets)
+    return (x_data-np.repeat(centers, lengths))/np.repeat(widths, lengths)
+
+def segmented_gram(features, y_data, offsets):
+    """Finds the normal equations of every country with an intercept
+
+    The features are given a leading column of ones for the intercept, and the
+    Gram matrix of each country is found from its rows with the gram kernel,
+    so no more than one Gram matrix is ever made per country
+
+    Args:
+        features: the concatenated features, with a row for each value
+        y_data: the concatenated y values
+        offsets: where each country starts, followed by the total length
+
+    Returns:
+        A stacked array with the Gram matrix of each country and
+        a stacked array with the features times y_data of each country
+    """
+    features = np.asarray(features, dtype=np.float64).reshape(len(y_data), -1)
+    columns = features.shape[1]+1
+    grams = np.empty((len(offsets)-1, columns, columns))
+    moments = np.empty((len(offsets)-1, columns))
+    for i, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+        grams[i], moments[i] = gram(features[start:end], y_data[start:end])
+    return grams, moments
+
+def segmented_equations(features, y_data, offsets):
+    """Finds the normal equations of every country, which are enough to fit and score it
+
+    Args:
+        features: the concatenated features, with a row for each value
+        y_data: the concatenated y values
+        offsets: where each country starts, followed by the total length
+
+    Returns:
+        A tuple of the stacked Gram matrices, the stacked moments, an array with
+        y^T y of each country, and an array with the number of rows of each country,
+        like least_squares.get_normal_equations for every country
+    """
+    grams, moments = segmented_gram(features, y_data, offsets)
+    squares = np.add.reduceat(y_data**2, offsets[:-1])
+    return grams, moments, squares, np.diff(offsets)
+
+def segmented_press(features, y_data, offsets, solution, grams):
+    """Finds the leave-one-out residual sum of squares (PRESS) of every country
+
+    The hat diagonal of a row is r^T (X^T X)^-1 r, where r is the row with a
+    leading one and X^T X is the Gram matrix of its country. It is found by
+    solving with the Gram matrix of each country for the rows of that country,
+    without making the inverse
+
+    Args:
+        features: the concatenated features, with a row for each value
+        y_data: the concatenated y values
+        offsets: where each country starts, followed by the total length
+        solution: the array made by solve_stacked
+        grams: the stacked Gram matrices the solution was solved from
+
+    Returns:
+        An array with the PRESS of each country
+    """
+    rows = np.column_stack([np.ones(len(features)), features])
+    press = np.empty(len(offsets)-1)
+    for i, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+        country = rows[start:end]
+        residuals = y_data[start:end]-country @ solution[i]
+        leverage = np.einsum("ij,ji->i", country, np.linalg.solve(grams[i], country.T))
+        press[i] = np.sum(get_loo_residuals(residuals, leverage)**2)
+    return press
+
+def get_scores(statistics, leave_one_out):
+    """Returns the scores fits are chosen by
+
+    Args:
+        statistics: a FitStatistics with an array for each attribute
+        leave_one_out: whether to choose by the leave-one-out r-squared values
+
+    Returns:
+        The leave-one-out r-squared values if leave_one_out, and the r-squared values otherwise
+    """
+    return statistics.loo_r_squared if leave_one_out else statistics.r_squared
+
+def check_scoring(test, leave_one_out):
+    """Checks that a fit is not asked to score on a test split and leave-one-out
+
+    Args:
+        test: the test tuple passed to a fit, or None
+        leave_one_out: whether the fit was asked for leave-one-out scores
+
+    Raises:
+        ValueError: if both were asked for, since leave-one-out scores the rows fit on
+    """
+    if test is not None and leave_one_out:
+        raise ValueError("Leave-one-out scores the rows fit on, so it can not use a test split")
+
+def solve_stacked(grams, moments):
+    """Solves the normal equations of every country in one call
+
+    Args:
+        grams: the stacked Gram matrices
+        moments: the stacked moments
+
+    Returns:
+        An array with a row for each country, holding its intercept and then
+        the coefficient of each feature
+    """
+    return np.linalg.solve(grams, moments[:, :, None])[:, :, 0]
+
+def fit_degrees(train, test, degree, leave_one_out=False):
+    """Fits polynomials in the Chebyshev basis of the mapped days of every degree up to degree
+
+    The normal equations of the highest degree are found once on the rows fit on,
+    and once on the rows scored on, and each degree uses the leading block of them
+
+    Args:
+        train: a tuple of the concatenated mapped days, y values, and offsets to fit on
+        test: a tuple of the same to score on
+        degree: the highest degree to fit
+        leave_one_out: whether to also find the PRESS of each degree on the rows fit on
+
+    Returns:
+        A list with the solution and FitStatistics of each degree from 1 to degree
+    """
+    train_u, train_y, train_offsets = train
+    basis = transform_x(train_u, degree)
+    equations = segmented_equations(basis, train_y, train_offsets)
+    test_equations = equations
+    if test is not train:
+        test_u, test_y, test_offsets = test
+        test_equations = segmented_equations(transform_x(test_u, degree), test_y, test_offsets)
+    rows = (basis, train_y, train_offsets) if leave_one_out else None
+    return solve_degrees(equations, test_equations, degree, rows)
+
+def solve_degrees(equations, test_equations, degree, rows=None):
+    """Solves polynomials of every degree up to degree from the normal equations of every country
+
+    Each degree solves the leading block of the normal equations of the highest degree
+
+    Args:
+        equations: the stacked normal equations of the highest degree on the rows fit on
+        test_equations: the stacked normal equations of the highest degree on the rows scored on
+        degree: the highest degree to fit
+        rows: a tuple of the concatenated basis, y values, and offsets fit on,
+              to also find the PRESS of each degree, or None
+
+    Returns:
+        A list with the solution and FitStatistics of each degree from 1 to degree
+    """
+    fits = []
+    for current in range(1, degree+1):
+        grams, moments, _, _ = leading_block(equations, current+1)
+        solution = solve_stacked(grams, moments)
+        press = None
+        if rows is not None:
+            basis, y_data, offsets = rows
+            press = segmented_press(basis[:, :current], y_data, offsets, solution, grams)
+        fits.append((solution, score_fit(test_equations, solution, press)))
+    return fits
+
+def choose_degrees(fits, leave_one_out=False):
+    """Chooses the degree with the best score for every country
+
+    Like the models, a higher degree is only chosen if its score is strictly better
+
+    Args:
+        fits: the list made by fit_degrees
+        leave_one_out: whether to choose by the leave-one-out r-squared values
+
+    Returns:
+        An array with the chosen degree of each country, the solution of each country
+        at that degree, padded to the highest degree, and a FitStatistics with the
+        statistics of each country at that degree
+    """
+    first = fits[0][1]
+    count = len(first.r_squared)
+    degree = len(fits)
+    degrees = np.ones(count, dtype=np.int64)
+    solution = np.zeros((count, degree+1))
+    solution[:, :2] = fits[0][0]
+    scores = get_scores(first, leave_one_out).copy()
+    residuals = first.residual.copy()
+    presses = first.press.copy() if leave_one_out else None
+    for current in range(2, degree+1):
+        current_solution, current_statistics = fits[current-1]
+        current_scores = get_scores(current_statistics, leave_one_out)
+        better = current_scores > scores
+        degrees[better] = current
+        scores[better] = current_scores[better]
+        residuals[better] = current_statistics.residual[better]
+        if leave_one_out:
+            presses[better] = current_statistics.press[better]
+        solution[better] = 0
+        solution[better, :current+1] = current_solution[better]
+    return degrees, solution, FitStatistics(residuals, first.total, first.count, degrees, presses)
+
+def fit_polynomial(x_data, y_data, offsets, test=None, leave_one_out=False,
+                   max_degree=MAX_DEGREE):
+    """Fits the polynomial models of every country
+
+    Matches PolynomialRegressionModel and LogisticPolynomialRegressionModel,
+    depending on whether y_data is the transformed y values
+
+    Args:
+        x_data: the concatenated days to fit on
+        y_data: the concatenated y values to fit on
+        offsets: where each country starts, followed by the total length
+        test: a tuple of the concatenated days, y values, and offsets to score
+              and choose the degree on, by default the data fit on
+        leave_one_out: whether to also score each degree by its leave-one-out
+                       residuals, and choose the degree by them
+        max_degree: the highest degree to fit, which may be above MAX_DEGREE
+
+    Returns:
+        A BatchFit in the Chebyshev basis, whose choices are the degree of each country
+
+    Raises:
+        ValueError: if both test and leave_one_out are given
+    """
+    check_scoring(test, leave_one_out)
+    centers, widths = get_domain(x_data, offsets)
+    train = (normalize(x_data, offsets, centers, widths), y_data, offsets)
+    if test is None:
+        test = train
+    else:
+        test_x, test_y, test_offsets = test
+        test = (normalize(test_x, test_offsets, centers, widths), test_y, test_offsets)
+    fits = fit_degrees(train, test, max_degree, leave_one_out)
+    return choose_polynomial(fits, centers, widths, leave_one_out)
+
+def choose_polynomial(fits, centers, widths, leave_one_out=False):
+    """Chooses the degree of every country and keeps the fits of those degrees
+
+    Args:
+        fits: the list made by fit_degrees or solve_degrees
+        centers: the center of the days of each country
+        widths: the half width of the days of each country
+        leave_one_out: whether to choose by the leave-one-out r-squared values
+
+    Returns:
+        A BatchFit in the Chebyshev basis, whose choices are the degree of each country
+    """
+    degrees, solution, statistics = choose_degrees(fits, leave_one_out)
+    return BatchFit(solution[:, 0], solution[:, 1:], statistics, degrees, (centers, widths))
+
+def get_linear_features(u_data, x_data):
+    """Builds the features of the logistic logarithmic models
+
+    The features of the logistic models are the first column
+
+    Args:
+        u_data: the concatenated mapped days
+        x_data: the concatenated days
+
+    Returns:
+        An array with the mapped days and log(x+2) of the days
+    """
+    return np.column_stack([u_data, np.log(x_data+2)])
+
+def get_linear_equations(x_data, y_data, offsets, test=None):
+    """Finds the normal equations of the logistic logarithmic features of every country
+
+    Their leading block holds the normal equations of the line, so both
+    curves are fit and scored from them
+
+    Args:
+        x_data: the concatenated days to fit on
+        y_data: the concatenated y values to fit on
+        offsets: where each country starts, followed by the total length
+        test: a tuple of the concatenated days, y values, and offsets to score on,
+              by default the data fit on
+
+    Returns:
+        The centers and half widths the days were mapped with, a tuple of the
+        features, y values, and offsets fit on, the normal equations of the rows
+        fit on, and the normal equations of the rows scored on
+    """
+    centers, widths = get_domain(x_data, offsets)
+    features = get_linear_features(normalize(x_data, offsets, centers, widths), x_data)
+    equations = segmented_equations(features, y_data, offsets)
+    test_equations = equations
+    if test is not None:
+        test_x, test_y, test_offsets = test
+        test_u = normalize(test_x, test_offsets, centers, widths)
+        test_equations = segmented_equations(get_linear_features(test_u, test_x),
+                                             test_y, test_offsets)
+    return centers, widths, (features, y_data, offsets), equations, test_equations
+
+def fit_linear(linear, log_bool, leave_one_out=False):
+    """Fits a line of the days, and of log(x+2) if log_bool, for every country
+
+    Args:
+        linear: the tuple made by get_linear_equations, whose rows may be None
+                when leave_one_out is not asked for
+        log_bool: whether to use the log(x+2) column
+        leave_one_out: whether to also find the PRESS of each country on the rows fit on
+
+    Returns:
+        The intercepts, a row of coefficients of the days and log(x+2)
+        for each country, and the FitStatistics of every country
+    """
+    centers, widths, rows, equations, test_equations = linear
+    columns = 3 if log_bool else 2
+    grams, moments, _, _ = leading_block(equations, columns)
+    solution = solve_stacked(grams, moments)
+    press = None
+    if leave_one_out:
+        features, y_data, offsets = rows
+        press = segmented_press(features[:, :columns-1], y_data, offsets, solution, grams)
+    statistics = score_fit(test_equations, solution, press)
+    # a*(x-center)/width = (a/width)*x - a*center/width
+    slopes = solution[:, 1]/widths
+    intercepts = solution[:, 0]-slopes*centers
+    coefficients = np.column_stack([slopes, solution[:, 2:]])
+    return intercepts, coefficients, statistics
+
+def fit_logistic(x_data, y_data, offsets, test=None, leave_one_out=False):
+    """Fits the logistic models of every country
+
+    Matches LogisticRegressionModel when y_data is the transformed y values
+
+    Args:
+        The same as get_linear_equations, and leave_one_out, whether to
+        also score each country by its leave-one-out residuals
+
+    Returns:
+        A BatchFit with no choices
+
+    Raises:
+        ValueError: if both test and leave_one_out are given
+    """
+    check_scoring(test, leave_one_out)
+    linear = get_linear_equations(x_data, y_data, offsets, test)
+    intercepts, coefficients, statistics = fit_linear(linear, False, leave_one_out)
+    return BatchFit(intercepts, coefficients, statistics, None)
+
+def fit_logistic_logarithmic(x_data, y_data, offsets, test=None, leave_one_out=False):
+    """Fits the logistic logarithmic models of every country
+
+    Matches LogisticLogarithmicRegressionModel when y_data is the transformed y values
+    Like the model, the line is only chosen over the logarithmic curve
+    if its score is strictly better
+
+    Args:
+        The same as get_linear_equations, and leave_one_out, whether to also score
+        each curve by its leave-one-out residuals, and choose the curve by them
+
+    Returns:
+        A BatchFit whose choices are the bool of each country
+
+    Raises:
+        ValueError: if both test and leave_one_out are given
+    """
+    check_scoring(test, leave_one_out)
+    return choose_curve(get_linear_equations(x_data, y_data, offsets, test), leave_one_out)
+
+def choose_curve(linear, leave_one_out=False):
+    """Fits the line and the logarithmic curve of every country and chooses between them
+
+    Args:
+        linear: the tuple made by get_linear_equations
+        leave_one_out: whether to choose by the leave-one-out r-squared values
+
+    Returns:
+        A BatchFit whose choices are the bool of each country
+    """
+    log_fit = fit_linear(linear, True, leave_one_out)
+    line_fit = fit_linear(linear, False, leave_one_out)
+    use_line = get_scores(line_fit[2], leave_one_out) > get_scores(log_fit[2], leave_one_out)
+    intercepts = np.where(use_line, line_fit[0], log_fit[0])
+    coefficients = log_fit[1].copy()
+    coefficients[use_line] = 0
+    coefficients[use_line, :1] = line_fit[1][use_line]
+    residuals = np.where(use_line, line_fit[2].residual, log_fit[2].residual)
+    presses = None
+    if leave_one_out:
+        presses = np.where(use_line, line_fit[2].press, log_fit[2].press)
+    statistics = FitStatistics(residuals, log_fit[2].total, log_fit[2].count,
+                               np.where(use_line, 1, 2), presses)
+    return BatchFit(intercepts, coefficients, statistics, ~use_line)
@@ -0,0 +1,131 @@
+"""
+This module makes and solves the sufficient statistics of many countries at once
+The statistics of the countries that have none, or whose rows were revised, are
+made with the segmented sums of batch_regression. Every other country only adds
+its new rows. The statistics of every country are stacked and solved at once
+with the batch engine, the way fits on the rows are solved.
+
+The statistics are kept in a file next to prediction_data.csv with
+read_statistics and write_statistics of sufficient_statistics.
+"""
+import numpy as np
+from batch_regression import BatchFit
+from batch_regression import choose_curve
+from batch_regression import choose_polynomial
+from batch_regression import fit_linear
+from batch_regression import get_domain
+from batch_regression import normalize
+from batch_regression import segmented_gram
+from batch_regression import solve_degrees
+from batch_regression import stack_segments
+from logistic_regression import transform_y_fit
+from polynomial_regression import MAX_DEGREE
+from polynomial_regression import transform_x
+from series_store import exact_values
+from sufficient_statistics import CountryStatistics
+from sufficient_statistics import hash_rows
+
+def build_statistics(series):
+    """Makes the statistics of many series at once
+
+    The Gram matrices of every series are found with the segmented sums
+    of batch_regression
+
+    Args:
+        series: a list of VaccinationSeries
+
+    Returns:
+        A list with the CountryStatistics of each series
+    """
+    x_data, offsets = stack_segments([data.days for data in series])
+    y_data, _ = stack_segments([exact_values(data.values) for data in series])
+    logit_y = transform_y_fit(y_data)
+    centers, widths = get_domain(x_data, offsets)
+    u_data = normalize(x_data, offsets, centers, widths)
+    linear_grams, linear_moments = segmented_gram(
+        np.column_stack([u_data, np.log(x_data+2)]), logit_y, offsets)
+    basis = transform_x(u_data, MAX_DEGREE)
+    polynomial_grams, value_moments = segmented_gram(basis, y_data, offsets)
+    _, logit_moments = segmented_gram(basis, logit_y, offsets)
+    linear_squares = np.add.reduceat(logit_y**2, offsets[:-1])
+    value_squares = np.add.reduceat(y_data**2, offsets[:-1])
+    statistics = []
+    for i, data in enumerate(series):
+        current = CountryStatistics(centers[i], widths[i])
+        current.count = len(data.days)
+        current.digest = hash_rows(data, current.count)
+        current.linear_gram = linear_grams[i]
+        current.linear_moments = linear_moments[i]
+        current.linear_squares = float(linear_squares[i])
+        current.polynomial_gram = polynomial_grams[i]
+        current.polynomial_moments = np.column_stack([value_moments[i], logit_moments[i]])
+        current.polynomial_squares = np.array([value_squares[i], linear_squares[i]])
+        statistics.append(current)
+    return statistics
+
+def fit_statistics(statistics):
+    """Fits every model of many countries at once from their statistics
+
+    The statistics are stacked into the normal equations of every country,
+    and solved with the batch engine like fits on the rows
+
+    Args:
+        statistics: a list of CountryStatistics
+
+    Returns:
+        A BatchFit of each of the logistic, logistic logarithmic,
+        logistic polynomial and polynomial models, in that order
+    """
+    centers = np.array([current.center for current in statistics])
+    widths = np.array([current.width for current in statistics])
+    counts = np.array([current.count for current in statistics], dtype=np.int64)
+    linear_squares = np.array([current.linear_squares for current in statistics])
+    equations = (np.array([current.linear_gram for current in statistics]),
+                 np.array([current.linear_moments for current in statistics]),
+                 linear_squares, counts)
+    linear = (centers, widths, None, equations, equations)
+    logistic_fit = BatchFit(*fit_linear(linear, False), None)
+    grams = np.array([current.polynomial_gram for current in statistics])
+    moments = np.array([current.polynomial_moments for current in statistics])
+    squares = np.array([current.polynomial_squares for current in statistics])
+    polynomial_fits = []
+    for target in [1, 0]:
+        equations = (grams, moments[:, :, target], squares[:, target], counts)
+        polynomial_fits.append(choose_polynomial(solve_degrees(equations, equations, MAX_DEGREE),
+                                                 centers, widths))
+    return [logistic_fit, choose_curve(linear)]+polynomial_fits
+
+def update_statistics(statistics, store):
+    """Brings the statistics of every country in a store up to date
+
+    When the rows a country's statistics were made from are unchanged,
+    only its new rows are added with catch_up. Otherwise its statistics are
+    made again, for every such country at once
+    Countries that are not in the store are dropped
+
+    Args:
+        statistics: a dictionary from country to its CountryStatistics
+        store: a VaccinationSeriesStore
+
+    Returns:
+        A dictionary from each country of the store to its CountryStatistics,
+        and a list of the countries whose statistics changed
+    """
+    rebuilt = []
+    changed = []
+    for country in store:
+        current = statistics.get(country)
+        if current is None:
+            rebuilt.append(country)
+            continue
+        try:
+            if current.catch_up(store[country]):
+                changed.append(country)
+        except ValueError:
+            rebuilt.append(country)
+    made = dict()
+    if rebuilt:
+        made = dict(zip(rebuilt, build_statistics([store[country] for country in rebuilt])))
+    updated = {country:made[country] if country in made else statistics[country]
+               for country in store}
+    return updated, changed+rebuilt
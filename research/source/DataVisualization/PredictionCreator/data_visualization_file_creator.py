@@ -9,87 +9,71 @@ After, it combines these predictions with the original data
 Finally, it creates a csv file with the data
 """
 import warnings
-import datetime
 import pandas as pd
 import numpy as np
-from logistic_logarithmic_regression import LogisticLogarithmicRegressionModel
-from logistic_regression import LogisticRegressionModel
-from logistic_polynomial_regression import LogisticPolynomialRegressionModel
-from polynomial_regression import PolynomialRegressionModel
+from logistic_regression import transform_y_predict
+from shared_series import load_shared_store
+from batch_statistics import fit_statistics
+from batch_statistics import update_statistics
+from sufficient_statistics import get_statistics_path
+from sufficient_statistics import read_statistics
+from sufficient_statistics import write_statistics
+from artifact_manifest import find_stale
+from artifact_manifest import get_settings
+from artifact_manifest import hash_store
+from artifact_manifest import read_fresh_rows
+from artifact_manifest import read_manifest
+from artifact_manifest import write_artifact
 warnings.filterwarnings("ignore")
+PREDICTION_PATH = "../../../resource/DataVisualization/prediction_data.csv"
 
 def extract_data():
     """Extract data from vaccinations.csv
 
-    Creates a data frame from vaccinations.csv
-    Transforms the data into data that is useable by models
-    Then extracts data from each country
+    Maps the VaccinationSeriesStore of the countries with at least 100 entries
+    from the shared series file next to vaccinations.csv
+    If the csv changed, only what changed is ingested and the shared file is rewritten
 
     Returns:
-        A dictionary where the key is the country and
-        the value holds information for later, for now just the data
+        A VaccinationSeriesStore holding the data of each country,
+        the min_date, and a dataframe with the data of every kept country
     """
-    raw_data = pd.read_csv("../../../resource/DataVisualization/vaccinations.csv")
-    raw_data = raw_data[["location", "date", "people_fully_vaccinated_per_hundred"]]
-    raw_data.date = pd.to_datetime(raw_data.date, format="%Y-%m-%d")
-    min_date = raw_data.date.min()
-    raw_data.date = raw_data.date-min_date
-    raw_data.date = pd.Series([x.days for x in raw_data.date])
-    raw_data.drop(raw_data.loc[raw_data.people_fully_vaccinated_per_hundred.isnull()].index,
-                  axis=0, inplace=True)
-    raw_data["people_fully_vaccinated_per_hundred"] /= 100
-
-    data_dict = dict()
-    for country in raw_data.location.unique():
-        if len(raw_data.loc[raw_data.location == country]) >= 100:
-            tmp_data = raw_data.loc[raw_data.location == country]
-            tmp_data.drop("location", axis=1, inplace=True)
-            data_dict[country] = {"data":tmp_data}
-        else:
-            raw_data.drop(raw_data.loc[raw_data.location ==
-                                       country].index, inplace=True)
-    return data_dict, min_date, raw_data
-
-def make_predictions(data_dict):
+    store, min_date = load_shared_store("../../../resource/DataVisualization/vaccinations.csv", 100)
+    return store, min_date, store.to_dataframe()
+
+def make_predictions(countries, statistics):
     """Make predictions for all models
 
+    Solves the models of every country at once from their sufficient statistics,
+    so no model is fit on the rows again
     Creates a new dataframe that holds the prediction
     for dates from 0 to 499 days from the first entry
 
     Args:
-        data_dict:
-            Dictionary that holds the data for countries
-            the keys are country and the value is the
-            vaccination data
+        countries:
+            List of the countries to make predictions for
+        statistics:
+            Dictionary from each country to its CountryStatistics
 
     Returns:
         new_data:
             A dataframe that holds the date, country, and predictions
     """
-    new_data = pd.DataFrame(columns=["location", "date",
-                                     "logistic_prediction",
-                                     "logistic_logarithmic_prediction",
-                                     "logistic_polynomial_prediction"])
-    for country in data_dict.keys():
-        data = data_dict[country]["data"]
-        x_data = np.array(list(range(500)))
-        model1 = LogisticRegressionModel(data_dict[country]["data"])
-        y_pred1 = model1.predict(x_data.reshape(-1, 1))
-        model2 = LogisticLogarithmicRegressionModel(data)
-        y_pred2 = model2.predict(x_data.reshape(-1, 1))
-        model3 = LogisticPolynomialRegressionModel(data)
-        y_pred3 = model3.predict(x_data.reshape(-1, 1))
-        model4 = PolynomialRegressionModel(data)
-        y_pred4 = model4.predict(x_data.reshape(-1, 1))
-        data = np.swapaxes(np.array([x_data, y_pred1, y_pred2,
-                                     y_pred3, y_pred4]), 0, 1)
-        tmp_data = pd.DataFrame(data, columns=["date",
-                                               "logistic_prediction",
-                                               "logistic_logarithmic_prediction",
-                                               "logistic_polynomial_prediction",
-                                               "polynomial_prediction"])
-        tmp_data["location"] = country
-        new_data = new_data.append(tmp_data)
+    columns = ["location", "date", "logistic_prediction",
+               "logistic_logarithmic_prediction",
+               "logistic_polynomial_prediction",
+               "polynomial_prediction"]
+    if not countries:
+        return pd.DataFrame(columns=columns)
+    x_data = np.arange(500)
+    fits = fit_statistics([statistics[country] for country in countries])
+    predictions = [fit.predict(x_data) for fit in fits]
+    for prediction in predictions[:3]:
+        transform_y_predict(prediction, out=prediction)
+    new_data = pd.DataFrame({"location":np.repeat(np.array(countries, dtype=object), len(x_data)),
+                             "date":np.tile(x_data, len(countries))})
+    for column, prediction in zip(columns[2:], predictions):
+        new_data[column] = prediction.reshape(-1)
     return new_data
 
 def combine(new_data, raw_data):
@@ -122,14 +106,25 @@ def reformat_date(all_data, min_date):
             A dataframe holding the original raw data and
             the data from predictive models
     """
-    all_data["date"] = [datetime.timedelta(x) for x in all_data["date"]]
-    all_data["date"] = all_data["date"] + min_date
+    all_data["date"] = pd.to_timedelta(all_data["date"].astype(float), unit="D") + min_date
 
 def __main__():
-    data_dict, min_date, raw_data = extract_data()
-    new_data = make_predictions(data_dict)
-    all_data = combine(new_data, raw_data)
+    store, min_date, raw_data = extract_data()
+    # Only predict for the countries whose series changed since prediction_data.csv was written
+    hashes = hash_store(store)
+    settings = get_settings(min_rows=100, min_date=str(min_date.date()))
+    stale = find_stale(read_manifest(PREDICTION_PATH, settings), hashes)
+    countries = [country for country in store if country in stale]
+    # Add the new days of each country to its statistics instead of fitting it again
+    statistics_path = get_statistics_path(PREDICTION_PATH)
+    statistics, _ = update_statistics(read_statistics(statistics_path, settings), store)
+    write_statistics(statistics_path, statistics, settings)
+    new_data = make_predictions(countries, statistics)
+    all_data = combine(new_data, raw_data.loc[raw_data["location"].isin(stale)])
     reformat_date(all_data, min_date)
-    all_data.to_csv("../../../resource/DataVisualization/prediction_data.csv", index=False)
+    all_data = pd.concat([read_fresh_rows(PREDICTION_PATH, hashes, stale, parse_dates=["date"]),
+                          all_data])
+    all_data = all_data.sort_values(["location", "date"], kind="stable")
+    write_artifact(PREDICTION_PATH, all_data, hashes, settings)
 
 __main__()
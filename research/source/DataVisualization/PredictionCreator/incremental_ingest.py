@@ -0,0 +1,186 @@
+"""
+This module ingests a refreshed vaccinations.csv into the binary cache
+It compares the new csv with the state that was last ingested by hashing every
+(location, date) row. When the only changes are dates newer than the last date
+ingested for a location, those rows are inserted at the end of the rows of their
+country in the cached arrays. When historical rows were revised or deleted,
+the index is rebuilt from the rows that were already read.
+It reports which countries changed, so later stages only need to redo those.
+
+Run it after replacing vaccinations.csv:
+    python3 incremental_ingest.py ../resource/vaccinations.csv
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+from country_index import CountryIndex
+from dataset_diff import diff_hashes
+from dataset_diff import hash_rows
+from vaccination_cache import get_cache_path
+from vaccination_cache import hash_file
+from vaccination_cache import parse_vaccinations
+from vaccination_cache import read_cache
+from vaccination_cache import extract_index
+from vaccination_cache import write_cache
+
+def read_projection(file_path, min_date):
+    """Reads the columns the cache holds from a refreshed csv
+
+    Args:
+        file_path: the path to the refreshed vaccinations.csv file
+        min_date: the first date of the data that was last ingested
+
+    Returns:
+        A dataframe with the location, date and people_fully_vaccinated_per_hundred
+        of every row with a value, where date holds the days since min_date
+        Or None if the csv starts before min_date, so every day offset would change
+    """
+    raw_data = pd.read_csv(file_path, usecols=["location", "date",
+                                               "people_fully_vaccinated_per_hundred"])
+    dates = pd.to_datetime(raw_data["date"], format="%Y-%m-%d")
+    if dates.min() < pd.Timestamp(min_date):
+        return None
+    raw_data["date"] = (dates-pd.Timestamp(min_date)).dt.days.to_numpy(dtype=np.int32)
+    raw_data = raw_data.loc[raw_data["people_fully_vaccinated_per_hundred"].notnull()]
+    return raw_data.assign(people_fully_vaccinated_per_hundred=
+                           raw_data["people_fully_vaccinated_per_hundred"]/100)
+
+def find_changes(index, new_data):
+    """Finds the rows that were inserted, updated, or deleted since the last ingest
+
+    Args:
+        index: the CountryIndex that was last ingested
+        new_data: the dataframe made by read_projection
+
+    Returns:
+        The dataframe made by diff_hashes, with the location, date and change of
+        every row that changed
+    """
+    columns = ["people_fully_vaccinated_per_hundred"]
+    return diff_hashes(hash_rows(index.to_dataframe(), columns),
+                       hash_rows(new_data, columns))
+
+def find_new_rows(index, new_data, changes):
+    """Finds the new rows when the only changes are new dates
+
+    A row is new when its location has not been ingested yet, or when its date
+    is after the last date ingested for its location
+
+    Args:
+        index: the CountryIndex that was last ingested
+        new_data: the dataframe made by read_projection
+        changes: the dataframe made by find_changes
+
+    Returns:
+        A dataframe holding the rows of new_data that are new
+        Or None if some rows were revised, deleted, or inserted before the
+        last date of their location
+    """
+    if (changes["change"] != "inserted").any():
+        return None
+    last_days = dict()
+    if len(index):
+        last_days = dict(zip(index.locations,
+                             np.maximum.reduceat(index.days, index.starts).tolist()))
+    last_day = new_data["location"].map(last_days)
+    new_rows = new_data.loc[last_day.isnull() | (new_data["date"] > last_day)]
+    if len(new_rows) != len(changes):
+        return None
+    return new_rows
+
+def append_rows(index, new_rows):
+    """Inserts new rows at the end of the rows of their country
+
+    Rows of countries already in the index are inserted after the last row
+    of that country, rows of new countries are added as new partitions at the end
+
+    Args:
+        index: a CountryIndex where the countries are back to back
+        new_rows: the dataframe made by find_new_rows
+
+    Returns:
+        A CountryIndex holding the old and new rows, and a list of the
+        countries that changed
+    """
+    new_index = CountryIndex.from_dataframe(new_rows)
+    changed = new_index.locations
+    positions = np.array([index.positions.get(country, -1) for country in changed],
+                         dtype=np.int64)
+    existing = positions >= 0
+    # Every new row of an existing country goes before the end of that country
+    insert_at = np.repeat(index.ends[positions[existing]], new_index.counts[existing])
+    rows = np.concatenate([np.arange(start, end) for start, end in
+                           zip(new_index.starts[existing], new_index.ends[existing])]
+                          + [np.zeros(0, dtype=np.int64)])
+    added = np.zeros(len(index), dtype=np.int64)
+    added[positions[existing]] = new_index.counts[existing]
+    days = np.insert(index.days, insert_at, new_index.days[rows])
+    values = np.insert(index.values, insert_at, new_index.values[rows])
+    # Countries that were not ingested before go at the end
+    rows = np.concatenate([np.arange(start, end) for start, end in
+                           zip(new_index.starts[~existing], new_index.ends[~existing])]
+                          + [np.zeros(0, dtype=np.int64)])
+    days = np.concatenate((days, new_index.days[rows].astype(days.dtype)))
+    values = np.concatenate((values, new_index.values[rows].astype(values.dtype)))
+    counts = np.concatenate((index.counts+added, new_index.counts[~existing]))
+    locations = index.locations+[country for country, old in zip(changed, existing)
+                                 if not old]
+    return CountryIndex.from_offsets(locations, np.concatenate(([0], np.cumsum(counts))),
+                                     days, values), changed
+
+def ingest_vaccinations(file_path):
+    """Brings the cache of a csv up to date, ingesting only what changed
+
+    If the cache is still valid, nothing is ingested
+    If there is no cache, or the new csv starts before the cached data,
+    the whole csv is parsed and every country is reported as changed
+
+    Args:
+        file_path: the path to the vaccinations.csv file
+
+    Returns:
+        A CountryIndex holding the data of every country, the min_date,
+        and a list of the countries that changed
+    """
+    stat = os.stat(file_path)
+    cache_path = get_cache_path(file_path)
+    cache = read_cache(cache_path)
+    if cache is None:
+        index, min_date = parse_vaccinations(file_path)
+        write_cache(cache_path, index, min_date,
+                    (stat.st_size, stat.st_mtime_ns, hash_file(file_path)))
+        return index, min_date, index.locations
+    index, min_date = extract_index(cache)
+    if int(cache["size"]) == stat.st_size and int(cache["mtime"]) == stat.st_mtime_ns:
+        return index, min_date, []
+    digest = hash_file(file_path)
+    if str(cache["digest"]) == digest:
+        write_cache(cache_path, index, min_date, (stat.st_size, stat.st_mtime_ns, digest))
+        return index, min_date, []
+    new_data = read_projection(file_path, min_date)
+    if new_data is None:
+        index, min_date = parse_vaccinations(file_path)
+        changed = index.locations
+    else:
+        changes = find_changes(index, new_data)
+        changed = changes["location"].unique().tolist()
+        new_rows = find_new_rows(index, new_data, changes)
+        if new_rows is not None:
+            index, _ = append_rows(index, new_rows)
+        else:
+            index = CountryIndex.from_dataframe(new_data)
+    write_cache(cache_path, index, min_date, (stat.st_size, stat.st_mtime_ns, digest))
+    return index, min_date, changed
+
+def __main__():
+    if len(sys.argv) != 2:
+        print("Usage: python3 incremental_ingest.py path/to/vaccinations.csv")
+        sys.exit(1)
+    _, _, changed = ingest_vaccinations(sys.argv[1])
+    print(str(len(changed))+" countries changed")
+    for country in changed:
+        print(country)
+
+if __name__ == "__main__":
+    __main__()
@@ -0,0 +1,188 @@
+"""
+This module scores least squares fits from their normal equations
+The normal equations of a fit are X^T X, X^T y, y^T y and n, where X has a
+leading column of ones for the intercept. For any coefficients b, the residual
+sum of squares is y^T y - 2 b^T X^T y + b^T X^T X b, and the total sum of
+squares is y^T y - n*mean^2, so a fit is scored without predicting its rows.
+The normal equations of a fit on more features hold those of every fit on its
+leading features, so the fits a model chooses between are scored from one pass.
+
+Every function works on the normal equations of one fit, or on stacked
+normal equations with one fit per row.
+
+The leave-one-out residual of a row is its residual divided by 1-h, where h is
+the row's diagonal entry of the hat matrix X (X^T X)^-1 X^T. So the leave-one-out
+sum of squares (PRESS) of a fit comes from the fit itself, without refitting
+the fit once for each row.
+"""
+import numpy as np
+from kernel_backend import gram
+# Sums of squares this small next to y^T y are rounding left from the subtraction
+ROUNDING = 1e-12
+
+def get_normal_equations(features, y_data):
+    """Finds the normal equations of a fit with an intercept with the gram kernel
+
+    Args:
+        features: the features, with a row for each value
+        y_data: the y values
+
+    Returns:
+        A tuple of X^T X, X^T y, y^T y and n, where X is the features
+        with a leading column of ones
+    """
+    y_data = np.asarray(y_data, dtype=np.float64)
+    features = np.asarray(features, dtype=np.float64).reshape(len(y_data), -1)
+    gram_matrix, moments = gram(features, y_data)
+    return gram_matrix, moments, float(y_data @ y_data), len(y_data)
+
+def leading_block(equations, columns):
+    """Returns the normal equations of the fit on the leading columns
+
+    Args:
+        equations: a tuple made by get_normal_equations
+        columns: the number of leading columns, counting the intercept
+
+    Returns:
+        A tuple like the one made by get_normal_equations
+    """
+    gram, moments, squares, count = equations
+    return gram[..., :columns, :columns], moments[..., :columns], squares, count
+
+def get_residual(equations, solution):
+    """Finds the residual sum of squares of coefficients
+
+    Args:
+        equations: a tuple made by get_normal_equations, or stacked ones
+        solution: the intercept and then the coefficient of each feature,
+                  with one row for each fit when stacked
+
+    Returns:
+        The residual sum of squares, or an array with it for each fit
+    """
+    gram, moments, squares, _ = equations
+    solution = np.asarray(solution, dtype=np.float64)
+    fitted = np.einsum("...i,...i->...", solution, moments)
+    spread = np.einsum("...i,...ij,...j->...", solution, gram, solution)
+    residual = squares-2*fitted+spread
+    return np.where(residual <= ROUNDING*np.asarray(squares), 0.0, residual)
+
+def get_total(equations):
+    """Finds the total sum of squares around the mean
+
+    Args:
+        equations: a tuple made by get_normal_equations, or stacked ones
+
+    Returns:
+        The total sum of squares, or an array with it for each fit
+    """
+    _, moments, squares, count = equations
+    total = squares-moments[..., 0]**2/count
+    return np.where(total <= ROUNDING*np.asarray(squares), 0.0, total)
+
+def get_loo_residuals(residuals, leverage):
+    """Finds the residual of each row when the fit is made without it
+
+    Args:
+        residuals: the residuals of the fit on every row
+        leverage: the diagonal of the hat matrix of the fit, one value per row
+
+    Returns:
+        The leave-one-out residuals, which are inf for a row with leverage 1
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return residuals/(1-leverage)
+
+def get_r_squared(residual, total):
+    """Finds an r-squared value like sklearn's r2_score
+
+    Args:
+        residual: the residual sum of squares, or an array of them
+        total: the total sum of squares around the mean, or an array of them
+
+    Returns:
+        1-residual/total, or if total is 0, 1 for an exact fit and 0 otherwise
+    """
+    residual = np.asarray(residual, dtype=np.float64)
+    total = np.asarray(total, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(total == 0, np.where(residual == 0, 1.0, 0.0), 1-residual/total)
+    return scores if scores.ndim else float(scores)
+
+class FitStatistics:
+    """This Class holds how well a least squares fit does on the rows it is scored on
+
+    Each attribute is a number for one fit, or an array with one for each fit
+
+    Attributes:
+        residual: holds the residual sum of squares
+        total: holds the total sum of squares around the mean
+        count: holds the number of rows scored
+        parameters: holds the number of features, not counting the intercept
+        r_squared: holds the r-squared value
+        adjusted_r_squared: holds the r-squared value adjusted for the number of
+                            features, which is nan when there are too few rows
+        press: holds the leave-one-out residual sum of squares, or None if it was not found
+        loo_r_squared: holds the r-squared value of the leave-one-out residuals,
+                       or None if press was not found
+    """
+
+    def __init__(self, residual, total, count, parameters, press=None):
+        """Initialize the sums of squares and find the r-squared values
+
+        Args:
+            residual: the residual sum of squares
+            total: the total sum of squares around the mean
+            count: the number of rows scored
+            parameters: the number of features, not counting the intercept
+            press: the leave-one-out residual sum of squares, if it was found
+        """
+        self.residual = residual if np.ndim(residual) else float(residual)
+        self.total = total if np.ndim(total) else float(total)
+        self.count = count
+        self.parameters = parameters
+        self.r_squared = get_r_squared(residual, total)
+        freedom = np.asarray(count-parameters-1, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            adjusted = np.where(freedom > 0, 1-(1-self.r_squared)*(count-1)/freedom, np.nan)
+        self.adjusted_r_squared = adjusted if adjusted.ndim else float(adjusted)
+        self.press = press
+        self.loo_r_squared = None
+        if press is not None:
+            self.press = press if np.ndim(press) else float(press)
+            self.loo_r_squared = get_r_squared(press, total)
+
+def score_fit(equations, solution, press=None):
+    """Scores coefficients on the rows of normal equations
+
+    The coefficients may come from any fit, such as one on a training split
+    scored on the normal equations of its test split
+
+    Args:
+        equations: a tuple made by get_normal_equations, or stacked ones
+        solution: the intercept and then the coefficient of each feature,
+                  with one row for each fit when stacked
+        press: the leave-one-out residual sum of squares of the fit, if it was found
+
+    Returns:
+        A FitStatistics of the coefficients
+    """
+    solution = np.asarray(solution, dtype=np.float64)
+    columns = solution.shape[-1]
+    equations = leading_block(equations, columns)
+    return FitStatistics(get_residual(equations, solution), get_total(equations),
+                         equations[3], columns-1, press)
+
+def solve_fit(equations):
+    """Solves a least squares fit from its normal equations and scores it
+
+    Args:
+        equations: a tuple made by get_normal_equations, or stacked ones
+
+    Returns:
+        The intercept and then the coefficient of each feature, with one row
+        for each fit when stacked, and a FitStatistics of the fit
+    """
+    gram, moments, _, _ = equations
+    solution = np.linalg.solve(gram, moments[..., None])[..., 0]
+    return solution, score_fit(equations, solution)
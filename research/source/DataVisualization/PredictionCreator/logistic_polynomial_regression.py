@@ -2,13 +2,20 @@
 This module impliments a class called LogisticLogarithmicRegressionModel
 It transforms the y values in order to fit to a logistic curve
 It searches for what degreee of polynomia is best
-The module uses sklearn's LinearRegression
-in order to fit to a line.
+The module fits every degree of polynomial
+with one QR factorization, in the Chebyshev basis of the mapped days.
+A model can instead be ridge regularized, like PolynomialRegressionModel.
 """
-from sklearn.linear_model import LinearRegression
-from logistic_regression import transform_y_fit
+import numpy as np
+from logistic_regression import get_logit_target
 from logistic_regression import transform_y_predict
-from polynomial_regression import transform_x
+from polynomial_regression import MAX_DEGREE
+from polynomial_regression import choose_degree
+from polynomial_regression import choose_strength
+from polynomial_regression import ridge_path
+from polynomial_regression import sweep_degrees
+from polynomial_regression import sweep_equations
+from series_store import exact_values
 
 class LogisticPolynomialRegressionModel:
     """This Class is a wrapper in order to fit and predict a model
@@ -19,70 +26,84 @@ class LogisticPolynomialRegressionModel:
     Then, this class can make predictions based on x values
 
     Attributes:
-        x_data: holds the x component of the data
-        y_data: holds the y component of the data
+        x_data: holds the x component of the data, or None for a model made from statistics
+        y_data: holds the y component of the data, or None for a model made from statistics
+        logit_y: holds the transformed y values, shared with other models of the series
         model: holds the trained model
         score: holds the r-squared value from the model
+        statistics: holds the FitStatistics of the model, with its residual sum of squares
+                    and adjusted r-squared value
         bool: holds a bool for whether or not to use a logarithmic transformation
+        ridge: holds whether the model is ridge regularized
+        strength: holds the ridge strength of the model, or None if it is not regularized
     """
 
-    def __init__(self, dataframe):
+    def __init__(self, series, ridge=False):
         """Initialize data with X and y portions and call find_regress
 
-        Extracts the x and y values from an inputed dataframe
+        Extracts the x and y values from a VaccinationSeries
         This function sets the x_data and y_data attributes
 
         Args:
-            dataframe: a dataframe with a date and people_fully_vaccinated_per_hundred column
+            series: a VaccinationSeries with the days and
+                    people_fully_vaccinated_per_hundred values of a country
+            ridge: whether to fit a ridge regularized polynomial of MAX_DEGREE
+                   instead of choosing a degree
         """
-        self.x_data = dataframe["date"].to_numpy().reshape(-1, 1)
-        self.y_data = dataframe["people_fully_vaccinated_per_hundred"]
+        self.x_data = series.days.astype(np.float64).reshape(-1, 1)
+        self.y_data = exact_values(series.values)
+        self.logit_y = get_logit_target(series)
+        self.ridge = ridge
         self.find_regress()
 
+    @classmethod
+    def from_statistics(cls, statistics):
+        """Creates a model from the sufficient statistics of a series, without its rows
 
-    def find_regress(self):
-        """Checks whether a logarithmic curve or linear curve is better
-
-        Creates a model for a linear and logarithmic curve and compares
-        the r-squared values to decide which model to use
-        This function sets the model, score, and bool attributes
-        """
-        self.model, self.score = self.fit(1)
-        self.degree = 1
-        # Loop through all possible boolean values
-        for degree in range(2, 8):
-            # Run the fit function
-            tmpmodel, tmpscore = self.fit(degree)
-            # Check if this new model has a better score
-            if tmpscore > self.score:
-                # If the new model has a better score, update the model, score, and regress_bool
-                self.model = tmpmodel
-                self.score = tmpscore
-                self.degree = degree
-
-    def fit(self, degree):
-        """Transforms the x and y values, then fits the model, returning the model and score
-
-        Calls transform_x and transform_y_fit in order to transform x and y values
-        The function then fits a model using the sklearn LinearRegression
+        Fits every degree from the polynomial statistics of the transformed
+        y values with sweep_equations, and chooses the degree like find_regress
+        A ridge regularized model needs its rows, so it can not be made this way
 
         Args:
-            bool: a boolean value that says whether to use a
-                  logarithmic curve, is passed to transform_x
+            statistics: the CountryStatistics of the series
 
         Returns:
-            A fit model and the r-squared value from the curve
+            A LogisticPolynomialRegressionModel that uses the best degree
+        """
+        model = cls.__new__(cls)
+        model.x_data = model.y_data = model.logit_y = None
+        model.ridge = False
+        model.strength = None
+        fits = sweep_equations(statistics.get_polynomial_equations(1),
+                               statistics.center, statistics.width)
+        model.model, model.statistics, model.degree = choose_degree(fits)
+        model.score = model.statistics.r_squared
+        return model
+
+    def find_regress(self):
+        """Checks which degree of polynomial fits best
+
+        Fits every degree up to MAX_DEGREE with sweep_degrees, which factors
+        the design of the highest degree once, and compares the r-squared
+        values with choose_degree to decide which degree to use
+        If the model is ridge regularized, it fits MAX_DEGREE for every strength
+        with ridge_path instead, and chooses the strength with choose_strength
+        This function sets the model, statistics, score, degree, and strength attributes
         """
-        x_data = transform_x(self.x_data, degree)
-        y_data = transform_y_fit(self.y_data.copy())
-        model = LinearRegression().fit(x_data, y_data)
-        score = model.score(x_data, y_data)
-        return model, score
+        self.strength = None
+        if self.ridge:
+            path = ridge_path(self.x_data, self.logit_y)
+            self.model, self.statistics, self.strength = choose_strength(path)
+            self.degree = MAX_DEGREE
+        else:
+            fits = sweep_degrees(self.x_data, self.logit_y)
+            self.model, self.statistics, self.degree = choose_degree(fits)
+        self.score = self.statistics.r_squared
 
     def predict(self, x_data):
         """Creates a prediction based on x values
 
-        Transforms the X value to make a prediction
+        The model maps the dates into its Chebyshev basis to make a prediction
         Then transforms the y value into the non-logistic version
 
         Args:
@@ -91,5 +112,5 @@ class LogisticPolynomialRegressionModel:
         Returns:
             A list of people_fully_vaccinated_per_hundred values that the model predicts
         """
-        x_data = transform_x(x_data.copy(), self.degree)
-        return transform_y_predict(self.model.predict(x_data))
+        prediction = self.model.predict(x_data)
+        return transform_y_predict(prediction, out=prediction)
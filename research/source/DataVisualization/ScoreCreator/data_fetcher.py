@@ -0,0 +1,207 @@
+"""
+This module downloads one data file over HTTP, only when it has changed
+It replaces cloning the whole covid-19-data repository to copy a single csv.
+The ETag and Last-Modified of the last download are kept next to the file and
+sent back as If-None-Match and If-Modified-Since, so an unchanged file is not
+downloaded again. An interrupted download is kept as a .part file and resumed
+with a Range request. The finished file is checked against its sha256 and then
+moved into place, so readers never see a partial file.
+
+In the distribution, world_vaccination_predictor runs it when started with --fetch,
+so it is part of the PyInstaller binary. It can also be run on its own with where
+to write the file, and optionally the url and sha256 to expect:
+    python3 data_fetcher.py ../resource/vaccinations.csv
+The url can also be set with the VACCINATION_DATA_URL environment variable,
+for example to fetch from a local server instead of the upstream host.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import urllib.error
+import urllib.request
+DEFAULT_URL = "https://raw.githubusercontent.com/owid/covid-19-data/master/public/data/vaccinations/vaccinations.csv"
+URL_VARIABLE = "VACCINATION_DATA_URL"
+PART_SUFFIX = ".part"
+METADATA_SUFFIX = ".fetch.json"
+CHUNK_SIZE = 1 << 16
+TIMEOUT = 60
+# The permissions of a written file, which mkstemp would otherwise make private
+FILE_MODE = 0o644
+
+def hash_file(file_path):
+    """Hashes the bytes of a file
+
+    Args:
+        file_path: the path to the file
+
+    Returns:
+        The sha256 hex digest of the file
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_metadata(metadata_path, url):
+    """Reads what is known about the last download of a url
+
+    Args:
+        metadata_path: the path to the metadata file
+        url: the url being downloaded
+
+    Returns:
+        A dictionary with the metadata, or an empty dictionary if the file is
+        missing, can not be read, or was written for another url
+    """
+    try:
+        with open(metadata_path) as file:
+            metadata = json.load(file)
+    except (OSError, ValueError):
+        return dict()
+    if not isinstance(metadata, dict) or metadata.get("url") != url:
+        return dict()
+    return metadata
+
+def write_metadata(metadata_path, metadata):
+    """Writes the metadata of a download atomically
+
+    The metadata is written to a temporary file of its own first and then moved
+    into place, so downloads that run at the same time never share a temporary file
+
+    Args:
+        metadata_path: the path to the metadata file
+        metadata: a dictionary with the metadata
+    """
+    tmp_path = None
+    try:
+        descriptor, tmp_path = tempfile.mkstemp(dir=os.path.dirname(metadata_path) or ".",
+                                                prefix=os.path.basename(metadata_path)+".",
+                                                suffix=".tmp")
+        os.chmod(tmp_path, FILE_MODE)
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(metadata, file)
+        os.replace(tmp_path, metadata_path)
+    except OSError:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def get_validator(response):
+    """Finds the value that identifies the version of a response for If-Range
+
+    Args:
+        response: the http response
+
+    Returns:
+        The ETag of the response if it is a strong ETag, otherwise its
+        Last-Modified, or None if it has neither
+    """
+    etag = response.headers.get("ETag")
+    if etag is not None and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+def build_request(url, file_path, metadata, part_size, checksum=None):
+    """Creates the request for a download
+
+    A partial download is resumed from where it stopped, if it is still the same
+    version of the file. Otherwise the request is conditional on the file having
+    changed, as long as the file on disk is the one that was last downloaded
+    and matches checksum
+
+    Args:
+        url: the url to download
+        file_path: the path the file is written to
+        metadata: the dictionary made by read_metadata
+        part_size: the number of bytes already in the partial download
+        checksum: the sha256 hex digest the file must have, or None to accept any
+
+    Returns:
+        A urllib Request with the headers for the download
+    """
+    headers = dict()
+    if part_size and metadata.get("partial"):
+        headers["Range"] = "bytes="+str(part_size)+"-"
+        headers["If-Range"] = metadata["partial"]
+    elif os.path.exists(file_path) and metadata.get("sha256") == hash_file(file_path) and \
+         (checksum is None or checksum.lower() == metadata["sha256"]):
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+    return urllib.request.Request(url, headers=headers)
+
+def fetch_file(url, file_path, checksum=None):
+    """Downloads a url to a file if it has changed since the last download
+
+    Args:
+        url: the url to download
+        file_path: the path to write the file to
+        checksum: the sha256 hex digest the file must have, or None to accept any
+
+    Returns:
+        True if a new version of the file was written, False if it had not changed
+
+    Raises:
+        ValueError: if the download is incomplete or does not match checksum
+        urllib.error.URLError: if the server can not be reached or returns an error
+    """
+    metadata_path = file_path+METADATA_SUFFIX
+    part_path = file_path+PART_SUFFIX
+    metadata = read_metadata(metadata_path, url)
+    part_size = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    try:
+        request = build_request(url, file_path, metadata, part_size, checksum)
+        response = urllib.request.urlopen(request, timeout=TIMEOUT)
+    except urllib.error.HTTPError as error:
+        if error.code == 304:
+            return False
+        if error.code != 416:
+            raise
+        # The partial download is no longer a prefix of the file, so start over
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(part_path)
+        part_size = 0
+        metadata.pop("partial", None)
+        request = build_request(url, file_path, metadata, 0, checksum)
+        response = urllib.request.urlopen(request, timeout=TIMEOUT)
+    with response:
+        if response.status != 206:
+            part_size = 0
+        metadata["url"] = url
+        metadata["partial"] = get_validator(response)
+        write_metadata(metadata_path, metadata)
+        length = response.headers.get("Content-Length")
+        with open(part_path, "ab" if part_size else "wb") as file:
+            for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                file.write(chunk)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+    if length is not None and os.path.getsize(part_path) != part_size+int(length):
+        raise ValueError("The download of "+url+" is incomplete")
+    digest = hash_file(part_path)
+    if checksum is not None and digest != checksum.lower():
+        os.remove(part_path)
+        raise ValueError("The download of "+url+" does not match its checksum")
+    os.replace(part_path, file_path)
+    write_metadata(metadata_path, {"url":url, "etag":etag, "last_modified":last_modified,
+                                   "sha256":digest})
+    return True
+
+def __main__():
+    if not 2 <= len(sys.argv) <= 4:
+        print("Usage: python3 data_fetcher.py path/to/file [url] [sha256]")
+        sys.exit(1)
+    url = sys.argv[2] if len(sys.argv) > 2 else os.environ.get(URL_VARIABLE, DEFAULT_URL)
+    checksum = sys.argv[3] if len(sys.argv) > 3 else None
+    if fetch_file(url, sys.argv[1], checksum):
+        print(sys.argv[1]+" updated")
+    else:
+        print(sys.argv[1]+" not modified")
+
+if __name__ == "__main__":
+    __main__()
@@ -2,134 +2,212 @@
 This modules extracts and cleans the original vaccination data in order
 to have only the date, country, and people_fully_vaccinated_per_hundred columns
 
-Then, it fits a curve and saves the r-squared values
+Then, it fits a curve and saves the r-squared values, on random and end splits
+and from the leave-one-out residuals of a fit on every value
 
 After, it combines these predictions with the original data
 
 Finally, it creates a csv file with the data
 """
+import math
 import warnings
+import numpy as np
 import pandas as pd
-from logistic_logarithmic_regression import LogisticLogarithmicRegressionModel
-from logistic_regression import LogisticRegressionModel
-from logistic_polynomial_regression import LogisticPolynomialRegressionModel
-from polynomial_regression import PolynomialRegressionModel
+from logistic_regression import get_logit_target
+from batch_regression import fit_logistic
+from batch_regression import fit_logistic_logarithmic
+from batch_regression import fit_polynomial
+from batch_regression import stack_segments
+from shared_series import load_shared_store
+from series_store import exact_values
+from artifact_manifest import find_stale
+from artifact_manifest import get_settings
+from artifact_manifest import hash_store
+from artifact_manifest import read_fresh_rows
+from artifact_manifest import read_manifest
+from artifact_manifest import write_artifact
 warnings.filterwarnings("ignore")
+RSQUARED_PATH = "../../../resource/DataVisualization/rsquared_data.csv"
+MODEL_TYPES = ["logistic_score", "polynomial_score",
+               "logistic_logarithmic_score",
+               "logistic_polynomial_score"]
+# The batch fit of each model type, and whether it fits the transformed y values
+MODEL_FITS = [(fit_logistic, True), (fit_polynomial, False),
+              (fit_logistic_logarithmic, True), (fit_polynomial, True)]
 
 def extract_data():
     """Extract data from vaccinations.csv
 
-    Creates a data frame from vaccinations.csv
-    Transforms the data into data that is useable by models
-    Then extracts data from each country
+    Maps the VaccinationSeriesStore of the countries with at least 100 entries
+    from the shared series file next to vaccinations.csv
+    If the csv changed, only what changed is ingested and the shared file is rewritten
 
     Returns:
-        A dictionary where the key is the country and
-        the value holds information for later, for now just the data
+        A VaccinationSeriesStore holding the data of each country
     """
-    raw_data = pd.read_csv("../../../resource/DataVisualization/vaccinations.csv")
-    raw_data = raw_data[["location", "date", "people_fully_vaccinated_per_hundred"]]
-    raw_data.date = pd.to_datetime(raw_data.date, format="%Y-%m-%d")
-    min_date = raw_data.date.min()
-    raw_data.date = raw_data.date-min_date
-    raw_data.date = pd.Series([x.days for x in raw_data.date])
-    raw_data.drop(raw_data.loc[raw_data.people_fully_vaccinated_per_hundred.isnull()].index,
-                  axis=0, inplace=True)
-    raw_data["people_fully_vaccinated_per_hundred"] /= 100
-
-    data_dict = dict()
-    for country in raw_data.location.unique():
-        if len(raw_data.loc[raw_data.location == country]) >= 100:
-            tmp_data = raw_data.loc[raw_data.location == country]
-            tmp_data.drop("location", axis=1, inplace=True)
-            data_dict[country] = {"data":tmp_data}
-        else:
-            raw_data.drop(raw_data.loc[raw_data.location ==
-                                       country].index, inplace=True)
-    return data_dict
-
-def get_score_dataframe(country, model, model_type):
-    """Formats a dataframe with the columns we want
-
-    Creates a dataframe with columns for location,
-    model_type, and r-squared value. Each with one
-    corresponding value with it
+    store, _ = load_shared_store("../../../resource/DataVisualization/vaccinations.csv", 100)
+    return store
+
+def get_split(length, end_split):
+    """Splits the positions of a series into train and test positions
+
+    Like train_test_split with test_size=.2, a random split draws a new
+    permutation, and an end split tests on the last 20 percent
 
     Args:
-        country:
-            The country that this r-squared value corresponds to
-        model:
-            The model trained for a certain split and country data
-        model_type:
-            A string that holds the type of model
+        length:
+            The number of values in the series
+        end_split:
+            Boolean that decides whether the split will be random or end
 
     Returns:
-        A DataFrame with a location, model_type, and r_squared.
+        An array with the train positions and an array with the test positions
     """
-    new_data = pd.DataFrame()
-    new_data["location"] = [country]
-    new_data["model_type"] = [model_type]
-    new_data["r_squared"] = model.get_score()
-    return new_data
+    if end_split:
+        cut = int(length*.8)
+        return np.arange(cut), np.arange(cut, length)
+    order = np.random.permutation(length)
+    test_size = math.ceil(length*.2)
+    return order[test_size:], order[:test_size]
+
+def stack_splits(series, splits, logit):
+    """Concatenates the train and test values of every country
 
-def get_split_scores(data_dict, end_split):
+    Args:
+        series:
+            List of the VaccinationSeries of the countries
+        splits:
+            List of the train and test positions of each country
+        logit:
+            Boolean that decides whether to use the transformed y values
+
+    Returns:
+        A tuple of the concatenated train days, y values, and offsets,
+        and a tuple of the same for the test values
+    """
+    stacked = []
+    for part in range(2):
+        positions = [split[part] for split in splits]
+        x_data, offsets = stack_segments([data.days[position]
+                                          for data, position in zip(series, positions)])
+        y_data, _ = stack_segments([(get_logit_target(data) if logit
+                                     else exact_values(data.values))[position]
+                                    for data, position in zip(series, positions)])
+        stacked.append((x_data, y_data, offsets))
+    return stacked[0], stacked[1]
+
+def make_score_rows(countries, model_types, scores):
+    """Makes an entry for each country and model type with its r-squared value
+
+    Args:
+        countries:
+            List of the countries the models were fit for
+        model_types:
+            List of the model types, in the order of MODEL_FITS
+        scores:
+            List with an array of the r-squared value of each country for each model type
+
+    Returns:
+        A dataframe with r-squared values for each model.
+    """
+    if not countries:
+        return pd.DataFrame(columns=["location", "model_type", "r_squared"])
+    return pd.DataFrame({"location":np.repeat(countries, len(model_types)),
+                         "model_type":np.tile(model_types, len(countries)),
+                         "r_squared":np.column_stack(scores).reshape(-1)})
+
+def get_split_scores(store, end_split, countries):
     """Extracts the r-squared values for different train-test splits
 
-    Loops through each country and makes new entry for the country
-    with the r-squared values for each model for either an end split
-    or a random split
+    Fits each model for every country at once with the batch engine
+    Like the models, each model of a country draws its own random split
+    Makes a new entry for each country with the r-squared values for each model
+    for either an end split or a random split
 
     Args:
-        data_dict:
-            Dictionary that holds key as country and value as data
-            for that country
+        store:
+            VaccinationSeriesStore that holds the data for each country
         end_split:
             Boolean that decides whether the split will be random or end
+        countries:
+            List of the countries to fit the models for
 
     Returns:
         A dataframe with r-squared values for each model.
     """
-    new_data = pd.DataFrame()
-    for country in data_dict.keys():
-        data = data_dict[country]["data"]
-        models = [LogisticRegressionModel(data, end_split)]
-        models.append(PolynomialRegressionModel(data, end_split))
-        models.append(LogisticLogarithmicRegressionModel(data, end_split))
-        models.append(LogisticPolynomialRegressionModel(data, end_split))
-        model_types = ["logistic_score", "polynomial_score",
-                       "logistic_logarithmic_score",
-                       "logistic_polynomial_score"]
-        split = "_random_split"
-        if end_split:
-            split = "_end_split"
-        for i in range(len(model_types)):
-            model_types[i] += split
-        for i in range(len(models)):
-            model = models[i]
-            model_type = model_types[i]
-            new_data = new_data.append(get_score_dataframe(country, model, model_type))
-
-    return new_data
-
-def combine_data(random_data, end_data):
-    """Merges two dataframes into one using the location column
+    split = "_random_split"
+    if end_split:
+        split = "_end_split"
+    model_types = [model_type+split for model_type in MODEL_TYPES]
+    if not countries:
+        return make_score_rows(countries, model_types, [])
+    series = [store[country] for country in countries]
+    scores = []
+    for fit_function, logit in MODEL_FITS:
+        splits = [get_split(len(data.days), end_split) for data in series]
+        train, test = stack_splits(series, splits, logit)
+        scores.append(fit_function(*train, test=test).scores)
+    return make_score_rows(countries, model_types, scores)
+
+def get_loo_scores(store, countries):
+    """Extracts the leave-one-out r-squared values of every model
+
+    Fits each model for every country at once on all of its values, and scores
+    each curve or degree the model chooses between by its leave-one-out residuals,
+    which come from the hat diagonal of the fit, so nothing is refit or split
+    The curve or degree with the best leave-one-out r-squared value is chosen
+    Makes a new entry for each country with the leave-one-out r-squared values for each model
+
+    Args:
+        store:
+            VaccinationSeriesStore that holds the data for each country
+        countries:
+            List of the countries to fit the models for
+
+    Returns:
+        A dataframe with leave-one-out r-squared values for each model.
+    """
+    model_types = [model_type+"_loo" for model_type in MODEL_TYPES]
+    if not countries:
+        return make_score_rows(countries, model_types, [])
+    series = [store[country] for country in countries]
+    x_data, offsets = stack_segments([data.days for data in series])
+    scores = []
+    for fit_function, logit in MODEL_FITS:
+        y_data, _ = stack_segments([get_logit_target(data) if logit else exact_values(data.values)
+                                    for data in series])
+        fit = fit_function(x_data, y_data, offsets, leave_one_out=True)
+        scores.append(fit.statistics.loo_r_squared)
+    return make_score_rows(countries, model_types, scores)
+
+def combine_data(random_data, end_data, loo_data):
+    """Merges three dataframes into one using the location column
 
     Args:
         random_data:
             Dataframe that has r-squared values with random split
         end_data:
             Dataframe that has r-squared values with end split
+        loo_data:
+            Dataframe that has leave-one-out r-squared values
 
     Returns:
         Dataframe with combined data
     """
-    return random_data.append(end_data)
+    return pd.concat([random_data, end_data, loo_data])
 
 def __main__():
-    data_dict = extract_data()
-    random_data = get_split_scores(data_dict, False)
-    end_data = get_split_scores(data_dict, True)
-    all_data = combine_data(random_data, end_data)
-    all_data.to_csv("../../../resource/DataVisualization/rsquared_data.csv", index=False)
+    store = extract_data()
+    # Only fit the countries whose series changed since rsquared_data.csv was written
+    hashes = hash_store(store)
+    settings = get_settings(min_rows=100, score_types=["random_split", "end_split", "loo"])
+    stale = find_stale(read_manifest(RSQUARED_PATH, settings), hashes)
+    countries = [country for country in store if country in stale]
+    random_data = get_split_scores(store, False, countries)
+    end_data = get_split_scores(store, True, countries)
+    loo_data = get_loo_scores(store, countries)
+    all_data = combine_data(random_data, end_data, loo_data)
+    all_data = pd.concat([read_fresh_rows(RSQUARED_PATH, hashes, stale), all_data])
+    write_artifact(RSQUARED_PATH, all_data, hashes, settings)
 
 __main__()
@@ -2,20 +2,23 @@
 This module impliments a class called LogisticLogarithmicRegressionModel
 It transforms the y values in order to fit to a logistic curve
 It searches for whether a straight line, or a logistic curve will fit better.
-The module uses sklearn's LinearRegression
-in order to fit to a line.
+The module uses the LeastSquaresRegression
+of regression_backend in order to fit to a line.
 """
-import math
 import numpy as np
-from sklearn.linear_model import LinearRegression
+from kernel_backend import logarithmic
+from least_squares import get_normal_equations
+from least_squares import score_fit
+from regression_backend import make_regression
 from sklearn.model_selection import train_test_split
-from logistic_regression import transform_y_fit
+from logistic_regression import get_logit_target
+from series_store import exact_values
 
 def transform_x(x_data, log_bool):
     """Transforms x values based on the bool passed in
 
     Either leaves the X value the same for a Linear Model
-    Or adds a new row that has logarithmic values
+    Or adds a new column that has logarithmic values, with the logarithmic kernel
 
     Args:
         x_data: the x values to be transformed
@@ -26,15 +29,7 @@ def transform_x(x_data, log_bool):
     """
     if not log_bool:
         return x_data
-    new_x = []
-    # Loop through each row in the list
-    for row in x_data:
-        new_values = []
-        # Loop through each possible transformation
-        for val in row:
-            new_values.append(math.log(val+2))
-        new_x.append(np.append(row, new_values))
-    return new_x
+    return logarithmic(x_data)
 
 class LogisticLogarithmicRegressionModel:
     """This Class is a wrapper in order to fit and predict a model
@@ -49,32 +44,39 @@ class LogisticLogarithmicRegressionModel:
         y_data: holds the y component of the data
         model: holds the trained model
         score: holds the r-squared value from the model
+        statistics: holds the FitStatistics of the model, with its residual sum of squares
+                    and adjusted r-squared value
         bool: holds a bool for whether or not to use a logarithmic transformation
     """
 
-    def __init__(self, dataframe, end_split):
+    def __init__(self, series, end_split):
         """Initialize data with X and y portions and call find_regress
 
-        Extracts the x and y values from an inputed dataframe
+        Extracts the x and y values from a VaccinationSeries
         Then splits based on boolean value of end_split
         This function sets the train and test attributes
 
         Args:
-            dataframe:
-                A dataframe with a date and people_fully_vaccinated_per_hundred column
+            series:
+                A VaccinationSeries with the days and
+                people_fully_vaccinated_per_hundred values of a country
             end_split:
                 A boolean telling the Class whether to split randomly or at the end
         """
-        x_data = dataframe["date"].to_numpy().reshape(-1, 1)
-        y_data = dataframe["people_fully_vaccinated_per_hundred"]
+        x_data = series.days.astype(np.float64).reshape(-1, 1)
+        y_data = exact_values(series.values)
+        logit_y = get_logit_target(series)
         if end_split:
             self.train_x = x_data[:int(len(x_data)*.8)]
             self.test_x = x_data[int(len(x_data)*.8):]
             self.train_y = y_data[:int(len(y_data)*.8)]
             self.test_y = y_data[int(len(y_data)*.8):]
+            self.train_logit_y = logit_y[:int(len(logit_y)*.8)]
+            self.test_logit_y = logit_y[int(len(logit_y)*.8):]
         else:
-            split = train_test_split(x_data, y_data, test_size=.2)
-            self.train_x, self.test_x, self.train_y, self.test_y = split
+            split = train_test_split(x_data, y_data, logit_y, test_size=.2)
+            self.train_x, self.test_x, self.train_y, self.test_y = split[:4]
+            self.train_logit_y, self.test_logit_y = split[4:]
         self.find_regress()
 
 
@@ -83,39 +85,44 @@ class LogisticLogarithmicRegressionModel:
 
         Creates a model for a linear and logarithmic curve and compares
         the r-squared values to decide which model to use
-        This function sets the model, score, and bool attributes
+        Both are scored from the normal equations of the logarithmic features on the
+        test split, whose leading block holds those of the line
+        This function sets the model, statistics, score, and bool attributes
         """
+        equations = get_normal_equations(transform_x(self.test_x, True), self.test_logit_y)
         # Set an initial model and score from fitting our model
-        self.model, self.score = self.fit(True)
+        self.model, self.statistics = self.fit(True, equations)
         self.bool = True
-        tmp_model, tmp_score = self.fit(False)
+        tmp_model, tmp_statistics = self.fit(False, equations)
         # Check if this new model has a better score
-        if tmp_score > self.score:
+        if tmp_statistics.r_squared > self.statistics.r_squared:
             # If the new model has a better score, update the model, score, and regress_bool
             self.model = tmp_model
-            self.score = tmp_score
+            self.statistics = tmp_statistics
             self.bool = False
+        self.score = self.statistics.r_squared
 
-    def fit(self, log_bool):
+    def fit(self, log_bool, equations):
         """Transforms the x and y values, then fits the model, returning the model and score
 
         Calls transform_x and transform_y_fit in order to transform x and y values
-        The function then fits a model using the sklearn LinearRegression
+        The function then fits a model with make_regression, by default
+        a LeastSquaresRegression
 
         Args:
             bool: a boolean value that says whether to use a
                   logarithmic curve, is passed to transform_x
+            equations: the normal equations of the logarithmic features on the test split,
+                       made by get_normal_equations, to score the model with
 
         Returns:
-            A fit model and the r-squared value from the curve
+            A fit model and the FitStatistics of the curve
         """
         train_x = transform_x(self.train_x, log_bool)
-        test_x = transform_x(self.test_x, log_bool)
-        train_y = transform_y_fit(self.train_y)
-        test_y = transform_y_fit(self.test_y)
-        model = LinearRegression().fit(train_x, train_y)
-        score = model.score(test_x, test_y)
-        return model, score
+        train_y = self.train_logit_y
+        model = make_regression().fit(train_x, train_y)
+        statistics = score_fit(equations, np.append(model.intercept_, model.coef_))
+        return model, statistics
 
     def get_score(self):
         """Returns r-squared value from testing
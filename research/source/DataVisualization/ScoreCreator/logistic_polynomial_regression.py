@@ -2,13 +2,19 @@
 This module impliments a class called LogisticLogarithmicRegressionModel
 It transforms the y values in order to fit to a logistic curve
 It searches for what degreee of polynomia is best
-The module uses sklearn's LinearRegression
-in order to fit to a line.
+The module fits every degree of polynomial
+with one QR factorization, in the Chebyshev basis of the mapped days.
+A model can instead be ridge regularized, like PolynomialRegressionModel.
 """
-from sklearn.linear_model import LinearRegression
+import numpy as np
 from sklearn.model_selection import train_test_split
-from logistic_regression import transform_y_fit
-from polynomial_regression import transform_x
+from logistic_regression import get_logit_target
+from polynomial_regression import MAX_DEGREE
+from polynomial_regression import choose_degree
+from polynomial_regression import choose_strength
+from polynomial_regression import ridge_path
+from polynomial_regression import sweep_degrees
+from series_store import exact_values
 
 class LogisticPolynomialRegressionModel:
     """This Class is a wrapper in order to fit and predict a model
@@ -23,75 +29,68 @@ class LogisticPolynomialRegressionModel:
         y_data: holds the y component of the data
         model: holds the trained model
         score: holds the r-squared value from the model
+        statistics: holds the FitStatistics of the model, with its residual sum of squares
+                    and adjusted r-squared value
         bool: holds a bool for whether or not to use a logarithmic transformation
+        ridge: holds whether the model is ridge regularized
+        strength: holds the ridge strength of the model, or None if it is not regularized
     """
 
-    def __init__(self, dataframe, end_split):
+    def __init__(self, series, end_split, ridge=False):
         """Initialize data with X and y portions and call find_regress
 
-        Extracts the x and y values from an inputed dataframe
+        Extracts the x and y values from a VaccinationSeries
         Then splits based on boolean value of end_split
         This function sets the train and test attributes
 
         Args:
-            dataframe:
-                A dataframe with a date and people_fully_vaccinated_per_hundred column
+            series:
+                A VaccinationSeries with the days and
+                people_fully_vaccinated_per_hundred values of a country
             end_split:
                 A boolean telling the Class whether to split randomly or at the end
+            ridge:
+                Whether to fit a ridge regularized polynomial of MAX_DEGREE
+                instead of choosing a degree
         """
-        x_data = dataframe["date"].to_numpy().reshape(-1, 1)
-        y_data = dataframe["people_fully_vaccinated_per_hundred"]
+        x_data = series.days.astype(np.float64).reshape(-1, 1)
+        y_data = exact_values(series.values)
+        logit_y = get_logit_target(series)
         if end_split:
             self.train_x = x_data[:int(len(x_data)*.8)]
             self.test_x = x_data[int(len(x_data)*.8):]
             self.train_y = y_data[:int(len(y_data)*.8)]
             self.test_y = y_data[int(len(y_data)*.8):]
+            self.train_logit_y = logit_y[:int(len(logit_y)*.8)]
+            self.test_logit_y = logit_y[int(len(logit_y)*.8):]
         else:
-            split = train_test_split(x_data, y_data, test_size=.2)
-            self.train_x, self.test_x, self.train_y, self.test_y = split
+            split = train_test_split(x_data, y_data, logit_y, test_size=.2)
+            self.train_x, self.test_x, self.train_y, self.test_y = split[:4]
+            self.train_logit_y, self.test_logit_y = split[4:]
+        self.ridge = ridge
         self.find_regress()
 
 
     def find_regress(self):
-        """Checks whether a logarithmic curve or linear curve is better
+        """Checks which degree of polynomial fits best
 
-        Creates a model for a linear and logarithmic curve and compares
-        the r-squared values to decide which model to use
-        This function sets the model, score, and bool attributes
+        Fits every degree up to MAX_DEGREE with sweep_degrees, which factors
+        the design of the highest degree once, and compares the r-squared
+        values with choose_degree to decide which degree to use
+        If the model is ridge regularized, it fits MAX_DEGREE for every strength
+        with ridge_path instead, and chooses the strength with choose_strength
+        on the training data
+        This function sets the model, statistics, score, degree, and strength attributes
         """
-        self.model, self.score = self.fit(1)
-        self.degree = 1
-        # Loop through all possible boolean values
-        for degree in range(2, 8):
-            # Run the fit function
-            tmpmodel, tmpscore = self.fit(degree)
-            # Check if this new model has a better score
-            if tmpscore > self.score:
-                # If the new model has a better score, update the model, score, and regress_bool
-                self.model = tmpmodel
-                self.score = tmpscore
-                self.degree = degree
-
-    def fit(self, degree):
-        """Transforms the x and y values, then fits the model, returning the model and score
-
-        Calls transform_x and transform_y_fit in order to transform x and y values
-        The function then fits a model using the sklearn LinearRegression
-
-        Args:
-            bool: a boolean value that says whether to use a
-                  logarithmic curve, is passed to transform_x
-
-        Returns:
-            A fit model and the r-squared value from the curve
-        """
-        train_x = transform_x(self.train_x, degree)
-        test_x = transform_x(self.test_x, degree)
-        train_y = transform_y_fit(self.train_y)
-        test_y = transform_y_fit(self.test_y)
-        model = LinearRegression().fit(train_x, train_y)
-        score = model.score(test_x, test_y)
-        return model, score
+        self.strength = None
+        if self.ridge:
+            path = ridge_path(self.train_x, self.train_logit_y, self.test_x, self.test_logit_y)
+            self.model, self.statistics, self.strength = choose_strength(path)
+            self.degree = MAX_DEGREE
+        else:
+            fits = sweep_degrees(self.train_x, self.train_logit_y, self.test_x, self.test_logit_y)
+            self.model, self.statistics, self.degree = choose_degree(fits)
+        self.score = self.statistics.r_squared
 
     def get_score(self):
         """Returns r-squared value from testing
@@ -1,28 +1,65 @@
 """
 This module impliments a class called LogisticRegressionModel
 It creates transformations on the y values in order to
-fit the data to a logistic curve. The module uses sklearn's LinearRegression
-in order to fit to a line.
+fit the data to a logistic curve. The module uses the LeastSquaresRegression
+of regression_backend in order to fit to a line.
 """
-import math
-from sklearn.linear_model import LinearRegression
+import weakref
+import numpy as np
+from kernel_backend import logit
+from least_squares import get_normal_equations
+from least_squares import score_fit
+from regression_backend import make_regression
 from sklearn.model_selection import train_test_split
+from series_store import exact_values
+Y_OFFSET = .01
+Y_FIT_LIMIT = .99
+Y_FIT_REPLACEMENT = 10
+Y_TRANSFORM_LIMIT = -70
+Y_TRANSFORM_REPLACEMENT = 0
+# How close the logit argument may get to 0 or 1
+LOGIT_CLIP = 1e-12
+# The transformed values of each VaccinationSeries, dropped along with the series
+TARGET_CACHE = weakref.WeakKeyDictionary()
 
-def transform_y_fit(y_data):
+def transform_y_fit(y_data, out=None):
     """Transforms the Y values into a logistic form
 
-    Creates a lambda in order to transform all of the y values
-    Uses a list comprehension to loop through all the y values and transform them
+    Applies the logit of y+Y_OFFSET to every y value with the logit kernel
+    The argument is clipped away from 0 and 1, so the logit is always finite
+    Every y value that is not below Y_FIT_LIMIT is replaced by Y_FIT_REPLACEMENT
 
     Args:
         y_data: the people_fully_vaccinated_per_hundred column for the country
+        out: an optional float64 array of the same shape to write the result to,
+             which may be y_data itself
 
     Returns:
-        A list that holds the transformed y values
+        An array that holds the transformed y values
     """
-    # Create a lambda with formula to transform values.
-    transformation = lambda y: -1*math.log((1/(y+.01))-1)
-    return [transformation(y) if y < .99 else 10 for y in y_data]
+    return logit(y_data, Y_OFFSET, Y_FIT_LIMIT, Y_FIT_REPLACEMENT, LOGIT_CLIP, out)
+
+def get_logit_target(series):
+    """Returns transform_y_fit of the values of a VaccinationSeries
+
+    The result is kept in TARGET_CACHE for as long as the series exists,
+    along with the values array it was made from, so each series is
+    transformed once no matter how many models fit it
+    If the values of the series are replaced, the target is made again
+
+    Args:
+        series: a VaccinationSeries
+
+    Returns:
+        A read-only float64 array with the transformed values
+    """
+    cached = TARGET_CACHE.get(series)
+    if cached is None or cached[0] is not series.values:
+        target = transform_y_fit(exact_values(series.values))
+        target.flags.writeable = False
+        cached = (series.values, target)
+        TARGET_CACHE[series] = cached
+    return cached[1]
 
 class LogisticRegressionModel:
     """This Class is a wrapper in order to fit and predict a model
@@ -36,44 +73,56 @@ class LogisticRegressionModel:
         x_data: holds the x component of the data
         y_data: holds the y component of the data
         model: holds the trained model
+        score: holds the r-squared value from the model
+        statistics: holds the FitStatistics of the model, with its residual sum of squares
+                    and adjusted r-squared value
         bool: holds a bool for whether or not to use a logarithmic transformation
     """
 
-    def __init__(self, dataframe, end_split):
+    def __init__(self, series, end_split):
         """Initialize data with X and y portions and call find_regress
 
-        Extracts the x and y values from an inputed dataframe
+        Extracts the x and y values from a VaccinationSeries
         Then splits based on boolean value of end_split
         This function sets the train and test attributes
 
         Args:
-            dataframe:
-                A dataframe with a date and people_fully_vaccinated_per_hundred column
+            series:
+                A VaccinationSeries with the days and
+                people_fully_vaccinated_per_hundred values of a country
             end_split:
                 A boolean telling the Class whether to split randomly or at the end
         """
-        x_data = dataframe["date"].to_numpy().reshape(-1, 1)
-        y_data = dataframe["people_fully_vaccinated_per_hundred"]
+        x_data = series.days.astype(np.float64).reshape(-1, 1)
+        y_data = exact_values(series.values)
+        logit_y = get_logit_target(series)
         if end_split:
             self.train_x = x_data[:int(len(x_data)*.8)]
             self.test_x = x_data[int(len(x_data)*.8):]
             self.train_y = y_data[:int(len(y_data)*.8)]
             self.test_y = y_data[int(len(y_data)*.8):]
+            self.train_logit_y = logit_y[:int(len(logit_y)*.8)]
+            self.test_logit_y = logit_y[int(len(logit_y)*.8):]
         else:
-            split = train_test_split(x_data, y_data, test_size=.2)
-            self.train_x, self.test_x, self.train_y, self.test_y = split
+            split = train_test_split(x_data, y_data, logit_y, test_size=.2)
+            self.train_x, self.test_x, self.train_y, self.test_y = split[:4]
+            self.train_logit_y, self.test_logit_y = split[4:]
         self.fit()
 
     def fit(self):
         """Transforms the x and y values, then fits the model, returning the model and score
 
         Calls transform_x and transform_y_fit in order to transform x and y values
-        The function then fits a model using the sklearn LinearRegression
+        The function then fits a model with make_regression, by default
+        a LeastSquaresRegression,
+        and scores it from the normal equations of the test split
         """
-        train_y = transform_y_fit(self.train_y)
-        test_y = transform_y_fit(self.test_y)
-        self.model = LinearRegression().fit(self.train_x, train_y)
-        self.score = self.model.score(self.test_x, test_y)
+        train_y = self.train_logit_y
+        test_y = self.test_logit_y
+        self.model = make_regression().fit(self.train_x, train_y)
+        solution = np.append(self.model.intercept_, self.model.coef_)
+        self.statistics = score_fit(get_normal_equations(self.test_x, test_y), solution)
+        self.score = self.statistics.r_squared
 
     def get_score(self):
         """Returns r-squared value from testing
@@ -1,36 +1,330 @@
 """
 This module impliments a class called PolynomialRegressionModel
 It creates linear transformations on the x values in order to
-have non-linearity. The module uses sklearn's LinearRegression
-in order to fit to a line.
+have non-linearity. The module fits every degree of polynomial
+with one QR factorization.
+
+The polynomials are fit in the Chebyshev basis of the days mapped to [-1, 1].
+Every column of that basis stays between -1 and 1 at any degree, where the
+powers of the days themselves reach 1e19 by degree 7, so the design stays well
+conditioned. A model keeps the mapping, and predicts in the same basis.
+
+A model can instead be ridge regularized, which keeps the coefficients of the
+highest degree small so predictions past the last day do not overshoot. The
+whole path of strengths comes from one SVD, and a strength is chosen by
+generalized cross-validation.
 """
 import numpy as np
-from sklearn.linear_model import LinearRegression
+from kernel_backend import chebyshev
+from least_squares import FitStatistics
+from least_squares import get_loo_residuals
+from least_squares import get_normal_equations
+from least_squares import get_residual
+from least_squares import get_total
+from least_squares import score_fit
+from series_store import exact_values
 from sklearn.model_selection import train_test_split
+# The highest degree of polynomial find_regress tries
+MAX_DEGREE = 7
+# The ridge strengths ridge_path tries, as multiples of the number of rows, from no penalty up
+RIDGE_STRENGTHS = np.append(0, np.logspace(-8, 1, 37))
+# The ridge penalty of T_k is the strength times k^RIDGE_ORDER,
+# so the highest orders are damped first
+RIDGE_ORDER = 4
+
+def get_mapping(x_data):
+    """Finds the center and half width that map the x values to [-1, 1]
+
+    Args:
+        x_data: the x values
 
-def transform_x(x_data, degree):
-    """Transforms x values based on the bool passed in
+    Returns:
+        The center and the half width, which is 1 if every x value is the same
+    """
+    lowest, highest = np.min(x_data), np.max(x_data)
+    return (highest+lowest)/2, (highest-lowest)/2 or 1
+
+def transform_x(x_data, degree, center=0.0, width=1.0):
+    """Builds the Chebyshev features of the x values
 
-    Either leaves the X value the same for a Linear Model
-    Or adds a new row that has logarithmic values
+    Maps the x values with (x-center)/width, then creates a matrix whose columns
+    are T_1, ..., T_degree of the mapped values with the Chebyshev kernel,
+    which finds each column from the two before it
+    The matrix is stored column by column, so the features of a lower degree
+    are its first columns and can be sliced out without copying
 
     Args:
-        x_data: the x values to be transformed
-        log_bool: a boolean to say whether to use a
+        x_data: the x values to be transformed, with one column
+        degree: the highest degree of Chebyshev polynomial to include
+        center: the center the x values are mapped with
+        width: the half width the x values are mapped with
 
     Returns:
-        returns the transformed x values
+        A float64 array with a column for each degree from 1 to degree
+    """
+    x_data = np.asarray(x_data, dtype=np.float64).reshape(-1)
+    return chebyshev((x_data-center)/width, degree)
+
+class ChebyshevSeries:
+    """This Class holds one polynomial fit in the Chebyshev basis of the mapped days
+
+    Attributes:
+        center: holds the center the days are mapped with
+        width: holds the half width the days are mapped with
+        intercept_: holds the coefficient of T_0
+        coef_: holds the coefficient of each of T_1, ..., T_degree
     """
-    new_x = []
-    # Loop through each row in the list
-    for row in x_data:
-        new_values = []
-        # Loop through each possible transformation
-        for val in row:
-            for exponent in range(2, degree+1):
-                new_values.append(val**exponent)
-        new_x.append(np.append(row, new_values))
-    return new_x
+
+    def __init__(self, center, width, intercept, coefficients):
+        """Initialize the mapping and coefficients
+
+        Args:
+            center: the center the days are mapped with
+            width: the half width the days are mapped with
+            intercept: the coefficient of T_0
+            coefficients: an array with the coefficient of each of T_1, ..., T_degree
+        """
+        self.center = float(center)
+        self.width = float(width)
+        self.intercept_ = float(intercept)
+        self.coef_ = np.asarray(coefficients, dtype=np.float64)
+
+    def predict(self, x_data):
+        """Predicts the y values of days
+
+        Args:
+            x_data: the days, with one column
+
+        Returns:
+            An array with the predicted y values
+        """
+        features = transform_x(x_data, len(self.coef_), self.center, self.width)
+        return features @ self.coef_ + self.intercept_
+
+def sweep_degrees(x_data, y_data, test_x=None, test_y=None, max_degree=MAX_DEGREE):
+    """Fits polynomials of every degree up to max_degree with one QR factorization
+
+    The days are mapped to [-1, 1], where the Chebyshev design of max_degree is well
+    conditioned, and the design is factored once as QR. The first columns of
+    Q and R are the factorization of each lower degree, so a degree is solved
+    from the leading block of R. On the data fit on, the residual sum of squares
+    of a degree is the residual of max_degree plus the squares of the
+    projections onto the columns the degree leaves out. The hat matrix of a degree
+    is Q Q^T over its columns, so the leave-one-out sum of squares (PRESS) of every
+    degree comes from the same factorization. On test data, every degree is scored
+    from the normal equations of the test design of max_degree
+
+    Args:
+        x_data: the x values to fit on, with one column
+        y_data: the y values to fit on
+        test_x: the x values to score on, by default the data fit on
+        test_y: the y values to score on
+        max_degree: the highest degree to fit, which may be above MAX_DEGREE
+
+    Returns:
+        A list with a ChebyshevSeries and FitStatistics for each degree from 1 to
+        max_degree, where each ChebyshevSeries predicts from the days
+    """
+    x_data = np.asarray(x_data, dtype=np.float64).reshape(-1)
+    y_data = np.asarray(y_data, dtype=np.float64).reshape(-1)
+    center, width = get_mapping(x_data)
+    design = np.column_stack([np.ones(len(x_data)), transform_x(x_data, max_degree, center, width)])
+    q_matrix, r_matrix = np.linalg.qr(design)
+    projection = q_matrix.T @ y_data
+    if test_x is None:
+        full_residual = np.sum((y_data-q_matrix @ projection)**2)
+        # left_out[j] is the sum of the squared projections from column j on
+        left_out = np.append(np.cumsum(projection[::-1]**2)[::-1], 0)
+        total = np.sum((y_data-y_data.mean())**2)
+        # Column j holds the fit and hat diagonal of the degree that uses the first j+1 columns
+        fitted = np.cumsum(q_matrix*projection, axis=1)
+        leverage = np.cumsum(q_matrix**2, axis=1)
+        press = np.sum(get_loo_residuals(y_data[:, None]-fitted, leverage)**2, axis=0)
+    else:
+        test_x = np.asarray(test_x, dtype=np.float64).reshape(-1)
+        test_equations = get_normal_equations(transform_x(test_x, max_degree, center, width),
+                                              test_y)
+    fits = []
+    for degree in range(1, max_degree+1):
+        solution = np.linalg.solve(r_matrix[:degree+1, :degree+1], projection[:degree+1])
+        if test_x is None:
+            statistics = FitStatistics(full_residual+left_out[degree+1], total,
+                                       len(y_data), degree, press[degree])
+        else:
+            statistics = score_fit(test_equations, solution)
+        fits.append((ChebyshevSeries(center, width, solution[0], solution[1:]), statistics))
+    return fits
+
+def choose_degree(fits):
+    """Chooses the degree of polynomial with the best r-squared value
+
+    A higher degree is only chosen if its score is strictly better
+    The r-squared value is used instead of PRESS, since a model made from sufficient
+    statistics has no rows to find the hat diagonal of, and must choose the same
+    degree as a model fit on the rows. PRESS stays in the FitStatistics to score with
+
+    Args:
+        fits: a list with a model and FitStatistics for each degree from 1,
+              like the one made by sweep_degrees
+
+    Returns:
+        The model, FitStatistics, and degree that were chosen
+    """
+    model, statistics = fits[0]
+    degree = 1
+    # Loop through every higher degree
+    for tmpdegree in range(2, len(fits)+1):
+        tmpmodel, tmpstatistics = fits[tmpdegree-1]
+        # Check if this new model has a better score
+        if tmpstatistics.r_squared > statistics.r_squared:
+            # If the new model has a better score, update the model, score, and degree
+            model = tmpmodel
+            statistics = tmpstatistics
+            degree = tmpdegree
+    return model, statistics, degree
+
+class RidgePath:
+    """This Class holds the ridge fits of one polynomial for a path of strengths
+
+    Attributes:
+        center: holds the center the days are mapped with
+        width: holds the half width the days are mapped with
+        strengths: holds the strength of each fit, as a multiple of the number of rows
+        solutions: holds a row with the intercept and coefficients of each fit
+        residuals: holds the residual sum of squares of each fit
+        total: holds the total sum of squares around the mean
+        count: holds the number of rows scored
+        parameters: holds the effective number of features of each fit
+        press: holds the leave-one-out residual sum of squares of each fit,
+               or None if the fits were scored on test data
+        gcv: holds the generalized cross-validation score of each fit on the data fit on
+    """
+
+    def __init__(self, center, width, strengths, solutions, residuals, total, count,
+                 parameters, press, gcv):
+        """Initialize the fits of every strength
+
+        Args:
+            center: the center the days are mapped with
+            width: the half width the days are mapped with
+            strengths: an array with the strength of each fit
+            solutions: an array with a row of the intercept and coefficients of each fit
+            residuals: an array with the residual sum of squares of each fit
+            total: the total sum of squares around the mean
+            count: the number of rows scored
+            parameters: an array with the effective number of features of each fit
+            press: an array with the leave-one-out residual sum of squares of each fit, or None
+            gcv: an array with the generalized cross-validation score of each fit
+        """
+        self.center = center
+        self.width = width
+        self.strengths = strengths
+        self.solutions = solutions
+        self.residuals = residuals
+        self.total = total
+        self.count = count
+        self.parameters = parameters
+        self.press = press
+        self.gcv = gcv
+
+    def get_model(self, index):
+        """Returns the fit of one strength
+
+        Args:
+            index: the position of the strength in the path
+
+        Returns:
+            A ChebyshevSeries of the fit
+        """
+        solution = self.solutions[index]
+        return ChebyshevSeries(self.center, self.width, solution[0], solution[1:])
+
+    def get_statistics(self, index):
+        """Returns the FitStatistics of one strength
+
+        Args:
+            index: the position of the strength in the path
+
+        Returns:
+            A FitStatistics of the fit, whose parameters are its effective number of features
+        """
+        press = None if self.press is None else self.press[index]
+        return FitStatistics(self.residuals[index], self.total, self.count,
+                             self.parameters[index], press)
+
+def ridge_path(x_data, y_data, test_x=None, test_y=None, degree=MAX_DEGREE,
+               strengths=RIDGE_STRENGTHS):
+    """Fits a ridge regularized polynomial for every strength with one SVD
+
+    The intercept is not penalized, so the Chebyshev features and y values are
+    centered, and each feature T_k is divided by the square root of its penalty
+    k^RIDGE_ORDER, which makes the penalty the same for every column. The scaled
+    features are factored once as U S V^T. The ridge fit of a strength l shrinks
+    the projection of y onto each column of U by s^2/(s^2+l), so every strength of
+    the path is solved, scored and has its hat diagonal from the same factorization.
+    The sum of the shrinkage factors is the effective number of features, which the
+    generalized cross-validation score n*RSS/(n-1-features)^2 uses to choose
+    a strength without leaving rows out
+
+    Args:
+        x_data: the x values to fit on, with one column
+        y_data: the y values to fit on
+        test_x: the x values to score on, by default the data fit on
+        test_y: the y values to score on
+        degree: the degree of polynomial to fit
+        strengths: the strengths to fit, as multiples of the number of rows
+
+    Returns:
+        A RidgePath with the fit of every strength
+    """
+    x_data = np.asarray(x_data, dtype=np.float64).reshape(-1)
+    y_data = np.asarray(y_data, dtype=np.float64).reshape(-1)
+    strengths = np.asarray(strengths, dtype=np.float64)
+    count = len(y_data)
+    center, width = get_mapping(x_data)
+    scales = np.arange(1, degree+1, dtype=np.float64)**(-RIDGE_ORDER/2)
+    features = transform_x(x_data, degree, center, width)*scales
+    x_mean = features.mean(axis=0)
+    y_mean = y_data.mean()
+    u_matrix, singular, v_matrix = np.linalg.svd(features-x_mean, full_matrices=False)
+    centered = y_data-y_mean
+    projection = u_matrix.T @ centered
+    # shrinkage[i, j] is how much the strength i keeps of the column j of U
+    penalty = singular**2+strengths[:, None]*count
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shrinkage = np.where(singular > 0, singular**2/penalty, 0.0)
+        scale = np.where(singular > 0, singular/penalty, 0.0)
+    coefficients = (scale*projection) @ v_matrix
+    solutions = np.column_stack([y_mean-coefficients @ x_mean, coefficients*scales])
+    residuals = centered[:, None]-u_matrix @ (shrinkage*projection).T
+    residual = np.sum(residuals**2, axis=0)
+    parameters = shrinkage.sum(axis=1)
+    with np.errstate(divide="ignore"):
+        gcv = np.where(count-1-parameters > 0, count*residual/(count-1-parameters)**2, np.inf)
+    if test_x is None:
+        leverage = 1/count+u_matrix**2 @ shrinkage.T
+        press = np.sum(get_loo_residuals(residuals, leverage)**2, axis=0)
+        return RidgePath(center, width, strengths, solutions, residual, np.sum(centered**2),
+                         count, parameters, press, gcv)
+    test_x = np.asarray(test_x, dtype=np.float64).reshape(-1)
+    test_equations = get_normal_equations(transform_x(test_x, degree, center, width), test_y)
+    return RidgePath(center, width, strengths, solutions, get_residual(test_equations, solutions),
+                     get_total(test_equations), test_equations[3], parameters, None, gcv)
+
+def choose_strength(path):
+    """Chooses the strength with the lowest generalized cross-validation score
+
+    The score is found on the data fit on, so the choice does not look at test data
+    A stronger penalty is only chosen if its score is strictly lower
+
+    Args:
+        path: a RidgePath like the one made by ridge_path
+
+    Returns:
+        The model, FitStatistics, and strength that were chosen
+    """
+    index = int(np.argmin(path.gcv))
+    return path.get_model(index), path.get_statistics(index), float(path.strengths[index])
 
 class PolynomialRegressionModel:
     """This Class is a wrapper in order to fit and predict a model
@@ -45,24 +339,32 @@ class PolynomialRegressionModel:
         y_data: holds the y component of the data
         model: holds the trained model
         score: holds the r-squared value from the model
+        statistics: holds the FitStatistics of the model, with its residual sum of squares
+                    and adjusted r-squared value
         bool: holds a bool for whether or not to use a logarithmic transformation
+        ridge: holds whether the model is ridge regularized
+        strength: holds the ridge strength of the model, or None if it is not regularized
     """
 
-    def __init__(self, dataframe, end_split):
+    def __init__(self, series, end_split, ridge=False):
         """Initialize data with X and y portions and call find_regress
 
-        Extracts the x and y values from an inputed dataframe
+        Extracts the x and y values from a VaccinationSeries
         Then splits based on boolean value of end_split
         This function sets the train and test attributes
 
         Args:
-            dataframe:
-                A dataframe with a date and people_fully_vaccinated_per_hundred column
+            series:
+                A VaccinationSeries with the days and
+                people_fully_vaccinated_per_hundred values of a country
             end_split:
                 A boolean telling the Class whether to split randomly or at the end
+            ridge:
+                Whether to fit a ridge regularized polynomial of MAX_DEGREE
+                instead of choosing a degree
         """
-        x_data = dataframe["date"].to_numpy().reshape(-1, 1)
-        y_data = dataframe["people_fully_vaccinated_per_hundred"]
+        x_data = series.days.astype(np.float64).reshape(-1, 1)
+        y_data = exact_values(series.values)
         if end_split:
             self.train_x = x_data[:int(len(x_data)*.8)]
             self.test_x = x_data[int(len(x_data)*.8):]
@@ -71,47 +373,30 @@ class PolynomialRegressionModel:
         else:
             split = train_test_split(x_data, y_data, test_size=.2)
             self.train_x, self.test_x, self.train_y, self.test_y = split
+        self.ridge = ridge
         self.find_regress()
 
 
     def find_regress(self):
-        """Checks whether a logarithmic curve or linear curve is better
+        """Checks which degree of polynomial fits best
 
-        Creates a model for a linear and logarithmic curve and compares
-        the r-squared values to decide which model to use
-        This function sets the model, score, and bool attributes
+        Fits every degree up to MAX_DEGREE with sweep_degrees, which factors
+        the design of the highest degree once, and compares the r-squared
+        values with choose_degree to decide which degree to use
+        If the model is ridge regularized, it fits MAX_DEGREE for every strength
+        with ridge_path instead, and chooses the strength with choose_strength
+        on the training data
+        This function sets the model, statistics, score, degree, and strength attributes
         """
-        self.model, self.score = self.fit(1)
-        self.degree = 1
-        # Loop through all possible boolean values
-        for degree in range(2, 8):
-            # Run the fit function
-            tmpmodel, tmpscore = self.fit(degree)
-            # Check if this new model has a better score
-            if tmpscore > self.score:
-                # If the new model has a better score, update the model, score, and regress_bool
-                self.model = tmpmodel
-                self.score = tmpscore
-                self.degree = degree
-
-    def fit(self, degree):
-        """Transforms the x and y values, then fits the model, returning the model and score
-
-        Calls transform_x and transform_y_fit in order to transform x and y values
-        The function then fits a model using the sklearn LinearRegression
-
-        Args:
-            bool: a boolean value that says whether to use a
-                  logarithmic curve, is passed to transform_x
-
-        Returns:
-            A fit model and the r-squared value from the curve
-        """
-        train_x = transform_x(self.train_x, degree)
-        test_x = transform_x(self.test_x, degree)
-        model = LinearRegression().fit(train_x, self.train_y)
-        score = model.score(test_x, self.test_y)
-        return model, score
+        self.strength = None
+        if self.ridge:
+            path = ridge_path(self.train_x, self.train_y, self.test_x, self.test_y)
+            self.model, self.statistics, self.strength = choose_strength(path)
+            self.degree = MAX_DEGREE
+        else:
+            fits = sweep_degrees(self.train_x, self.train_y, self.test_x, self.test_y)
+            self.model, self.statistics, self.degree = choose_degree(fits)
+        self.score = self.statistics.r_squared
 
     def get_score(self):
         """Returns r-squared value from testing
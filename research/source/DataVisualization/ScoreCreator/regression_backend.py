@@ -0,0 +1,142 @@
+"""
+This module holds the least squares solver the models fit their lines with
+LeastSquaresRegression has the fit, predict and score of sklearn's
+LinearRegression, which is all the models use of it, built on NumPy's lstsq.
+It centers the features and y values before solving, like LinearRegression,
+so the two give the same fits, without importing sklearn.
+
+The backend can be chosen with set_backend, or before starting with the
+VACCINATION_REGRESSION_BACKEND environment variable set to numpy or sklearn.
+sklearn is only imported when its backend is chosen.
+"""
+import importlib.util
+import os
+import numpy as np
+from least_squares import get_r_squared
+BACKEND_VARIABLE = "VACCINATION_REGRESSION_BACKEND"
+BACKENDS = ["numpy", "sklearn"]
+
+class LeastSquaresRegression:
+    """This Class fits a least squares line with an intercept, like sklearn's LinearRegression
+
+    Attributes:
+        coef_: holds the coefficient of each feature
+        intercept_: holds the intercept
+        rank_: holds the rank of the centered features
+        singular_: holds the singular values of the centered features
+        n_features_in_: holds the number of features
+    """
+
+    def fit(self, x_data, y_data):
+        """Fits the coefficients and intercept
+
+        The features and y values are centered, the coefficients are solved with
+        lstsq, and the intercept is the mean of y minus the fit at the mean features
+
+        Args:
+            x_data: the features, with a row for each value
+            y_data: the y values
+
+        Returns:
+            The LeastSquaresRegression itself
+        """
+        x_data = np.asarray(x_data, dtype=np.float64).reshape(len(y_data), -1)
+        y_data = np.asarray(y_data, dtype=np.float64)
+        x_mean = x_data.mean(axis=0)
+        y_mean = y_data.mean()
+        solution = np.linalg.lstsq(x_data-x_mean, y_data-y_mean, rcond=None)
+        self.coef_, _, self.rank_, self.singular_ = solution
+        self.intercept_ = float(y_mean-x_mean @ self.coef_)
+        self.n_features_in_ = x_data.shape[1]
+        return self
+
+    def predict(self, x_data):
+        """Predicts the y values of features
+
+        Args:
+            x_data: the features, with a row for each value
+
+        Returns:
+            An array with the predicted y values
+        """
+        x_data = np.asarray(x_data, dtype=np.float64).reshape(-1, self.n_features_in_)
+        return x_data @ self.coef_ + self.intercept_
+
+    def score(self, x_data, y_data):
+        """Finds the r-squared value of the predictions, like sklearn's r2_score
+
+        Args:
+            x_data: the features, with a row for each value
+            y_data: the y values
+
+        Returns:
+            The r-squared value
+        """
+        y_data = np.asarray(y_data, dtype=np.float64)
+        residual = np.sum((y_data-self.predict(x_data))**2)
+        total = np.sum((y_data-y_data.mean())**2)
+        return get_r_squared(residual, total)
+
+current = {"backend":"numpy"}
+
+def available_backends():
+    """Lists the backends that can be used
+
+    Returns:
+        A list of the names of the backends whose library is installed,
+        found without importing it
+    """
+    return [backend for backend in BACKENDS
+            if backend == "numpy" or importlib.util.find_spec(backend) is not None]
+
+def set_backend(backend):
+    """Chooses the backend every model fits with
+
+    Args:
+        backend: the name of the backend, one of BACKENDS
+
+    Raises:
+        ValueError: if the backend is unknown or its library is not installed
+    """
+    if backend not in BACKENDS:
+        raise ValueError("Unknown regression backend "+str(backend)+", use one of "+
+                         ", ".join(BACKENDS))
+    if backend not in available_backends():
+        raise ValueError("The "+backend+" regression backend needs "+backend+" to be installed")
+    current["backend"] = backend
+
+def get_backend():
+    """Returns the name of the backend every model fits with"""
+    return current["backend"]
+
+def make_regression():
+    """Makes an unfit regression of the current backend
+
+    Returns:
+        A LeastSquaresRegression, or a sklearn LinearRegression with the sklearn backend
+    """
+    if current["backend"] == "sklearn":
+        from sklearn.linear_model import LinearRegression
+        return LinearRegression()
+    return LeastSquaresRegression()
+
+def make_fit_regression(intercept, coefficients):
+    """Makes a regression of the current backend that predicts with known coefficients
+
+    Sets the attributes fit would set, so it predicts like a regression fit
+    to data with these coefficients
+
+    Args:
+        intercept: the intercept
+        coefficients: the coefficient of each feature
+
+    Returns:
+        A LeastSquaresRegression, or a sklearn LinearRegression with the sklearn backend
+    """
+    model = make_regression()
+    model.coef_ = np.asarray(coefficients, dtype=np.float64)
+    model.intercept_ = float(intercept)
+    model.n_features_in_ = len(model.coef_)
+    return model
+
+set_backend(os.environ.get(BACKEND_VARIABLE, "numpy"))
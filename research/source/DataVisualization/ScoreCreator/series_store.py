@@ -0,0 +1,218 @@
+"""
+This module impliments a class called VaccinationSeriesStore
+It holds the vaccination data of every country in two compact typed arrays,
+int16 day offsets and float32 people_fully_vaccinated_per_hundred fractions,
+with each country numbered by an integer id.
+The models read a country through a small VaccinationSeries handle
+instead of a dataframe.
+"""
+import numpy as np
+import pandas as pd
+DAY_DTYPE = np.int16
+VALUE_DTYPE = np.float32
+# The csv gives people_fully_vaccinated_per_hundred to two decimals
+PERCENT_DECIMALS = 2
+# How far a percentage may be from PERCENT_DECIMALS decimals, for the rounding of parsing it
+PERCENT_TOLERANCE = 1e-9
+
+def check_days(days):
+    """Checks that every day offset fits in the store's day dtype
+
+    Args:
+        days: an array with the days since the first date
+
+    Raises:
+        ValueError: if a day does not fit in DAY_DTYPE
+    """
+    if len(days) and (np.min(days) < np.iinfo(DAY_DTYPE).min or
+                      np.max(days) > np.iinfo(DAY_DTYPE).max):
+        raise ValueError("Days do not fit in "+np.dtype(DAY_DTYPE).name)
+
+def check_values(values):
+    """Checks that every value is a percentage with at most PERCENT_DECIMALS decimals
+
+    exact_values only gives back the values the store was built from when they are
+
+    Args:
+        values: an array with the people_fully_vaccinated_per_hundred fractions
+
+    Raises:
+        ValueError: if a percentage has more decimals
+    """
+    percentages = np.asarray(values, dtype=np.float64)*100
+    distance = np.abs(percentages-np.round(percentages, PERCENT_DECIMALS))
+    if np.max(distance, initial=0) > PERCENT_TOLERANCE:
+        raise ValueError("Values have more than "+str(PERCENT_DECIMALS)+
+                         " decimals as percentages")
+
+def exact_values(values):
+    """Returns the float64 fractions that float32 values were stored from
+
+    The store keeps the values as float32 to halve their size, but the models fit
+    on float64 values, since the logit magnifies the float32 rounding near 1.
+    float32 keeps about seven significant digits, more than a percentage with
+    PERCENT_DECIMALS decimals has, and check_values makes sure of those decimals when
+    the store is built, so rounding the percentage of a stored value gives back
+    the fraction the csv was parsed into, to the last bit
+
+    Args:
+        values: an array of people_fully_vaccinated_per_hundred fractions
+
+    Returns:
+        A float64 array of the fractions
+    """
+    return np.round(np.asarray(values, dtype=np.float64)*100, PERCENT_DECIMALS)/100
+
+class VaccinationSeries:
+    """This Class is a handle to the data of one country in a VaccinationSeriesStore
+
+    The days and values are slices of the store's arrays, so no data is copied
+
+    Attributes:
+        country_id: holds the integer id of the country in the store
+        country: holds the name of the country
+        days: holds the days since the first date for the country
+        values: holds the people_fully_vaccinated_per_hundred fractions for the country
+    """
+    # __weakref__ lets caches hold results for a series without keeping it alive
+    __slots__ = ("country_id", "country", "days", "values", "__weakref__")
+
+    def __init__(self, country_id, country, days, values):
+        """Initialize the handle with the slices of the store
+
+        Args:
+            country_id: the integer id of the country
+            country: the name of the country
+            days: the slice of the store's days for the country
+            values: the slice of the store's values for the country
+        """
+        self.country_id = country_id
+        self.country = country
+        self.days = days
+        self.values = values
+
+    def __len__(self):
+        return len(self.days)
+
+class VaccinationSeriesStore:
+    """This Class holds the vaccination data of every country in typed arrays
+
+    Countries are numbered by their position in locations
+    The rows of country i are found from offsets[i] to offsets[i+1]
+
+    Attributes:
+        locations: holds the name of each country
+        ids: holds a dictionary from country name to country id
+        offsets: holds where the rows of each country start and end
+        days: holds the int16 days since the first date for every row
+        values: holds the float32 people_fully_vaccinated_per_hundred fractions
+        series: holds a VaccinationSeries handle for each country
+    """
+
+    def __init__(self, locations, offsets, days, values):
+        """Initialize the store from arrays where the countries are back to back
+
+        Arrays that already have the store's dtypes are used without copying,
+        so the store can sit on top of a memory-mapped file
+        Other arrays are checked with check_days and check_values first
+
+        Args:
+            locations: a list of country names
+            offsets: an array one longer than locations, where country i
+                     holds the rows from offsets[i] to offsets[i+1]
+            days: an array with the days since the first date
+            values: an array with the people_fully_vaccinated_per_hundred fractions
+
+        Raises:
+            ValueError: if a day does not fit in DAY_DTYPE, or a value has too many decimals
+        """
+        if np.asarray(days).dtype != DAY_DTYPE:
+            check_days(days)
+        if np.asarray(values).dtype != VALUE_DTYPE:
+            check_values(values)
+        self.locations = list(locations)
+        self.ids = {country:i for i, country in enumerate(self.locations)}
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.days = np.asarray(days, dtype=DAY_DTYPE)
+        self.values = np.asarray(values, dtype=VALUE_DTYPE)
+        self.series = [VaccinationSeries(i, country,
+                                         self.days[self.offsets[i]:self.offsets[i+1]],
+                                         self.values[self.offsets[i]:self.offsets[i+1]])
+                       for i, country in enumerate(self.locations)]
+
+    @classmethod
+    def from_index(cls, index, min_rows=0):
+        """Creates a store from a CountryIndex
+
+        Copies the rows of every country with enough rows into new typed arrays
+
+        Args:
+            index: a CountryIndex holding the data of every country
+            min_rows: the minimum number of rows a country needs to be kept
+
+        Returns:
+            A VaccinationSeriesStore holding the kept countries
+        """
+        store, index = cls.allocate(index, min_rows)
+        for country in store:
+            store.fill(index, country)
+        return store
+
+    @classmethod
+    def allocate(cls, index, min_rows=0):
+        """Creates a store with room for the countries of a CountryIndex
+
+        The rows of each country are only copied in by fill, so a caller can
+        use each country as soon as its partition is filled
+
+        Args:
+            index: a CountryIndex holding the data of every country
+            min_rows: the minimum number of rows a country needs to be kept
+
+        Returns:
+            An unfilled VaccinationSeriesStore of the kept countries,
+            and the CountryIndex of the kept countries to fill it from
+
+        Raises:
+            ValueError: if a day does not fit in DAY_DTYPE, or a value has too many decimals
+        """
+        check_days(index.days)
+        check_values(index.values)
+        index = index.filter(min_rows)
+        offsets = np.concatenate(([0], np.cumsum(index.counts)))
+        days = np.zeros(offsets[-1], dtype=DAY_DTYPE)
+        values = np.zeros(offsets[-1], dtype=VALUE_DTYPE)
+        return cls(index.locations, offsets, days, values), index
+
+    def fill(self, index, country):
+        """Copies the rows of one country from a CountryIndex into its partition
+
+        Args:
+            index: the CountryIndex returned by allocate
+            country: the name of the country to copy
+        """
+        series = self[country]
+        series.days[:], series.values[:] = index.view(country)
+
+    def __len__(self):
+        return len(self.locations)
+
+    def __iter__(self):
+        return iter(self.locations)
+
+    def __contains__(self, country):
+        return country in self.ids
+
+    def __getitem__(self, country):
+        return self.series[self.ids[country]]
+
+    def to_dataframe(self):
+        """Returns the data of every country as one dataframe
+
+        Returns:
+            A dataframe with a location, date and people_fully_vaccinated_per_hundred column
+        """
+        return pd.DataFrame({"location":np.repeat(np.array(self.locations, dtype=object),
+                                                  np.diff(self.offsets)),
+                             "date":self.days,
+                             "people_fully_vaccinated_per_hundred":self.values})
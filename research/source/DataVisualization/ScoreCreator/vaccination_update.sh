@@ -1,7 +1,11 @@
-git init
-git pull https://github.com/owid/covid-19-data.git
-git restore public
-cp ./public/data/vaccinations/vaccinations.csv ../../../resource/DataVisualization/
-rm -rf public
-rm -rf scripts
-rm -f README.md
\ No newline at end of file
+RESOURCE=../../../resource/DataVisualization
+if [ -f $RESOURCE/vaccinations.csv ]; then
+    cp $RESOURCE/vaccinations.csv ./previous_vaccinations.csv
+fi
+python3 data_fetcher.py $RESOURCE/vaccinations.csv
+# Print which rows of each country were inserted, updated, or deleted by the download
+if [ -f ./previous_vaccinations.csv ]; then
+    python3 dataset_diff.py ./previous_vaccinations.csv $RESOURCE/vaccinations.csv
+    rm -f previous_vaccinations.csv
+fi
+python3 incremental_ingest.py $RESOURCE/vaccinations.csv
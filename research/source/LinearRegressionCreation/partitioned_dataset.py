@@ -0,0 +1,158 @@
+"""
+This module stores the cleaned data of every country in one partitioned file
+Each country is one partition, written back to back after a magic number.
+Inside a partition every column is one contiguous array with a row per date,
+with the dates as int64 days and the features as float64.
+A json footer at the end of the file says where each partition starts,
+how many rows it has, and which columns it holds, since the countries keep
+different features. A country is loaded with one read of its partition,
+and a set of columns is loaded for every country from one open file.
+"""
+import json
+import struct
+import numpy as np
+import pandas as pd
+MAGIC = b"VXDATA01"
+# footer offset, footer size, magic
+TRAILER = struct.Struct("<QQ8s")
+DATE_COLUMN = "date"
+
+def write_dataset(file_path, datadict):
+    """Writes the data of every country to a partitioned file
+
+    Args:
+        file_path: the path to write the file to
+        datadict: a dictionary from country name to a dataframe holding a
+                  date column and numeric feature columns
+    """
+    partitions = []
+    with open(file_path, "wb") as file:
+        file.write(MAGIC)
+        for country, data in datadict.items():
+            columns = list(data.columns)
+            block = np.empty((len(columns), len(data)), dtype=np.float64)
+            for i, column in enumerate(columns):
+                if column == DATE_COLUMN:
+                    days = pd.to_datetime(data[column]).to_numpy(dtype="datetime64[D]")
+                    block[i] = days.astype(np.int64).view(np.float64)
+                else:
+                    block[i] = data[column].to_numpy(dtype=np.float64)
+            partitions.append({"country":country, "offset":file.tell(), "rows":len(data),
+                               "columns":columns})
+            file.write(block.astype("<f8").tobytes())
+        footer = json.dumps({"partitions":partitions}).encode("utf-8")
+        offset = file.tell()
+        file.write(footer)
+        file.write(TRAILER.pack(offset, len(footer), MAGIC))
+
+def read_footer(file_path):
+    """Reads the footer index of a partitioned file
+
+    Args:
+        file_path: the path to the partitioned file
+
+    Returns:
+        A dictionary from country name to a dictionary with the offset,
+        rows, and columns of its partition
+
+    Raises:
+        ValueError: if the file is not a partitioned file
+    """
+    with open(file_path, "rb") as file:
+        file.seek(-TRAILER.size, 2)
+        offset, size, magic = TRAILER.unpack(file.read(TRAILER.size))
+        if magic != MAGIC:
+            raise ValueError(file_path+" is not a partitioned dataset")
+        file.seek(offset)
+        footer = json.loads(file.read(size).decode("utf-8"))
+    return {partition["country"]:partition for partition in footer["partitions"]}
+
+def read_partition(file, partition, columns=None):
+    """Reads the columns of one partition from an open file
+
+    Args:
+        file: the partitioned file, opened in binary mode
+        partition: the footer entry of the partition
+        columns: the columns to read, by default every column in the partition
+
+    Returns:
+        A dataframe holding the columns of the partition that are in columns,
+        with the date column as datetimes
+    """
+    names = partition["columns"]
+    if columns is None:
+        columns = names
+    positions = [names.index(column) for column in columns if column in names]
+    rows = partition["rows"]
+    data = dict()
+    if positions:
+        first, last = min(positions), max(positions)
+        file.seek(partition["offset"]+first*rows*8)
+        block = np.frombuffer(file.read((last-first+1)*rows*8), dtype="<f8")
+        block = block.reshape(last-first+1, rows)
+        for position in positions:
+            if names[position] == DATE_COLUMN:
+                data[DATE_COLUMN] = block[position-first].view(np.int64).astype("datetime64[D]")
+            else:
+                data[names[position]] = block[position-first]
+    return pd.DataFrame(data, columns=[names[position] for position in positions],
+                        index=pd.RangeIndex(rows))
+
+def list_countries(file_path):
+    """Lists the countries in a partitioned file
+
+    Args:
+        file_path: the path to the partitioned file
+
+    Returns:
+        A list of the country names, in the order they were written
+    """
+    return list(read_footer(file_path).keys())
+
+def load_country(file_path, country):
+    """Loads the data of one country
+
+    Args:
+        file_path: the path to the partitioned file
+        country: the name of the country
+
+    Returns:
+        A dataframe holding every column of the country
+    """
+    partition = read_footer(file_path)[country]
+    with open(file_path, "rb") as file:
+        return read_partition(file, partition)
+
+def load_dataset(file_path, columns=None):
+    """Loads the data of every country
+
+    Args:
+        file_path: the path to the partitioned file
+        columns: the columns to load, by default every column
+
+    Returns:
+        A dictionary from country name to a dataframe holding the columns
+        of the country that are in columns
+    """
+    footer = read_footer(file_path)
+    with open(file_path, "rb") as file:
+        return {country:read_partition(file, partition, columns)
+                for country, partition in footer.items()}
+
+def load_columns(file_path, columns):
+    """Loads a set of columns across every country as one dataframe
+
+    Args:
+        file_path: the path to the partitioned file
+        columns: the columns to load
+
+    Returns:
+        A dataframe with a country column and the columns, where a country
+        that does not hold a column has NaN in it
+    """
+    datadict = load_dataset(file_path, columns)
+    if not datadict:
+        return pd.DataFrame(columns=["country"]+list(columns))
+    data = pd.concat([data.assign(country=country) for country, data in datadict.items()],
+                     ignore_index=True)
+    return data.reindex(columns=["country"]+list(columns))
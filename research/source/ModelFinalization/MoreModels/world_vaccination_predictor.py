@@ -19,6 +19,7 @@ from polynomial_regression import PolynomialRegressionModel
 from logistic_regression import LogisticRegressionModel
 from logistic_logarithmic_regression import LogisticLogarithmicRegressionModel
 from logistic_polynomial_regression import LogisticPolynomialRegressionModel
+from country_index import CountryIndex
 # Imports needed for PyInstaller
 warnings.filterwarnings("ignore")
 
@@ -44,12 +45,11 @@ def extract_data():
                   axis=0, inplace=True)
     raw_data["people_fully_vaccinated_per_hundred"] /= 100
 
+    index = CountryIndex.from_dataframe(raw_data)
+
     data_dict = dict()
-    for country in raw_data.location.unique():
-        if len(raw_data.loc[raw_data.location == country]) >= 100:
-            tmp_data = raw_data.loc[raw_data.location == country]
-            tmp_data.drop("location", axis=1, inplace=True)
-            data_dict[country] = {"data":tmp_data}
+    for country in index.filter(100):
+        data_dict[country] = {"data":index.frame(country)}
     return data_dict, min_date
 
 def create_frames(frames):
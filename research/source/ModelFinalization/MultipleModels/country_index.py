@@ -0,0 +1,149 @@
+"""
+This module impliments a class called CountryIndex
+It partitions the vaccination data by country in a single sort pass
+so that the rows of each country sit next to each other in one array.
+Each country is then found through its start and end offsets instead of
+comparing the location column against every country.
+"""
+import numpy as np
+import pandas as pd
+
+class CountryIndex:
+    """This Class holds the vaccination data partitioned by country
+
+    The rows of every country are stored contiguously in the days and values arrays
+    The start and end offsets of each country point into those arrays, so getting
+    the data of a country is a slice that does not copy anything
+
+    Attributes:
+        locations: holds the name of each country
+        starts: holds the offset of the first row of each country
+        ends: holds the offset after the last row of each country
+        counts: holds the number of rows of each country
+        days: holds the days since the first date for every row
+        values: holds the people_fully_vaccinated_per_hundred value for every row
+        positions: holds a dictionary from country name to its position in locations
+    """
+
+    def __init__(self, locations, starts, ends, days, values):
+        """Initialize the index from already partitioned arrays
+
+        Args:
+            locations: a list of country names
+            starts: an array with the first row of each country
+            ends: an array with the row after the last row of each country
+            days: an array with the days since the first date
+            values: an array with the people_fully_vaccinated_per_hundred values
+        """
+        self.locations = list(locations)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.counts = self.ends-self.starts
+        self.days = days
+        self.values = values
+        self.positions = {country:i for i, country in enumerate(self.locations)}
+
+    @classmethod
+    def from_offsets(cls, locations, offsets, days, values):
+        """Creates an index from arrays where the countries are back to back
+
+        Args:
+            locations: a list of country names
+            offsets: an array one longer than locations, where country i
+                     holds the rows from offsets[i] to offsets[i+1]
+            days: an array with the days since the first date
+            values: an array with the people_fully_vaccinated_per_hundred values
+
+        Returns:
+            A CountryIndex over the arrays
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        return cls(locations, offsets[:-1], offsets[1:], days, values)
+
+    @classmethod
+    def from_dataframe(cls, raw_data):
+        """Creates an index from a dataframe in a single sort pass
+
+        Numbers each country in the order it appears, then does a stable sort
+        on those numbers so the rows of every country keep their original order
+
+        Args:
+            raw_data: a dataframe with a location, date and
+                      people_fully_vaccinated_per_hundred column,
+                      where date holds the days since the first date
+
+        Returns:
+            A CountryIndex over the data
+        """
+        codes, locations = pd.factorize(raw_data["location"].to_numpy())
+        order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes, minlength=len(locations))
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        return cls.from_offsets(locations.tolist(), offsets,
+                                raw_data["date"].to_numpy()[order],
+                                raw_data["people_fully_vaccinated_per_hundred"].to_numpy()[order])
+
+    def __len__(self):
+        return len(self.locations)
+
+    def __iter__(self):
+        return iter(self.locations)
+
+    def __contains__(self, country):
+        return country in self.positions
+
+    def filter(self, min_rows):
+        """Keeps only the countries that have enough rows
+
+        Uses the precomputed counts, so no data is looked at or copied
+        The new index shares the days and values arrays with this one
+
+        Args:
+            min_rows: the minimum number of rows a country needs to be kept
+
+        Returns:
+            A CountryIndex holding only the countries with at least min_rows rows
+        """
+        keep = np.flatnonzero(self.counts >= min_rows)
+        return CountryIndex([self.locations[i] for i in keep], self.starts[keep],
+                            self.ends[keep], self.days, self.values)
+
+    def view(self, country):
+        """Returns the data of a country without copying it
+
+        Args:
+            country: the name of the country
+
+        Returns:
+            The days and values arrays for the country
+        """
+        i = self.positions[country]
+        start, end = self.starts[i], self.ends[i]
+        return self.days[start:end], self.values[start:end]
+
+    def frame(self, country):
+        """Returns the data of a country as a dataframe
+
+        Args:
+            country: the name of the country
+
+        Returns:
+            A dataframe with a date and people_fully_vaccinated_per_hundred column
+        """
+        days, values = self.view(country)
+        return pd.DataFrame({"date":days,
+                             "people_fully_vaccinated_per_hundred":values}, copy=False)
+
+    def to_dataframe(self):
+        """Returns the data of every country in the index as one dataframe
+
+        Returns:
+            A dataframe with a location, date and people_fully_vaccinated_per_hundred column
+        """
+        rows = np.concatenate([np.arange(start, end)
+                               for start, end in zip(self.starts, self.ends)]
+                              + [np.zeros(0, dtype=np.int64)])
+        return pd.DataFrame({"location":np.repeat(np.array(self.locations, dtype=object),
+                                                  self.counts),
+                             "date":self.days[rows],
+                             "people_fully_vaccinated_per_hundred":self.values[rows]})